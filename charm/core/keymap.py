@@ -1,6 +1,9 @@
 from __future__ import annotations
 from logging import getLogger
-from collections.abc import Iterable
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from time import perf_counter
 from typing import Literal, cast, get_args
 
 from arcade import Vec2, Window
@@ -45,29 +48,98 @@ ALL = None
 TRIGGER_DEADZONE = 0.05
 STICK_DEADZONE = 0.05
 
+# How many raw input events to keep around if nothing is reading them
+INPUT_LOG_SIZE = 256
+
 ActionJson = tuple[KeyMod, ...]
 KeyMapJson = dict[str, ActionJson]
 
 
+@dataclass(slots=True)
+class InputEvent:
+    """A single press or release, stamped (with `time.perf_counter`) as soon as the OS told us about it,
+    along with every Action (in any context) that button was bound to at the time."""
+    time: float
+    button: Button
+    modifiers: int
+    down: bool
+    actions: frozenset[Action] = frozenset()
+
+    @property
+    def keymod(self) -> KeyMod:
+        return (self.button, self.modifiers)
+
+
 class KeyStateManager:
-    def __init__(self):
+    def __init__(self, resolve: Callable[[KeyMod], frozenset[Action]] = lambda k: frozenset()):
         self.pressed: dict[Button, int] = {}
         self.released: dict[Button, int] = {}
         self.held: dict[Button, int] = {}
         self.ignore_mods = Keys.MOD_CAPSLOCK.value | Keys.MOD_NUMLOCK.value | Keys.MOD_SCROLLLOCK.value
+        # `pressed` and `released` only remember the latest button, this remembers all of them (for gameplay)
+        self.log: deque[InputEvent] = deque(maxlen=INPUT_LOG_SIZE)
+
+        # Each button gets looked up in the KeyMap once, when it changes,
+        # so asking if an Action is pressed/released/held is just a set lookup.
+        self._resolve = resolve
+        self.pressed_actions: frozenset[Action] = frozenset()
+        self.released_actions: frozenset[Action] = frozenset()
+        self.held_actions: dict[Action, int] = {}  # How many of each Action's keys are down
+        self.version: int = 0  # Goes up every time anything changes
+
+    def _hold(self, actions: Iterable[Action]) -> None:
+        for action in actions:
+            self.held_actions[action] = self.held_actions.get(action, 0) + 1
+
+    def _unhold(self, actions: Iterable[Action]) -> None:
+        for action in actions:
+            count = self.held_actions.get(action, 0) - 1
+            if count > 0:
+                self.held_actions[action] = count
+            else:
+                self.held_actions.pop(action, None)
 
     def on_button_press(self, symbol: Button, modifiers: int) -> None:
         # logger.info(f'Button {symbol} pressed with mods {modifiers}')
         modifiers = modifiers & ~self.ignore_mods
+        actions = self._resolve((symbol, modifiers))
+        self.log.append(InputEvent(perf_counter(), symbol, modifiers, True, actions))
         self.pressed = {symbol: modifiers}
+        self.pressed_actions = actions
+        if symbol in self.held:
+            self._unhold(self._resolve((symbol, self.held[symbol])))
         self.held[symbol] = modifiers
+        self._hold(actions)
+        self.version += 1
 
     def on_button_release(self, symbol: Button, modifiers: int) -> None:
         # logger.info(f'Button {symbol} released with mods {modifiers}')
         modifiers = modifiers & ~self.ignore_mods
+        actions = self._resolve((symbol, modifiers))
+        self.log.append(InputEvent(perf_counter(), symbol, modifiers, False, actions))
         self.released = {symbol: modifiers}
+        self.released_actions = actions
         if symbol in self.held:
-            del self.held[symbol]
+            # It's the modifiers from when it was pressed that decide what was being held
+            self._unhold(self._resolve((symbol, self.held.pop(symbol))))
+        self.version += 1
+
+    def on_bind(self, key: KeyMod, action: Action) -> None:
+        """Keep held_actions right if a key gets (re)bound while it's down."""
+        if self.is_input_held(key):
+            self._hold((action,))
+            self.version += 1
+
+    def on_unbind(self, key: KeyMod, action: Action) -> None:
+        if self.is_input_held(key):
+            self._unhold((action,))
+            self.version += 1
+
+    def drain(self) -> list[InputEvent]:
+        """Every press and release since the last drain, oldest first."""
+        events = list(self.log)
+        self.log.clear()
+        return events
 
     def is_input_pressed(self, button: KeyMod) -> bool:
         k, m = button
@@ -96,6 +168,10 @@ class Action:
         self.conflicting_keys: set[KeyMod] = set()
         self._keymap.add_action(self)
 
+    @property
+    def context(self) -> Context:
+        return self._context
+
     @property
     def v_conflict(self) -> bool:
         return len(self.conflicting_keys) > 0
@@ -178,27 +254,35 @@ class Action:
 
     @property
     def pressed(self) -> bool:
-        return any(self._keymap.state.is_input_pressed(key) for key in self.keys)
+        return self in self._keymap.state.pressed_actions
 
     @property
     def released(self) -> bool:
-        return any(self._keymap.state.is_input_released(key) for key in self.keys)
+        return self in self._keymap.state.released_actions
 
     @property
     def held(self) -> bool:
-        return any(self._keymap.state.is_input_held(key) for key in self.keys)
+        return self in self._keymap.state.held_actions
 
     def __str__(self) -> str:
         return f"{self.id}: {[get_keyname(k) for k in self.keys]}"
 
 
 class SubKeyMap[T]:
-    def __init__(self, *actions: Action):
+    def __init__(self, keymap: KeyMap, *actions: Action):
+        self.keymap = keymap
         self.actions = actions
+        self._state: T = cast(T, (False,) * len(actions))
+        self._state_version: int = -1
 
     @property
     def state(self) -> T:
-        return cast(T, tuple(a.held for a in self.actions))
+        # Only rebuilt when a button has actually changed since last time
+        key_state = self.keymap.state
+        if key_state.version != self._state_version:
+            self._state = cast(T, tuple(a in key_state.held_actions for a in self.actions))
+            self._state_version = key_state.version
+        return self._state
 
     @property
     def pressed_action(self) -> Action | None:
@@ -222,7 +306,7 @@ class KeyMap:
         """Access and set mappings for inputs to actions. Key binding."""
         self.actions: set[Action] = set()
         self.keys: dict[Context | None, dict[KeyMod, set[Action]]] = {ctx: {} for ctx in [*get_args(Context), None]}
-        self.state = KeyStateManager()
+        self.state = KeyStateManager(self._resolve)
 
         # Controller Properties
         # ? (Should maybe be a part of the key state manager?????)
@@ -247,6 +331,10 @@ class KeyMap:
         self.seek_backward = Action(self, 'seek_backward', [Keys.MINUS])
         self.seek_forward =  Action(self, 'seek_forward',  [Keys.EQUAL])
 
+        self.practice_loop =   Action(self, 'practice_loop',   [Keys.Q])
+        self.practice_slower = Action(self, 'practice_slower', [Keys.Z])
+        self.practice_faster = Action(self, 'practice_faster', [Keys.X])
+
         self.debug =                   Action(self, 'debug',                   [Keys.GRAVE])
         self.log_sync =                Action(self, 'log_sync',                [Keys.S]            )
         self.toggle_distractions =     Action(self, 'toggle_distractions',     [Keys.KEY_8]        )
@@ -267,7 +355,7 @@ class KeyMap:
                 self.right =    Action(keymap, 'parallax_right',    [Keys.D], REQUIRED, context="parallax")
                 self.zoom_in =  Action(keymap, 'parallax_zoom_in',  [Keys.R], REQUIRED, context="parallax")
                 self.zoom_out = Action(keymap, 'parallax_zoom_out', [Keys.F], REQUIRED, context="parallax")
-                super().__init__()
+                super().__init__(keymap)
         self.parallax = ParallaxMap(self)
 
         class FourKeyMap(SubKeyMap[tuple[bool, bool, bool, bool]]):
@@ -276,7 +364,7 @@ class KeyMap:
                 self.key2 = Action(keymap, 'fourkey_2', [Keys.F], REQUIRED | SINGLEBIND, context="fourkey")
                 self.key3 = Action(keymap, 'fourkey_3', [Keys.J], REQUIRED | SINGLEBIND, context="fourkey")
                 self.key4 = Action(keymap, 'fourkey_4', [Keys.K], REQUIRED | SINGLEBIND, context="fourkey")
-                super().__init__(self.key1, self.key2, self.key3, self.key4)
+                super().__init__(keymap, self.key1, self.key2, self.key3, self.key4)
         self.fourkey = FourKeyMap(self)
 
         class HeroMap(SubKeyMap[tuple[bool, bool, bool, bool, bool, bool, bool, bool]]):
@@ -289,7 +377,7 @@ class KeyMap:
                 self.strumup =   Action(keymap, 'hero_strum_up',   [Keys.UP, ControllerButtons.DPAD_UP],     REQUIRED, context="hero")
                 self.strumdown = Action(keymap, 'hero_strum_down', [Keys.DOWN, ControllerButtons.DPAD_DOWN],   REQUIRED, context="hero")
                 self.power =     Action(keymap, 'hero_power',      [Keys.RSHIFT, ControllerButtons.BACK], REQUIRED, context="hero")
-                super().__init__(self.green, self.red, self.yellow, self.blue, self.orange, self.strumup, self.strumdown, self.power)
+                super().__init__(keymap, self.green, self.red, self.yellow, self.blue, self.orange, self.strumup, self.strumdown, self.power)
         self.hero = HeroMap(self)
 
         class SongMenuMap(SubKeyMap[tuple[()]]):
@@ -310,7 +398,7 @@ class KeyMap:
                 self.move_forward_down = Action(keymap, 'move_forward_down', [Keys.BACKSLASH],    REQUIRED, context="songmenu")
                 self.y_shift_up =        Action(keymap, 'y_shift_up',        [Keys.COMMA],        REQUIRED, context="songmenu")
                 self.y_shift_down =      Action(keymap, 'y_shift_down',      [Keys.PERIOD],       REQUIRED, context="songmenu")
-                super().__init__()
+                super().__init__(keymap)
         self.songmenu = SongMenuMap(self)
 
         self.set_defaults()
@@ -427,7 +515,8 @@ class KeyMap:
             context = ALL
         actions = self.keys[context].get(key, set())
         if context is not ALL:
-            actions |= set(self.keys["global"].get(key, set()))
+            # Don't |= here, that would add the global actions to the index itself
+            actions = actions | self.keys["global"].get(key, set())
         return actions
 
     def __str__(self) -> str:
@@ -437,12 +526,17 @@ class KeyMap:
         """INTERNAL"""
         self.actions.add(action)
 
+    def _resolve(self, key: KeyMod) -> frozenset[Action]:
+        """INTERNAL: Every Action bound to this key, in any context."""
+        return frozenset(self.keys[ALL].get(key, ()))
+
     def add_key(self, key: KeyMod, action: Action, context: Context) -> None:
         """INTERNAL"""
         for ctx in (context, None):
             if key not in self.keys[ctx]:
                 self.keys[ctx][key] = set()
             self.keys[ctx][key].add(action)
+        self.state.on_bind(key, action)
 
     def remove_key(self, key: KeyMod, action: Action, context: Context) -> None:
         """INTERNAL"""
@@ -450,6 +544,7 @@ class KeyMap:
             self.keys[ctx][key].discard(action)
             if len(self.keys[ctx][key]) == 0:
                 del self.keys[ctx][key]
+        self.state.on_unbind(key, action)
 
     def set_controller(self, idx: int = -1) -> None:
         controllers = get_controllers()
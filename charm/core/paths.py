@@ -15,6 +15,9 @@ datadir = _get_data_dir()
 confpath = datadir / "charm.conf"
 songspath = datadir / "songs"
 scorespath = datadir / "scores.db"
+replayspath = datadir / "replays"
+atlaspath = datadir / "atlases"
+skinspath = datadir / "skins"
 
 fnfpath = songspath / "fnf"
 fourkeypath = songspath / "4k"
@@ -23,6 +26,9 @@ heropath = songspath / "hero"
 
 datadir.mkdir(parents=True, exist_ok=True)
 songspath.mkdir(parents=True, exist_ok=True)
+replayspath.mkdir(parents=True, exist_ok=True)
+atlaspath.mkdir(parents=True, exist_ok=True)
+skinspath.mkdir(parents=True, exist_ok=True)
 fnfpath.mkdir(parents=True, exist_ok=True)
 fourkeypath.mkdir(parents=True, exist_ok=True)
 taikopath.mkdir(parents=True, exist_ok=True)
@@ -86,6 +86,8 @@ class Settings(SettingsBase):
     # Put all the settings here
     volume = Volume()
     window = Window()
+    # A folder in datadir/skins, or nothing for the base skin
+    skin = Setting[str]("")
 
     # put all settings methods here
     def get_volume(self, mixer: Mixer):
@@ -0,0 +1,9 @@
+#version 330
+
+uniform vec4 color;
+
+out vec4 fs_colour;
+
+void main() {
+    fs_colour = color;
+}
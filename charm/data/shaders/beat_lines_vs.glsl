@@ -0,0 +1,24 @@
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+// Where chart time 0 is on screen
+uniform vec2 offset;
+// The lines to draw, as chart time * px_per_s
+uniform vec2 visible;
+
+in vec2 in_pos;
+// The middle of the line this vertex belongs to
+in float in_line;
+
+void main() {
+    if (in_line < visible.x || in_line > visible.y) {
+        // Every vertex of the line ends up in the same place, so nothing gets drawn
+        gl_Position = vec4(0.0, 0.0, 0.0, 1.0);
+        return;
+    }
+    gl_Position = window.projection * window.view * vec4(in_pos + offset, 0.0, 1.0);
+}
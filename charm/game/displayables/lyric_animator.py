@@ -8,27 +8,11 @@ from pyglet import gl
 from charm.lib.types import Seconds
 from charm.lib.emojilabel import FormattedLabel, update_emoji_doc
 
-from charm.game.generic import Event
+from charm.game.generic import LyricEvent
 
 gl.glEnable(gl.GL_DEPTH_TEST)
 
 
-class LyricEvent(Event):
-    def __init__(self, time: Seconds, length: Seconds, text: str, karaoke: str = ""):
-        self.time = time
-        self.length = length
-        self.text = text
-        self.karaoke = karaoke
-
-    @property
-    def end_time(self) -> Seconds:
-        return self.time + self.length
-
-    @end_time.setter
-    def end_time(self, v: Seconds) -> None:
-        self.length = v - self.time
-
-
 class LyricAnimator:
     def __init__(self, x: float, y: float, events: list[LyricEvent] | None = None, width: int | None = None) -> None:
         self._ctx = arcade.get_window().ctx
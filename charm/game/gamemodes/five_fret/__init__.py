@@ -1,7 +1,13 @@
+from charm.lib.lazy import lazy_exports
+
 from .chart import FiveFretNoteType, FiveFretNote, FiveFretChart, FiveFretChord, BeatEvent, SectionEvent, SoloEvent, StarpowerEvent, TSEvent, TextEvent, Ticks, BPMChangeTickEvent, RawLyricEvent
-from .display import FiveFretDisplay
 from .engine import FiveFretEngine
-from .highway import FiveFretHighway
+
+__getattr__ = lazy_exports(__name__, {
+    "FiveFretDisplay": ".display",
+    "FiveFretHighway": ".highway"
+})
+
 
 __all__ = [
     "FiveFretNoteType",
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
 from typing import NamedTuple
 from enum import StrEnum, IntEnum
 from dataclasses import dataclass
@@ -28,71 +28,80 @@ class Fret(IntEnum):
     ORANGE = 4
 
 
-class ChordShape(NamedTuple):
-    green: bool | None
-    red: bool | None
-    yellow: bool | None
-    blue: bool | None
-    orange: bool | None
+FRET_NAMES = "GRYBO"
+ALL_FRETS = 0b11111
+
+
+class ChordShape:
+    """Which frets a chord needs, as a pair of bitmasks (bit `n` is `Fret(n)`).
+
+    `frets` are the frets that have to be held down, and `anchor` the frets that don't matter
+    either way (the ones below an anchored chord, or ones a sustain is holding down.)
+    A fret is never in both. Indexing or iterating gives the old `True`/`False`/`None` per fret.
+    """
+    __slots__ = ("anchor", "frets")
+
+    def __init__(self, frets: int = 0, anchor: int = 0) -> None:
+        self.anchor: int = anchor & ALL_FRETS
+        self.frets: int = frets & ALL_FRETS & ~self.anchor
 
     def __repr__(self) -> str:
-        return (
-            f"<ChordShape {'G' if self.green else ('X' if self.green is None else '_')}"
-            f"{'R' if self.red else ('X' if self.red is None else '_')}"
-            f"{'Y' if self.yellow else ('X' if self.yellow is None else '_')}"
-            f"{'B' if self.blue else ('X' if self.blue is None else '_')}"
-            f"{'O' if self.orange else ('X' if self.orange is None else '_')}>"
-        )
-    
+        return f"<ChordShape {''.join(FRET_NAMES[i] if f else ('X' if f is None else '_') for i, f in enumerate(self))}>"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ChordShape):
+            return NotImplemented
+        return self.frets == other.frets and self.anchor == other.anchor
+
+    def __hash__(self) -> int:
+        return hash((self.frets, self.anchor))
+
+    def __len__(self) -> int:
+        return 5
+
+    def __getitem__(self, fret: int) -> bool | None:
+        bit = 1 << fret
+        if self.anchor & bit:
+            # None means this fret can be anchored, so either False or True are fine
+            return None
+        return bool(self.frets & bit)
+
+    def __iter__(self) -> Iterator[bool | None]:
+        return (self[i] for i in range(5))
 
     def matches(self, other: ChordShape) -> bool:
-        for a, b in zip(self, other, strict=True):
-            if a is None or b is None:
-                # None means this fret can be anchored, so either False or True are fine
-                continue
-            if a != b:
-                return False
-        return True
-    
+        # Every fret neither side is anchoring has to be the same.
+        return not ((self.frets ^ other.frets) & ~(self.anchor | other.anchor))
+
     def contains(self, other: ChordShape) -> bool:
-        for a, b in zip(self, other, strict=True):
-            if a is None or b is None:
-                # None means this fret can be anchored, so either False or True are fine
-                continue
-            if (not a) and b:
-                return False
-        return False
+        # Every fret `other` needs (that neither side is anchoring) has to be held down in this shape too.
+        return not (other.frets & ~self.frets & ~(self.anchor | other.anchor))
 
     @property
     def is_open(self) -> bool:
-        return not any(self)
+        return not self.frets
 
     @classmethod
     def from_fret(cls, fret: Fret) -> ChordShape:
-        return cls(
-                fret == Fret.GREEN,
-                fret == Fret.RED,
-                fret == Fret.YELLOW,
-                fret == Fret.BLUE,
-                fret == Fret.ORANGE,
-            )
+        return cls(1 << fret)
 
     def update_fret(self, fret: int, state: bool | None) -> ChordShape:
-        f = list(self)
-        f[fret] = state
-        return ChordShape(*f)
+        bit = 1 << fret
+        if state is None:
+            return ChordShape(self.frets & ~bit, self.anchor | bit)
+        if state:
+            return ChordShape(self.frets | bit, self.anchor & ~bit)
+        return ChordShape(self.frets & ~bit, self.anchor & ~bit)
+
+    def with_anchor(self, anchor: int) -> ChordShape:
+        """Stop caring about every fret in `anchor`."""
+        return ChordShape(self.frets, self.anchor | anchor)
 
     def __and__(self, other: ChordShape) -> ChordShape:
-        return ChordShape(
-            None if (self.green is None or other.green is None) else self.green and other.green,
-            None if (self.red is None or other.red is None) else self.red and other.red,
-            None if (self.yellow is None or other.yellow is None) else self.yellow and other.yellow,
-            None if (self.blue is None or other.blue is None) else self.blue and other.blue,
-            None if (self.orange is None or other.orange is None) else self.orange and other.orange,
-        )
+        return ChordShape(self.frets & other.frets, self.anchor | other.anchor)
 
     def __or__(self, other: ChordShape) -> ChordShape:
-        return ChordShape(self.green or other.green, self.red or other.red, self.yellow or other.yellow, self.blue or other.blue, self.orange or other.orange)
+        return ChordShape(self.frets | other.frets, other.anchor & ~self.frets)
 
 
 @dataclass
@@ -119,6 +128,7 @@ class FiveFretChord:
         self.notes = notes if notes else []
         self.frets: list[int] = sorted(set(n.lane for n in self.notes))
         self.size: int = len(self.frets)
+        self._shape: ChordShape | None = None
 
     @property
     def tick(self) -> Ticks:
@@ -160,6 +170,7 @@ class FiveFretChord:
     def type(self, v: str) -> None:
         for n in self.notes:
             n.type = v
+        self._shape = None
 
     @property
     def hit(self) -> bool:
@@ -190,19 +201,22 @@ class FiveFretChord:
 
     @property
     def shape(self) -> ChordShape:
+        # Chords get asked for their shape on every fret change, so it's worked out once and kept.
+        # It's only wrong again if the type changes (i.e. HOPO calculation turning a chord into a tap.)
+        if self._shape is None:
+            self._shape = self._calculate_shape()
+        return self._shape
+
+    def _calculate_shape(self) -> ChordShape:
         if 7 in self.frets and self.size == 1:
             # Open note
-            return ChordShape(False, False, False, False, False)
+            return ChordShape()
         # Chords
-        fret_set = set(self.frets)
-        is_anchored = (self.type == FiveFretNoteType.TAP and 7 not in fret_set) or len(self.frets) == 1
-        min_fret = min(fret_set)
-        return ChordShape(
-            *(
-                None if (i < min_fret and is_anchored) else i in fret_set
-                for i in range(5)
-            )
-        )
+        frets = 0
+        for f in self.frets:
+            frets |= 1 << f
+        is_anchored = (self.type == FiveFretNoteType.TAP and 7 not in self.frets) or len(self.frets) == 1
+        return ChordShape(frets, (1 << min(self.frets)) - 1 if is_anchored else 0)
 
 
 class FiveFretSustain(FiveFretChord):
@@ -300,27 +314,27 @@ class FiveFretChart(Chart[FiveFretNote]):
         self.resolution: int = resolution
 
     def calculate_indices(self) -> None:
-        # !: This assumes that the events, notes, and chords are all time sorted :3
-        bpm = self.events_by_type(BPMChangeTickEvent)
-        ts = self.events_by_type(TSEvent)
-        section = self.events_by_type(SectionEvent)
-        beat = self.events_by_type(BeatEvent)
-        star = self.events_by_type(StarpowerEvent)
-        solo = self.events_by_type(SoloEvent)
+        # !: This assumes that the notes and chords are time sorted :3 (the events always are)
         note = self.notes
         chord = self.chords
+        for c in chord:
+            # By now the chord types are final, so get the shapes out of the way before gameplay needs them.
+            c.shape  # noqa: B018
         self.indices = FiveFretNIndexCollection(
-            Index[Seconds, BPMChangeTickEvent](bpm, "time"),
-            Index[Ticks, BPMChangeTickEvent](bpm, "tick"),
-            Index[Seconds, TSEvent](ts, "time"),
-            Index[Ticks, TSEvent](ts, "tick"),
-            Index[Seconds, SectionEvent](section, "time"),
-            Index[Ticks, SectionEvent](section, "tick"),
-            Index[Seconds, BeatEvent](beat, "time"),
+            self.event_index(BPMChangeTickEvent, "time"),
+            self.event_index(BPMChangeTickEvent, "tick"),
+            self.event_index(TSEvent, "time"),
+            self.event_index(TSEvent, "tick"),
+            self.event_index(SectionEvent, "time"),
+            self.event_index(SectionEvent, "tick"),
+            self.event_index(BeatEvent, "time"),
             Index[Seconds, FiveFretNote](note, "time"),
             Index[Ticks, FiveFretNote](note, "tick"),
             Index[Seconds, FiveFretChord](chord, "time"),
             Index[Ticks, FiveFretChord](chord, "tick"),
-            Index[Seconds, StarpowerEvent](star, "time"),
-            Index[Seconds, SoloEvent](solo, "time")
+            self.event_index(StarpowerEvent, "time"),
+            self.event_index(SoloEvent, "time")
         )
+
+    def sections(self) -> list[SectionEvent]:
+        return self.indices.section_time.items
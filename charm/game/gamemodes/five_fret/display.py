@@ -89,6 +89,9 @@ class FiveFretDisplay(Display[FiveFretChart, FiveFretEngine]):
 
         self.note_streak_display.update(self._song_time)
 
+    def seek(self, song_time: Seconds) -> None:
+        self.highway.seek(song_time)
+
     def draw(self) -> None:
         self.highway.draw()
 
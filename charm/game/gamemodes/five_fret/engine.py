@@ -1,4 +1,10 @@
-from queue import Queue
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Sequence
+from copy import deepcopy
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING, Literal
 from math import ceil
 from logging import getLogger
 from dataclasses import dataclass
@@ -6,14 +12,19 @@ from charm.game.generic.results import Results
 from charm.lib.errors import ThisShouldNeverHappenError
 
 from charm.game.generic.engine import DigitalKeyEvent
-from charm.core.keymap import KeyMap
 from charm.lib.types import Seconds, NEVER, FOREVER
 
-from charm.game.generic import Engine, EngineEvent, Judgement
+from charm.game.generic import Engine, EngineEvent, EngineState, Judgement
 from .chart import ChordShape, FiveFretChart, FiveFretNote, FiveFretChord, FiveFretNoteType, Fret, Ticks, StarpowerEvent, SoloEvent
 
+if TYPE_CHECKING:
+    from charm.core.keymap import Action, KeyMap
+
 logger = getLogger('charm')
 
+type FiveFretKey = Fret | Literal["strum"]
+
+
 class ChordShapeChangeEvent(EngineEvent):
     def __init__(self, time: Seconds, chord_shape: ChordShape):
         super().__init__(time)
@@ -27,10 +38,14 @@ class FiveFretSustainData:
     drop: Seconds = FOREVER
     dropped: bool = False
 
-EMPTY_FRET_DATA = FiveFretSustainData(None)  # type: ignore
 
 class FiveFretSustain:
-    def __init__(self, chord: FiveFretChord, notes: list[FiveFretNote], time: Seconds, multiplier: int) -> None:
+    """A hit chord's sustain, scored as it's held.
+
+    Which frets are still being held is kept as a bitmask (bit `n` is fret `n`, opens are bit 7.)
+    Every held fret earns score at a fixed rate, so the score is `base + rate * (time - start)`
+    where `base` is whatever the frets that already stopped earned. Only a fret stopping changes that."""
+    def __init__(self, chord: FiveFretChord, notes: list[FiveFretNote], time: Seconds, multiplier: int, resolution: int) -> None:
         self.chord: FiveFretChord = chord
         self.notes: list[FiveFretNote] = notes
         self.start: Seconds = notes[0].time
@@ -52,45 +67,82 @@ class FiveFretSustain:
         self.is_open: bool = 7 in self.frets and self.chord.size == 1
         self.is_tap: bool = self.notes[0].type == FiveFretNoteType.TAP
         self.is_anchored: bool = self.is_single or (self.is_tap and not self.is_open)
+        self.anchor: int = (1 << self.min_fret) - 1 if self.is_anchored else 0
+
+        self.fret_mask: int = 0
+        for fret in self.frets:
+            self.fret_mask |= 1 << fret
+        self.held: int = self.fret_mask
+
+        # 25 points a beat, spread evenly over each fret's length
+        self.rates: dict[int, float] = {
+            fret: 0.0 if data.end <= self.start else data.note.tick_length * 25 / resolution / (data.end - self.start)
+            for fret, data in self.frets.items()
+        }
+        self.base: float = 0.0
+        self.rate: float = sum(self.rates.values())
+
+        # The fret ends in order, the ones before end_idx have already been reached.
+        self.ends: list[tuple[Seconds, int]] = sorted((data.end, fret) for fret, data in self.frets.items())
+        self.end_idx: int = 0
 
         self.is_finished: bool = False
 
     def get_shape_at_time(self, time: Seconds) -> ChordShape:
         if self.is_open:
-            return ChordShape(False, False, False, False, False)
-        return ChordShape(*(
-                None if (i < self.min_fret and self.is_anchored) else (self.frets.get(i, EMPTY_FRET_DATA).end >= time)
-                for i in range(5)
-            ))
-
-    def check_finished(self) -> bool:
-        for fret_data in self.frets.values():
-            if fret_data.drop == FOREVER:
-                break
-        else:
-            self.is_finished = True
-            return True
-        self.is_finished = False
-        return False
-
-    def drop_sustain(self, time: Seconds, frets: list[int] | None = None) -> None:
-        frets = frets or list(self.frets.keys())
-        for fret in frets:
-            data = self.frets[fret]
-            if data.dropped or data.drop != FOREVER:
-                continue
-            data.drop = time
-            data.dropped = True
-        self.check_finished()
-
-    def finish_sustain(self, time: Seconds, frets: list[int] | None = None) -> None:
-        frets = frets or list(self.frets.keys())
-        for fret in frets:
-            data = self.frets[fret]
-            if data.dropped or data.drop != FOREVER:
-                continue
-            data.drop = time
-        self.check_finished()
+            return EMPTY_CHORD
+        frets = 0
+        for fret, data in self.frets.items():
+            if fret < 5 and data.end >= time:
+                frets |= 1 << fret
+        return ChordShape(frets, self.anchor)
+
+    def score_at(self, time: Seconds) -> float:
+        return self.base + self.rate * (time - self.start)
+
+    @property
+    def next_end(self) -> Seconds:
+        """When the next still held fret runs out."""
+        while self.end_idx < len(self.ends):
+            end, fret = self.ends[self.end_idx]
+            if self.held & (1 << fret):
+                return end
+            self.end_idx += 1
+        return FOREVER
+
+    def _stop_fret(self, fret: int, time: Seconds) -> None:
+        bit = 1 << fret
+        if not self.held & bit:
+            return
+        data = self.frets[fret]
+        data.drop = min(time, data.end)
+        rate = self.rates[fret]
+        self.base += rate * (data.drop - self.start)
+        self.held &= ~bit
+        self.rate = self.rate - rate if self.held else 0.0
+
+    def end_frets(self, time: Seconds) -> None:
+        """Let go of every fret that has run out by `time`."""
+        while self.end_idx < len(self.ends) and self.ends[self.end_idx][0] <= time:
+            end, fret = self.ends[self.end_idx]
+            self._stop_fret(fret, end)
+            self.end_idx += 1
+        self.is_finished = not self.held
+
+    def drop_sustain(self, time: Seconds, frets: int | None = None) -> None:
+        dropping = self.held if frets is None else self.held & frets
+        for fret, data in self.frets.items():
+            if dropping & (1 << fret):
+                data.dropped = True
+                self._stop_fret(fret, time)
+        self.is_finished = not self.held
+
+    def finish_sustain(self, time: Seconds, frets: int | None = None) -> None:
+        finishing = self.held if frets is None else self.held & frets
+        for fret in self.frets:
+            if finishing & (1 << fret):
+                self._stop_fret(fret, time)
+        self.is_finished = not self.held
 
 
 # TODO: update to work with seperate frets in sustain
@@ -105,19 +157,38 @@ class FiveFretSustainScore:
     raw_score: float
     multiplier: int
 
-EMPTY_CHORD = ChordShape(False, False, False, False, False)
+EMPTY_CHORD = ChordShape()
 
 
 class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
+    config_fields = (
+        *Engine.config_fields,
+        "infinite_front_end", "linked_disjoints", "can_chord_skip", "punish_chord_skip", "extended_starpower",
+        "reward_sustain_accuracy", "hopo_leniency", "strum_leniency", "no_note_leniency", "sustain_end_leniency"
+    )
+    state_fields = (
+        *Engine.state_fields, "chord_head", "handled_chords", "processed_time", "last_chord_shape", "last_strum_time",
+        "last_fret_time", "last_hopo_tap_time", "tap_shape", "sustain_count", "commited_score", "latest_judgement",
+        "latest_judgement_time", "star_power", "star_power_active", "star_power_time", "star_power_phrase",
+        "star_power_broken", "star_power_event", "next_star_power_idx", "solo_active", "solo_time", "solo_note_count",
+        "solo_hit_count", "solo_event", "next_solo_idx"
+    )
+    state_logs = ("all_judgements", "sustain_scores")
+
     def __init__(self, chart: FiveFretChart, offset: Seconds = 0):
         judgements = [
             Judgement('Pass', 'pass', 140, 10, 1),
             Judgement('Miss', 'miss', float('inf'), 0, 0),
         ]
         super().__init__(chart, judgements, offset)
-        self.current_notes: list[FiveFretChord] = self.chart.chords[:] # Override the default engine
+        # Override the default engine, rather than popping chords off a list we walk a cursor along the chart's chords.
+        # Everything before chord_head has been hit or missed, and handled_chords holds anything past it that
+        # was already hit by chord skipping. Both get cleaned up as the cursor moves past them.
+        self.chords: list[FiveFretChord] = self.chart.chords
+        self.chord_head: int = 0
+        self.handled_chords: set[int] = set()
 
-        self.input_events: Queue[DigitalKeyEvent] = Queue()
+        self.input_events: deque[DigitalKeyEvent[FiveFretKey]] = deque()
 
         # There are rolling values from the update, which sucks,
         # but we also need to store it between frames so its okay?
@@ -128,6 +199,10 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
         self.last_hopo_tap_time: Seconds = NEVER
         self.tap_shape: ChordShape = EMPTY_CHORD # need to track if we have 'consumed' a chord
         self.active_sustains: list[FiveFretSustain] = []
+        # Every active sustain by when its next fret runs out, so a frame only looks at the sustains that are ending.
+        # Dropped sustains are left in and skipped when they come up.
+        self.sustain_ends: list[tuple[Seconds, int, FiveFretSustain]] = []
+        self.sustain_count: int = 0
 
         self.infinite_front_end = False
         self.linked_disjoints = True # Whether sustains are dropped seperately or together
@@ -172,43 +247,76 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
 
         # TODO: Update parser to make chords with star power and solo.
 
+    @property
+    def current_chord(self) -> FiveFretChord | None:
+        """The earliest chord that hasn't been hit or missed yet."""
+        return self.chords[self.chord_head] if self.chord_head < len(self.chords) else None
+
+    @property
+    def is_first_chord(self) -> bool:
+        """Has nothing been hit or missed yet?"""
+        return self.chord_head == 0 and not self.handled_chords
+
+    def _handle_chord(self, idx: int) -> None:
+        if idx != self.chord_head:
+            self.handled_chords.add(idx)
+            return
+        self.chord_head += 1
+        while self.chord_head in self.handled_chords:
+            self.handled_chords.remove(self.chord_head)
+            self.chord_head += 1
+
     @property
     def multiplier(self) -> int:
         return min(self.streak // 10 + 1, 4)
 
-    def on_button_press(self, keymap: KeyMap) -> None:
-        t = self.chart_time
-
-        # Get the current hero action being pressed
-        if keymap.hero.green.pressed:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.GREEN, "down"))
-        elif keymap.hero.red.pressed:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.RED, "down"))
-        elif keymap.hero.yellow.pressed:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.YELLOW, "down"))
-        elif keymap.hero.blue.pressed:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.BLUE, "down"))
-        elif keymap.hero.orange.pressed:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.ORANGE, "down"))
-        elif keymap.hero.strumup.pressed:
-            # kept sep incase we want to track
-            self.input_events.put_nowait(DigitalKeyEvent(t, "strum", "down"))
-        elif keymap.hero.strumdown.pressed:
-            self.input_events.put_nowait(DigitalKeyEvent(t, "strum", "down"))
-
-    def on_button_release(self, keymap: KeyMap) -> None:
-        t = self.chart_time
-        # Get the current hero action being released
-        if keymap.hero.green.released:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.GREEN, "up"))
-        elif keymap.hero.red.released:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.RED, "up"))
-        elif keymap.hero.yellow.released:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.YELLOW, "up"))
-        elif keymap.hero.blue.released:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.BLUE, "up"))
-        elif keymap.hero.orange.released:
-            self.input_events.put_nowait(DigitalKeyEvent(t, Fret.ORANGE, "up"))
+    def _copy_sustains(self, sustains: tuple[list[FiveFretSustain], list[tuple[Seconds, int, FiveFretSustain]]]) -> tuple[list[FiveFretSustain], list[tuple[Seconds, int, FiveFretSustain]]]:
+        # Sustains change as they're held so they have to be copied, but not the chart they point into.
+        memo: dict[int, object] = {}
+        for sustain in [*sustains[0], *(s for _, _, s in sustains[1])]:
+            memo[id(sustain.chord)] = sustain.chord
+            memo[id(sustain.notes)] = sustain.notes
+            for note in sustain.notes:
+                memo[id(note)] = note
+        return deepcopy(sustains, memo)
+
+    def save_state(self) -> EngineState:
+        state = super().save_state()
+        state["sustains"] = self._copy_sustains((self.active_sustains, self.sustain_ends))
+        return state
+
+    def load_state(self, state: EngineState) -> None:
+        super().load_state(state)
+        self.active_sustains, self.sustain_ends = self._copy_sustains(state["sustains"])
+        self.input_events.clear()
+
+    def reset_stats(self) -> None:
+        super().reset_stats()
+        self.commited_score = 0
+        self.sustain_scores.clear()
+        self.all_judgements.clear()
+        self.star_power = 0.0
+        self.star_power_active = False
+        self.star_power_time = FOREVER
+
+    @staticmethod
+    def bind_inputs(keymap: KeyMap) -> dict[Action, FiveFretKey]:
+        return {
+            keymap.hero.green: Fret.GREEN,
+            keymap.hero.red: Fret.RED,
+            keymap.hero.yellow: Fret.YELLOW,
+            keymap.hero.blue: Fret.BLUE,
+            keymap.hero.orange: Fret.ORANGE,
+            keymap.hero.strumup: "strum",
+            keymap.hero.strumdown: "strum"
+        }
+
+    def on_input(self, events: Sequence[DigitalKeyEvent[FiveFretKey]]) -> None:
+        for event in events:
+            # kept strums seperate incase we want to track, but we don't care about letting go of them
+            if event.key == "strum" and not event.down:
+                continue
+            self.input_events.append(event)
 
     def pause(self) -> None:
         pass
@@ -222,24 +330,24 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
         # This is what Yarg is doing, but their functions are so strangely formatted that it was hard to understand.
 
         self.process_inputs()
-        self.calculate_uncommited()
 
-        # The inputs have caught everything up to where the chart actually is so we can wash our hands of everything
-        if self.chart_time <= self.processed_time:
-            return
-        
-        self.process_to_time(self.chart_time)
+        # If the inputs haven't caught everything up to where the chart actually is, we do that now
+        if self.processed_time < self.chart_time:
+            self.process_to_time(self.chart_time)
+
+        self.calculate_uncommited()
 
     def process_inputs(self):
         # Process all the note inputs
-        while self.input_events.qsize() > 0:
-            event = self.input_events.get_nowait()
-            time = event.time
+        while self.input_events:
+            event = self.input_events.popleft()
+            # Inputs are stamped when they happened, which can be a hair before the last frame we processed.
+            time = max(event.time, self.processed_time)
     
             self.process_to_time(time)
 
             # Ignore inputs when no notes or sustsains are left
-            if not self.current_notes and not self.active_sustains:
+            if self.current_chord is None and not self.active_sustains:
                 continue
     
             match event.key:
@@ -261,16 +369,16 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
     def process_to_time(self, time: Seconds):
         self.update_sustains(time)
 
-        if self.current_notes:
+        if self.current_chord is not None:
             # The first thing that needs to be checked is the front end as this occurs irrespective of the notes
             self.process_infinite_frontend(time)
 
             # Run through every note making sure to not miss the start / end of a solo.
-            while self.current_notes and self.current_notes[0].time + self.hit_window < time:
-                note = self.current_notes.pop(0)
-                self.process_starpower(note.time)
-                self.process_solo(note.time)
-                self._miss_chord(note, FOREVER)
+            while (chord := self.current_chord) is not None and chord.time + self.hit_window < time:
+                self.process_starpower(chord.time)
+                self.process_solo(chord.time)
+                self._miss_chord(chord, FOREVER)
+                self._handle_chord(self.chord_head)
 
         # We need to bring these up to this point in time
         self.process_starpower(time)
@@ -280,25 +388,26 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
                 
     def calculate_uncommited(self) -> None:
         base = self.commited_score
-        rolling = sum(ceil(self.get_sustain_score(sustain)) * sustain.multiplier for sustain in self.active_sustains)
+        rolling = sum(ceil(sustain.score_at(self.chart_time)) * sustain.multiplier for sustain in self.active_sustains)
 
         self.score = base + rolling
 
     def process_infinite_frontend(self, time: Seconds):
+        chord = self.current_chord
         # Do all the easy early-exit checks
-        if not self.infinite_front_end or time < self.current_notes[0].time - self.hit_window or not self.tap_shape.is_open:
+        if not self.infinite_front_end or chord is None or time < chord.time - self.hit_window or not self.tap_shape.is_open:
             return
         
         # If the first unprocessed note wasn't a tap or tap-able hopo then we are done here
-        can_tap_hopo = (self.current_notes[0].type == FiveFretNoteType.HOPO and (self.streak > 0 or len(self.current_notes) == len(self.chart.chords)))
-        if not (can_tap_hopo or self.current_notes[0].type != FiveFretNoteType.TAP):
+        can_tap_hopo = (chord.type == FiveFretNoteType.HOPO and (self.streak > 0 or self.is_first_chord))
+        if not (can_tap_hopo or chord.type != FiveFretNoteType.TAP):
             return
 
         ghost_shape = self.calculate_ghost_shape(self.last_chord_shape)
-        if not ghost_shape.matches(self.current_notes[0].shape):
+        if not ghost_shape.matches(chord.shape):
             return
         
-        self.hit_chord(self.current_notes[0], time)
+        self.hit_chord(self.chord_head, time)
         self.tap_shape = self.last_chord_shape
         if can_tap_hopo:
             self.last_hopo_tap_time = time
@@ -363,13 +472,9 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
         # Sustains have some oddities because they 'ghost' the user's input.
         # A chord matches even if the player is holding down extra notes IF they are for sustains.
 
-        if not self.current_notes:
-            current_chord = None
-            has_active_chord = False
-        else:
-            current_chord = self.current_notes[0]
-            # Because we have already cleared away all out of data chords we only need to check the front end
-            has_active_chord = current_chord.time <= time + self.hit_window
+        current_chord = self.current_chord
+        # Because we have already cleared away all out of data chords we only need to check the front end
+        has_active_chord = current_chord is not None and current_chord.time <= time + self.hit_window
 
         last_shape = self.last_chord_shape
         last_strum = self.last_strum_time
@@ -388,61 +493,9 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
         # TODO: add a lenience timer for this? Say they have 1/30th of a second to lift off before its marked as wrong?
 
         for sustain in self.active_sustains:
-            shape = sustain.get_shape_at_time(time)
-            # We are lenient on lift-off
-            # TODO: We need to account for ghosted notes for open sustains :melt:
-            if shape.is_open and (not chord_shape.is_open and pressed) and not has_active_chord:
-                logger.info('open sustain dropped')
-                sustain.drop_sustain(time)
-                self.score_sustain(sustain)
-                self.active_sustains.remove(sustain)
-                continue
-            
-            if (self.linked_disjoints or not sustain.is_disjoint) and not ((has_active_chord and chord_shape.contains(shape)) or chord_shape.matches(shape)):
-                logger.info('linked sustain dropped')
-                sustain.drop_sustain(time)
-                self.score_sustain(sustain)
-                self.active_sustains.remove(sustain)
-                continue
-            
-            # TODO: handle disjointed open chords :melt:
-            sustain_finished = True
-            for idx, fretting in enumerate(shape):
-                # anchoring is an easy check
-                if fretting is None:
-                    continue
-
-                chord_fretting = chord_shape[idx]
-                
-                # While the sustain isn't being extended we aren't lenient about chord over-pressing.
-                # This is the 'match' check from above... kinda
-                if not has_active_chord and not fretting and chord_fretting:
-                    logger.info('sustain over-pressed')
-                    sustain.drop_sustain(time)
-                    sustain_finished = True
-                    break
-
-                if not fretting: # equivalent to checking if idx in sustain.frets
-                    continue
-
-                data = sustain.frets[idx]
-                if data.dropped or data.drop != FOREVER:
-                    continue
-
-                # This is the 'contain' check from above... kinda
-                if not chord_fretting:
-                    data.drop = time
-                    data.dropped = True
-                    continue
-
-                sustain_finished = False
-
-            # TODO: This doesn't account for open chords
-            sustain.is_finished = sustain_finished
-            if sustain_finished:
-                logger.info('sustain dropped and finished')
-                self.score_sustain(sustain)
-                self.active_sustains.remove(sustain)
+            self.fret_sustain(sustain, chord_shape, pressed, has_active_chord, time)
+        if any(sustain.is_finished for sustain in self.active_sustains):
+            self.active_sustains = [sustain for sustain in self.active_sustains if not sustain.is_finished]
 
         if not has_active_chord or current_chord is None:
             # The current chord isn't available to process,
@@ -457,27 +510,62 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
             if abs(time - last_strum) <= self.strum_leniency:
                 # * Because we can strum any note irrespective of its type
                 # * this works for Taps and Hopos
-                self.hit_chord(current_chord, time)
+                self.hit_chord(self.chord_head, time)
                 self.last_strum_time = NEVER
                 return
 
-            can_tap_hopo = (current_chord.type == FiveFretNoteType.HOPO and (self.streak > 0 or len(self.current_notes) == len(self.chart.chords)))
+            can_tap_hopo = (current_chord.type == FiveFretNoteType.HOPO and (self.streak > 0 or self.is_first_chord))
             if (can_tap_hopo or current_chord.type == FiveFretNoteType.TAP) and self.tap_shape.is_open:
-                self.hit_chord(current_chord, time)
+                self.hit_chord(self.chord_head, time)
                 self.tap_shape = chord_shape
 
                 if can_tap_hopo:
                     self.last_hopo_tap_time = time
     
-    def calculate_ghost_shape(self, shape: ChordShape):
-        ghost_shape = shape
+    def fret_sustain(self, sustain: FiveFretSustain, chord_shape: ChordShape, pressed: bool, has_active_chord: bool, time: Seconds) -> None:
+        """Drop or finish this sustain if the new fretting doesn't hold it anymore."""
+        shape = sustain.get_shape_at_time(time)
+        # We are lenient on lift-off
+        # TODO: We need to account for ghosted notes for open sustains :melt:
+        if shape.is_open and (not chord_shape.is_open and pressed) and not has_active_chord:
+            logger.info('open sustain dropped')
+            sustain.drop_sustain(time)
+            self.score_sustain(sustain)
+            return
+
+        if (self.linked_disjoints or not sustain.is_disjoint) and not ((has_active_chord and chord_shape.contains(shape)) or chord_shape.matches(shape)):
+            logger.info('linked sustain dropped')
+            sustain.drop_sustain(time)
+            self.score_sustain(sustain)
+            return
+
+        # While the sustain isn't being extended we aren't lenient about chord over-pressing.
+        # This is the 'match' check from above... kinda
+        over_pressed = chord_shape.frets & ~shape.frets & ~shape.anchor
+        if not has_active_chord and over_pressed:
+            logger.info('sustain over-pressed')
+            sustain.drop_sustain(time)
+            self.score_sustain(sustain)
+            return
+
+        # This is the 'contain' check from above... kinda
+        needed = shape.frets & sustain.held
+        if needed & ~chord_shape.frets:
+            sustain.drop_sustain(time, needed & ~chord_shape.frets)
+
+        # TODO: handle disjointed open chords :melt:
+        # TODO: This doesn't account for open chords
+        if not needed & chord_shape.frets:
+            logger.info('sustain dropped and finished')
+            sustain.finish_sustain(time)
+            self.score_sustain(sustain)
+
+    def calculate_ghost_shape(self, shape: ChordShape) -> ChordShape:
+        ghosted = 0
         for sustain in self.active_sustains:
-            for fret, data in sustain.frets.items():
-                if fret == 7:
-                    continue
-                if not data.dropped or data.drop != FOREVER:
-                    ghost_shape = ghost_shape.update_fret(fret, None)
-        return ghost_shape
+            ghosted |= sustain.fret_mask
+        # Opens are bit 7, which ChordShape ignores anyway.
+        return shape.with_anchor(ghosted) if ghosted else shape
 
     def on_strum(self, time: Seconds) -> None:
         # First we check for overstrum
@@ -486,11 +574,11 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
         # If that didn't work then 'start' the strum leniency
 
         # Overstrum if there are no notes, but there are active sustains
-        if not self.current_notes and self.active_sustains:
+        current_chord = self.current_chord
+        if current_chord is None:
             self.overstrum(time)
             return
 
-        current_chord = self.current_notes[0]
         chord_shape = self.last_chord_shape
         last_strum = self.last_strum_time
 
@@ -514,30 +602,35 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
         ghost_shape = self.calculate_ghost_shape(chord_shape)
  
         if ghost_shape.matches(current_chord.shape):
-            self.hit_chord(current_chord, time)
+            self.hit_chord(self.chord_head, time)
             self.last_strum_time = -float('inf')
             return
 
         if self.can_chord_skip:
-            for idx, chord in enumerate(self.current_notes[1:]):
+            # Only walks the chords inside the hit window, ones already hit by an earlier skip are passed over.
+            for idx in range(self.chord_head + 1, len(self.chords)):
+                chord = self.chords[idx]
                 if self.window_front_end < chord.time:
                     # We have reached the end of the chords in the hit window
                     break
+                if idx in self.handled_chords:
+                    continue
                 if ghost_shape.matches(chord.shape):
                     if self.punish_chord_skip:
-                        for missed in self.current_notes[:idx]:
+                        for missed in range(self.chord_head, idx):
                             self.miss_chord(missed, time)
-                    self.hit_chord(chord, time)
+                    self.hit_chord(idx, time)
                     return
 
         # If fail to chord skip then break sustains
         self.overstrum(time)
 
-    def miss_chord(self, chord: FiveFretChord, time: float = float('inf')) -> None:
+    def miss_chord(self, idx: int, time: float = float('inf')) -> None:
+        chord = self.chords[idx]
         if chord.missed or chord.hit:
             return
         self._miss_chord(chord, time)
-        self.current_notes.remove(chord)
+        self._handle_chord(idx)
 
     def _miss_chord(self, chord: FiveFretChord, time: float) -> None:
         chord.missed = True
@@ -553,11 +646,12 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
         if self.solo_active and self.solo_time < chord.time:
             self.solo_note_count += 1
 
-    def hit_chord(self, chord: FiveFretChord, time: float) -> None:
+    def hit_chord(self, idx: int, time: float) -> None:
+        chord = self.chords[idx]
         if chord.missed or chord.hit:
             return
         self._hit_chord(chord, time)
-        self.current_notes.remove(chord)
+        self._handle_chord(idx)
 
     def _hit_chord(self, chord: FiveFretChord, time: float) -> None:
         chord.hit = True
@@ -591,46 +685,44 @@ class FiveFretEngine(Engine[FiveFretChart, FiveFretNote]):
 
     def update_sustains(self, time: Seconds):
         time = time + self.sustain_end_leniency
-        for sustain in self.active_sustains[:]:
-            sustain_finished = True
-            for data in sustain.frets.values():
-                if data.end <= time:
-                    data.drop = data.end
-                else:
-                    sustain_finished = False
-            sustain.is_finished = sustain_finished
-            if sustain_finished:
+        ended = False
+        while self.sustain_ends and self.sustain_ends[0][0] <= time:
+            _, _, sustain = heappop(self.sustain_ends)
+            if sustain.is_finished:
+                # Dropped since it was queued
+                continue
+            sustain.end_frets(time)
+            if sustain.is_finished:
                 self.score_sustain(sustain)
-                self.active_sustains.remove(sustain)
+                ended = True
+            else:
+                self.queue_sustain_end(sustain)
+        if ended:
+            self.active_sustains = [sustain for sustain in self.active_sustains if not sustain.is_finished]
 
     def drop_sustains(self, time: Seconds):
         for sustain in self.active_sustains:
             sustain.drop_sustain(time)
             self.score_sustain(sustain)
         self.active_sustains = []
+        self.sustain_ends = []
 
     def begin_sustain(self, chord: FiveFretChord, time: Seconds):
-        self.active_sustains.append(FiveFretSustain(chord, chord.notes, time, self.multiplier))
-
-    def get_sustain_score(self, sustain: FiveFretSustain) -> float:
-        rolling = 0.0
-        start = sustain.start
-        for fret_data in sustain.frets.values():
-            drop = min(fret_data.drop, self.chart_time)
-            ticks_held = fret_data.note.tick_length * (drop - start) / (fret_data.end - start)
-            raw = ticks_held * 25 / self.chart.resolution
-            rolling += raw
-
-        return rolling
+        sustain = FiveFretSustain(chord, chord.notes, time, self.multiplier, self.chart.resolution)
+        self.active_sustains.append(sustain)
+        self.queue_sustain_end(sustain)
 
+    def queue_sustain_end(self, sustain: FiveFretSustain) -> None:
+        # The count breaks ties so the heap never has to compare two sustains.
+        self.sustain_count += 1
+        heappush(self.sustain_ends, (sustain.next_end, self.sustain_count, sustain))
 
     def score_sustain(self, sustain: FiveFretSustain) -> bool:
         if not sustain.is_finished:
             return False
 
-        score = self.get_sustain_score(sustain)
-
         # We only want to score the sustain when every fret has been dropped/finished.
+        score = sustain.base
         self.sustain_scores.append(FiveFretSustainScore(sustain.start, sustain.hit_time, sustain.frets, sustain.chord, score, sustain.multiplier))
         self.commited_score += ceil(score) * sustain.multiplier
         return True
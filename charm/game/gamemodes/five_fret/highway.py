@@ -1,40 +1,38 @@
 import math
-from typing import Any
-from collections.abc import Generator, Sequence
-from functools import cache
-from importlib.resources import files
+from collections.abc import Sequence
+from functools import partial
 import logging
+import numpy as np
 import PIL.Image
 
-from arcade import SpriteList, Sprite, Texture, draw_line, draw_rect_filled, LRBT, Vec3
+from arcade import SpriteList, Sprite, Texture, draw_rect_filled, LRBT, Vec3, gl
 import arcade.color as colors
 from arcade.camera import PerspectiveProjector, PerspectiveProjectionData, CameraData
 from arcade.camera.grips import rotate_around_right
 
 from charm.core.charm import load_missing_texture
+from charm.lib.assets import ASSETS, Skin
+from charm.lib.atlas import BakedAtlas, bake
 from charm.lib.utils import img_from_path
 from charm.lib.pool import Pool, SpritePool
-from charm.data import get_shader_path
+from charm.data import get_shader_path, get_shader_raw_str
 
-from charm.game.generic import Highway
+from charm.game.generic import Highway, NoteCursor
 from charm.game.generic.sprite import NoteSprite, StrikelineSprite, SustainSprites, SustainTextureDict, SustainTextures
-from .chart import FiveFretChart, FiveFretNote, BeatEvent
+from .chart import FiveFretChart, FiveFretNote, FiveFretNoteType, BeatEvent
 from .engine import FiveFretEngine
 
-import charm.data.images.skins as skins
-
 logger = logging.getLogger("charm")
 
 # SKIN
-@cache
-def load_note_texture(note_type: str, note_lane: int, height: int) -> Texture:
+def load_note_texture(skin: Skin, note_type: str, note_lane: int, height: int) -> Texture:
     image_name = f"{note_type}-{note_lane + 1}"
     open_height = int(height * 48 / 128)  # based onm a pixel ratio
     try:
         if image_name.startswith(("tail", "body", "cap")):
-            image = img_from_path(files(skins) / "hero" / f"{image_name}.png")
+            image = img_from_path(skin.find("hero", f"{image_name}.png"))
         else:
-            image = img_from_path(files(skins) / "hero" / "3d" / f"{image_name}.png")
+            image = img_from_path(skin.find("hero", "3d", f"{image_name}.png"))
         if image.height != height and note_lane != 7:
             width = int((height / image.height) * image.width)
             image = image.resize((width, height), PIL.Image.LANCZOS)
@@ -46,6 +44,26 @@ def load_note_texture(note_type: str, note_lane: int, height: int) -> Texture:
         return load_missing_texture(height, height)
     return Texture(image)
 
+def note_texture_height(note_type: str, size: int) -> int:
+    return size // 2 if note_type == "cap" else size
+
+
+def bake_note_textures(skin: Skin, size: int) -> BakedAtlas:
+    """Every note, sustain and strikeline texture the highway uses at `size`, in one atlas."""
+    recipes = {}
+    for lane in (0, 1, 2, 3, 4, 7):
+        for note_type in (FiveFretNoteType.STRUM, FiveFretNoteType.HOPO, FiveFretNoteType.TAP):
+            recipes[f"{note_type}-{lane}"] = partial(load_note_texture, skin, note_type, lane, size)
+    # Lane 5 is what missed sustains look like
+    for lane in (0, 1, 2, 3, 4, 5, 7):
+        for note_type in ("tail", "body", "cap"):
+            recipes[f"{note_type}-{lane}"] = partial(load_note_texture, skin, note_type, lane, note_texture_height(note_type, size))
+    for lane in range(HERO_LANE_COUNT):
+        for note_type in ("active", "strikeline"):
+            recipes[f"{note_type}-{lane}"] = partial(load_note_texture, skin, note_type, lane, size)
+    return bake("hero", skin.folders("hero"), size, recipes)
+
+
 HERO_HIGHWAY_FOV = 60.0
 HERO_HIGHWAY_ANGLE = 50.0
 HERO_HIGHWAY_DIST = 400.0
@@ -75,6 +93,8 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
         static_camera.projection.fov = HERO_HIGHWAY_FOV
         highway_camera = PerspectiveProjector(projection=static_camera.projection)
         super().__init__(chart, engine, pos, size, gap, downscroll=True, static_camera=static_camera, highway_camera=highway_camera)
+        # Baked (or read off disk) while the rest of the highway gets set up
+        atlas = ASSETS.load(("hero", self.note_size), partial(bake_note_textures, size=self.note_size))
 
         # Using some triginomerty we find the angle and position of the perspective cameras
         # to give us the classic hero look
@@ -90,6 +110,8 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
         highway_data.forward = static_data.forward
         highway_data.up = static_data.up
 
+        self._atlas: BakedAtlas = atlas.result()
+
         # NOTE POOL DEFINITION AND CONSTRUCTION
 
         billboard_program = self.window.ctx.load_program(  # noqa: SLF001
@@ -101,53 +123,55 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
         billboard_program["uv_texture"] = 1
 
 
-        # Generators are great for ease, but it means we can't really 'scrub' backwards through the song
-        # So this is a patch job at best.
-        self._note_generator: Generator[FiveFretNote, Any, None] = (note for note in self.notes)
+        # Flags are only drawn if they're asked for
+        self._show_flags = show_flags
+        self._note_cursor: NoteCursor[FiveFretNote] = NoteCursor(note for note in self.notes if show_flags or note.lane not in (5, 6))
 
-        self._note_pool: SpritePool[NoteSprite] = SpritePool([NoteSprite(x=-1000.0, y=-1000.0) for _ in range(1000)])
+        self._note_pool: SpritePool[NoteSprite] = SpritePool.from_callback(
+            self.pool_size(self._note_cursor), lambda _: NoteSprite(x=-1000.0, y=-1000.0), name="5-fret notes"
+        )
         # avoid orthographic culling TODO: make source program more accessable
         self._note_pool._source.program = billboard_program
-        self._next_note: FiveFretNote = next(self._note_generator, None)
 
         # SUSTAIN POOL DEFINITION AND CONSTRUCTION
 
-        # Generators are great for ease, but it means we can't really 'scrub' backwards through the song
-        # So this is a patch job at best.
-        self._sustain_generator: Generator[FiveFretNote, Any, None] = (note for note in self.notes if note.length)
+        self._sustain_cursor: NoteCursor[FiveFretNote] = NoteCursor((note for note in self.notes if note.length), by_end=True)
 
-        self._sustain_pool: Pool[SustainSprites] = Pool([SustainSprites(self.note_size, self.note_size/2.0, downscroll=True) for _ in range(100)])
         self._sustain_sprites: SpriteList[Sprite] = SpriteList()
         self._sustain_sprites.program = self.window.ctx.sprite_list_program_no_cull  # avoid orthographic culling
-        for sustain in self._sustain_pool.source:
-            self._sustain_sprites.extend(sustain.get_sprites())
+        self._sustain_pool: Pool[SustainSprites] = Pool.from_callback(self.pool_size(self._sustain_cursor), self._make_sustain, name="5-fret sustains")
 
         # TODO: Add lane 7 (open) sustains correctly
-        _missed_tail = load_note_texture('tail', 5, self.note_size)
-        _missed_body = load_note_texture('body', 5, self.note_size)
-        _missed_cap = load_note_texture('cap', 5, self.note_size // 2)
+        _missed_tail = self.note_texture('tail', 5)
+        _missed_body = self.note_texture('body', 5)
+        _missed_cap = self.note_texture('cap', 5)
 
         self._sustain_textures: dict[int, SustainTextureDict] = {
             i: {'primary': SustainTextures(
-                    load_note_texture('tail', i, self.note_size),
-                    load_note_texture('body', i, self.note_size),
-                    load_note_texture('cap', i, self.note_size // 2)
+                    self.note_texture('tail', i),
+                    self.note_texture('body', i),
+                    self.note_texture('cap', i)
                 ),
                 'miss': SustainTextures(_missed_tail, _missed_body, _missed_cap)}
         for i in range(5)}
         self._sustain_textures[7] = {'primary': SustainTextures(
-                    load_note_texture('tail', 7, self.note_size),
-                    load_note_texture('body', 7, self.note_size),
-                    load_note_texture('cap', 7, self.note_size // 2)
+                    self.note_texture('tail', 7),
+                    self.note_texture('body', 7),
+                    self.note_texture('cap', 7)
                 ),
                 'miss': SustainTextures(_missed_tail, _missed_body, _missed_cap)}
 
-        self._next_sustain: FiveFretNote | None = next(self._sustain_generator, None)
-
-        self._show_flags = show_flags
-
         self.color = (0, 0, 0, 128)  # TODO: eventually this will be a scrolling image.
 
+        # BEAT LINES
+        self._beat_program: gl.Program = self.window.ctx.program(
+            vertex_shader=get_shader_raw_str('beat_lines_vs'),
+            fragment_shader=get_shader_raw_str('beat_lines_fs')
+        )
+        self._beat_program['color'] = colors.DARK_GRAY.normalized
+        self._beat_lines: gl.Geometry | None = None
+        self._beat_lines_for: tuple[float, float] | None = None
+
         self.strikeline: SpriteList[StrikelineSprite] = SpriteList()
         self.strikeline.program = billboard_program
         y = self.strikeline_y
@@ -155,8 +179,8 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
             x = self.lane_x(lane)
             sprite = StrikelineSprite(
                 x, y,
-                active_texture=load_note_texture("active", lane, self.note_size),
-                inactive_texture=load_note_texture("strikeline", lane, self.note_size),
+                active_texture=self.note_texture("active", lane),
+                inactive_texture=self.note_texture("strikeline", lane),
                 inactive_alpha=128
             )
             self.strikeline.append(sprite)
@@ -205,24 +229,24 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
         highway_data.forward = static_data.forward
         highway_data.up = static_data.up
 
+    def _make_sustain(self, idx: int) -> SustainSprites:
+        sustain = SustainSprites(self.note_size, self.note_size/2.0, downscroll=True)
+        self._sustain_sprites.extend(sustain.get_sprites())
+        return sustain
+
     def update(self, song_time: float) -> None:
         super().update(song_time)
 
-        while self._next_note is not None and self._next_note.time <= (self.song_time + self.viewport) and self._note_pool.has_free_slot():
-            note = self._next_note
+        until = self.song_time + self.viewport
+        while self._note_pool.has_free_slot() and (note := self._note_cursor.pop(until)) is not None:
             sprite = self._note_pool.get()
-            sprite.texture = load_note_texture(note.type, note.lane, self.note_size)
+            sprite.texture = self.note_texture(note.type, note.lane)
             sprite.position = self.lane_x(note.lane), self.note_y(note.time)
             sprite.visible = True
             sprite.note = note
+            self._note_pool.set_key(sprite, note.time)
 
-            self._next_note = next(self._note_generator, None)
-            # Filters out the flags if they aren't supposed to be shown
-            while not self._show_flags and self._next_note and (self._next_note.lane == 5 or self._next_note.lane == 6):
-                self._next_note = next(self._note_generator, None)
-
-        while self._next_sustain is not None and self._next_sustain.time <= (self.song_time + self.viewport) and self._sustain_pool.has_free_slot():
-            note = self._next_sustain
+        while self._sustain_pool.has_free_slot() and (note := self._sustain_cursor.pop(until)) is not None:
             sustain = self._sustain_pool.get()
             sustain.place(
                 note,
@@ -232,25 +256,64 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
                 self._sustain_textures[note.lane]
             )
 
-            self._next_sustain = next(self._sustain_generator, None)
-
-        for sprite in self._note_pool.given_items:
-            sprite.center_y = self.note_y(sprite.note.time)
+        # Every note moves at once, and only the ones near the strikeline can be hit or go past it
+        times = self._note_pool.given_keys()
+        self._note_pool.move_given(y=self.note_ys(times))
+        for sprite in self._note_pool.given_where(times <= song_time + self.engine.hit_window):
             if sprite.note.hit or sprite.note.time <= (song_time - 0.1):
                 sprite.visible = False
                 self._note_pool.give(sprite)
 
-        for sustain in self._sustain_pool.given_items:
+        for sustain in self._sustain_pool.given():
             sustain.update_texture()
             sustain.update_sustain(self.note_y(sustain.note.time), sustain.note.length * self.px_per_s)
             if sustain.note.end <= (song_time - 0.1):
                 sustain.hide()
                 self._sustain_pool.give(sustain)
 
+    def seek(self, song_time: float) -> None:
+        super().seek(song_time)
+        for sprite in self._note_pool.given():
+            sprite.visible = False
+        self._note_pool.give_all()
+        for sustain in self._sustain_pool.given():
+            sustain.hide()
+        self._sustain_pool.give_all()
+
+        # Everything still on screen gets a sprite again on the next update.
+        self._note_cursor.seek(song_time - 0.1)
+        self._sustain_cursor.seek(song_time - 0.1)
+
     def update_strikeline(self):
         for strikeline, fret in zip(self.strikeline, self.engine.keystate, strict=True):
             strikeline.active = fret
 
+    def build_beat_lines(self) -> None:
+        """Every beat line in the chart as one buffer, laid out in chart time (a beat at t is at y = t * px_per_s.)
+
+        Drawing them is then one call, the shader scrolls them into place and skips the ones that
+        aren't on the highway. It only needs doing again if the highway's width or speed changes."""
+        self._beat_lines_for = (self.w, self.px_per_s)
+        beats = self.chart.events_by_type(BeatEvent)
+        if not beats:
+            self._beat_lines = None
+            return
+        middle = np.array([beat.time for beat in beats], dtype=np.float32) * self.px_per_s
+        half = np.array([1.5 if beat.major else 0.5 for beat in beats], dtype=np.float32)
+
+        # Two triangles per line, each vertex is x, y and the middle of its line
+        vertices = np.empty((len(beats), 6, 3), dtype=np.float32)
+        vertices[:, :, 0] = (0, self.w, 0, 0, self.w, self.w)
+        vertices[:, (0, 1, 4), 1] = (middle - half)[:, None]
+        vertices[:, (2, 3, 5), 1] = (middle + half)[:, None]
+        vertices[:, :, 2] = middle[:, None]
+
+        ctx = self.window.ctx
+        self._beat_lines = ctx.geometry(
+            [gl.BufferDescription(ctx.buffer(data=vertices.tobytes()), '2f 1f', ['in_pos', 'in_line'])],
+            mode=ctx.TRIANGLES
+        )
+
     def draw(self) -> None:
         self.window.ctx.blend_func = self.window.ctx.BLEND_DEFAULT
         with self.static_camera.activate():
@@ -258,13 +321,14 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
                 LRBT(self.x, self.x + self.w, self.y, self.y + self.h),
                 self.color
             )
-            current_beat_idx = self.chart.indices.beat_time.gteq_index(self.song_time)
-            last_beat_idx = self.chart.indices.beat_time.lteq_index(self.song_time + self.viewport)
-            if current_beat_idx is not None and last_beat_idx is not None:
-                current_beat_idx = max(current_beat_idx - 1, 0)
-                for beat in self.chart.events_by_type(BeatEvent)[current_beat_idx:last_beat_idx + 1]:
-                    px = self.note_y(beat.time)
-                    draw_line(self.x, px, self.x + self.w, px, colors.DARK_GRAY, 3 if beat.major else 1)
+            if self._beat_lines_for != (self.w, self.px_per_s):
+                self.build_beat_lines()
+            if self._beat_lines is not None:
+                # Everything from the bottom of the highway to the top
+                bottom = self.song_time - self.strikeline_y / self.px_per_s
+                self._beat_program['offset'] = self.x, self.note_y(0)
+                self._beat_program['visible'] = bottom * self.px_per_s, (self.song_time + self.viewport) * self.px_per_s
+                self._beat_lines.render(self._beat_program)
 
             self.update_strikeline()
             self.strikeline.draw()
@@ -272,6 +336,10 @@ class FiveFretHighway(Highway[FiveFretChart, FiveFretNote, FiveFretEngine]):
             self._sustain_sprites.draw()
             self._note_pool.draw()
 
+    def note_texture(self, note_type: str, lane: int) -> Texture:
+        # Flags aren't baked, since they're hardly ever shown
+        return self._atlas.get(f"{note_type}-{lane}", lambda: load_note_texture(self.skin, note_type, lane, note_texture_height(note_type, self.note_size)))
+
     def lane_x(self, lane_num: int) -> int:
         if lane_num == 7:  # tap note override
             return self.x + self.w // 2
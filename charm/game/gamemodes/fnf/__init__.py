@@ -1,7 +1,13 @@
+from charm.lib.lazy import lazy_exports
+
 from .chart import FNFNoteType, FNFNote, FNFChart, CameraFocusEvent, CameraZoomEvent, PlayAnimationEvent
-from .display import FNFDisplay
 from .engine import FNFEngine
 
+__getattr__ = lazy_exports(__name__, {
+    "FNFDisplay": ".display"
+})
+
+
 __all__ = [
     "FNFNoteType",
     "FNFNote",
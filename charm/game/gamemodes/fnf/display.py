@@ -34,7 +34,7 @@ class FNFDisplay(Display[FourKeyChart, FNFEngine]):
         self.player_chart, self.opp_chart = charts
 
         # TODO: make more flexible post mvp
-        self._enemy_engine: BaseEngine = AutoEngine(charts[1], 0.0)
+        self._enemy_engine: AutoEngine = AutoEngine(charts[1], 0.0)
 
         # NOTE: change highways to work of their center position not bottom left
         # TODO: place highways at true ideal locations
@@ -106,6 +106,12 @@ class FNFDisplay(Display[FourKeyChart, FNFEngine]):
     def unpause(self) -> None:
         self._overlay_text.text = ""
 
+    def seek(self, song_time: Seconds) -> None:
+        # The opponent never misses, so it can just skip to wherever the song is.
+        self._enemy_engine.seek(song_time)
+        self._player_highway.seek(song_time)
+        self._enemy_highway.seek(song_time)
+
     def update(self, song_time: Seconds) -> None:
         self._song_time = song_time
 
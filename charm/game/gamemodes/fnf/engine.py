@@ -1,17 +1,32 @@
-from typing import Literal, cast
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, cast
 import logging
 import math
 
-from charm.core.keymap import Action, keymap, KeyMap
 from charm.lib.types import Range4, Seconds
-from charm.lib.utils import clamp
 
-from charm.game.generic import DigitalKeyEvent, Engine, Judgement, Results, BaseResults
+from charm.game.generic import DigitalKeyEvent, Engine, EngineState, Judgement, LaneJudge, Results, BaseResults
 from charm.game.gamemodes.four_key import FourKeyNoteType, FourKeyNote, FourKeyChart
 
+if TYPE_CHECKING:
+    from charm.core.keymap import Action, KeyMap
+
 logger = logging.getLogger("charm")
 
+
+def is_sustain_piece(note: FourKeyNote) -> bool:
+    return note.type == FourKeyNoteType.SUSTAIN
+
+
 class FNFEngine(Engine[FourKeyChart, FourKeyNote]):
+    state_fields = (
+        *Engine.state_fields, "hp", "has_died", "latest_judgement", "latest_judgement_time",
+        "last_p1_lane", "last_note_missed"
+    )
+    state_logs = ("all_judgements",)
+
     def __init__(self, chart: FourKeyChart, offset: Seconds = 0):
         judgements = [
             #        ("name",  "key"    ms,       score, acc,   hp=0)
@@ -35,80 +50,64 @@ class FNFEngine(Engine[FourKeyChart, FourKeyNote]):
         self.latest_judgement_time = None
         self.all_judgements: list[tuple[Seconds, Seconds, Judgement]] = []
 
-        self.current_events: list[DigitalKeyEvent[Range4]] = []
+        self.lane_judge: LaneJudge[FourKeyNote] = LaneJudge(self.chart.notes, 4)
 
-        self.last_p1_action: Action | None = None
+        self.last_p1_lane: Range4 | None = None
         self.last_note_missed = False
         self.streak = 0
         self.max_streak = 0
 
-        self.active_sustains: list[FourKeyNote] = []
-        self.last_sustain_tick = 0
         self.keystate: tuple[bool, bool, bool, bool] = (False, False, False, False)
 
-    def on_button_press(self, keymap: KeyMap) -> None:
-        self.keystate = keymap.fourkey.state
-        # ignore spam during front/back porch
-        if (self.chart_time < self.chart.notes[0].time - self.hit_window \
-           or self.chart_time > self.chart.notes[-1].time + self.hit_window):
-            return
-        action = keymap.fourkey.pressed_action
-        if action is None:
-            return
-        key = cast(Literal[0, 1, 2, 3], keymap.fourkey.actions.index(action))
-        self.current_events.append(DigitalKeyEvent(self.chart_time, key, "down"))
-
-    def on_button_release(self, keymap: KeyMap) -> None:
-        self.keystate = keymap.fourkey.state
-        if self.last_p1_action is not None and not self.last_p1_action.held:
-            self.last_p1_action = None
-        # ignore spam during front/back porch
-        if (self.chart_time < self.chart.notes[0].time - self.hit_window \
-           or self.chart_time > self.chart.notes[-1].time + self.hit_window):
-            return
-        action = keymap.fourkey.released_action
-        if action is None:
-            return
-        key = cast(Literal[0,1,2,3], keymap.fourkey.actions.index(action))
-        self.current_events.append(DigitalKeyEvent(self.chart_time, key, "up"))
+    def set_keystate(self, lane: Range4, down: bool) -> None:
+        # Held keys come from the input events rather than the live keymap, so replays hold the same keys.
+        keystate = list(self.keystate)
+        keystate[lane] = down
+        self.keystate = cast(tuple[bool, bool, bool, bool], tuple(keystate))
 
-    def calculate_score(self) -> None:
-        # Get all non-scored notes within the current window
-        for note in self.current_notes:
-            if note.time > self.chart_time + self.hit_window:
+    @staticmethod
+    def bind_inputs(keymap: KeyMap) -> dict[Action, Range4]:
+        return {action: cast(Range4, i) for i, action in enumerate(keymap.fourkey.actions)}
+
+    def save_state(self) -> EngineState:
+        state = super().save_state()
+        state["lane_judge"] = self.lane_judge.save_state()
+        return state
+
+    def load_state(self, state: EngineState) -> None:
+        super().load_state(state)
+        self.lane_judge.load_state(state["lane_judge"])
+
+    def reset_stats(self) -> None:
+        super().reset_stats()
+        self.hp = 1
+        self.has_died = False
+        self.all_judgements.clear()
+
+    def on_input(self, events: Sequence[DigitalKeyEvent[Range4]]) -> None:
+        for event in events:
+            lane = event.key
+            self.set_keystate(lane, event.down)
+            if not event.down:
+                if lane == self.last_p1_lane:
+                    self.last_p1_lane = None
+                continue
+            # ignore spam during front/back porch
+            if (event.time < self.chart.notes[0].time - self.hit_window \
+               or event.time > self.chart.notes[-1].time + self.hit_window):
                 continue
-            # Missed notes (current time is higher than max allowed time for note)
-            if note.time < self.chart_time - self.hit_window:
-                note.missed = True
-                note.hit_time = math.inf
-                self.score_note(note)
-                self.current_notes.remove(note)
-            else:
-                if note.type == FourKeyNoteType.SUSTAIN:
-                    # Sustain notes just require the right key is held down, and don't "use" an event.
-                    if self.keystate[note.lane]:
-                        note.hit = True
-                        note.hit_time = note.time
-                        self.score_note(note)
-                        self.current_notes.remove(note)
-                # Check non-used events to see if one matches our note
-                down_events = (e for e in self.current_events if e.new_state == "down")
-                for event in down_events:
-                    # We've determined the note was hit
-                    if event.key == note.lane and abs(event.time - note.time) <= self.hit_window:
-                        note.hit = True
-                        note.hit_time = event.time
-                        self.score_note(note)
-                        try:
-                            self.current_notes.remove(note)
-                        except ValueError:
-                            logger.info("Sustain pickup failed!")  # TODO: I don't know why this happens still, but it does. Often.
-                        self.current_events.remove(event)
-                        self.last_note_hit = note
-                        break
+            self.lane_judge.press(lane, event.time)
+
+    def calculate_score(self) -> None:
+        # Hit or miss everything that's been decided since the last frame.
+        # Sustain notes just require the right key is held down, and don't "use" a press.
+        for note in self.lane_judge.judge(self.chart_time, self.hit_window, self.keystate, is_sustain_piece):
+            self.score_note(note)
+            if note.hit and note.type != FourKeyNoteType.SUSTAIN:
+                self.last_note_hit = note
 
         # Make sure we can't go below min_hp or above max_hp
-        self.hp = clamp(self.min_hp, self.hp, self.max_hp)
+        self.hp = min(max(self.hp, self.min_hp), self.max_hp)
         if self.hp == self.min_hp:
             self.has_died = True
 
@@ -119,7 +118,7 @@ class FNFEngine(Engine[FourKeyChart, FourKeyNote]):
 
         # Sustains use different scoring
         if note.type == FourKeyNoteType.SUSTAIN:
-            self.last_p1_action = keymap.fourkey.actions[note.lane]
+            self.last_p1_lane = note.lane
             if note.hit:
                 self.hp += 0.02
                 self.last_note_missed = False
@@ -156,7 +155,7 @@ class FNFEngine(Engine[FourKeyChart, FourKeyNote]):
         self.all_judgements.append((self.latest_judgement_time, rt, self.latest_judgement))
 
         # Animation and hit/miss tracking
-        self.last_p1_action = keymap.fourkey.actions[note.lane]
+        self.last_p1_lane = note.lane
         if note.missed:
             self.misses += 1
             self.max_streak = max(self.streak, self.max_streak)
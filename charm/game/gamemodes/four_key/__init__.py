@@ -1,7 +1,13 @@
+from charm.lib.lazy import lazy_exports
+
 from .chart import FourKeyNoteType, FourKeyNote, FourKeyChart
-from .display import FourKeyDisplay
 from .engine import FourKeyEngine
-from .highway import FourKeyHighway
+
+__getattr__ = lazy_exports(__name__, {
+    "FourKeyDisplay": ".display",
+    "FourKeyHighway": ".highway"
+})
+
 
 __all__ = [
     "FourKeyNoteType",
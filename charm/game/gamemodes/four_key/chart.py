@@ -36,5 +36,5 @@ class FourKeyChart(Chart[FourKeyNote]):
     def calculate_indices(self) -> None:
         self.indices = FourKeyNIndexCollection(
             Index[Seconds, FourKeyNote](self.notes, 'time'),
-            Index[Seconds, Event](self.events, 'time')
+            self.event_index(Event)
         )
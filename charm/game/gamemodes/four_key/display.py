@@ -92,6 +92,9 @@ class FourKeyDisplay(Display[FourKeyChart, FNFEngine | FourKeyEngine]):
     def unpause(self) -> None:
         self._overlay_text.text = ""
 
+    def seek(self, song_time: Seconds) -> None:
+        self._highway.seek(song_time)
+
     def update(self, song_time: Seconds) -> None:
         self._song_time = song_time
 
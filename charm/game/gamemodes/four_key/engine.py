@@ -1,17 +1,20 @@
-from typing import cast
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, cast
 import logging
 import math
 from statistics import mean
 
-from arcade.clock import GLOBAL_CLOCK
-
-from charm.core.keymap import Action, keymap, KeyMap
 from charm.lib.types import Range4, Seconds
-from charm.lib.utils import clamp
 
-from charm.game.generic import Engine, Judgement, DigitalKeyEvent, Results, BaseResults
+from charm.game.generic import DigitalKeyEvent, Engine, EngineState, Judgement, LaneJudge, Results, BaseResults
 from .chart import FourKeyChart, FourKeyNote, FourKeyNoteType
 
+if TYPE_CHECKING:
+    from charm.core.keymap import Action, KeyMap
+
 logger = logging.getLogger("charm")
 
 # !: Should SMEngine exist?
@@ -27,6 +30,13 @@ logger = logging.getLogger("charm")
 # deserves to be documented.
 # !: TO REITERATE: THIS IS FINE. FourKeyEngine doesn't rely on simfile and possibly never has.
 class FourKeyEngine(Engine[FourKeyChart, FourKeyNote]):
+    config_fields = (*Engine.config_fields, "sustain_score_per_sec", "miss_on_sustain_break", "bomb_hp")
+    state_fields = (
+        *Engine.state_fields, "hp", "has_died", "latest_judgement", "latest_judgement_time",
+        "last_p1_lane", "last_note_missed", "active_sustains", "commited_score"
+    )
+    state_logs = ("all_judgements",)
+
     def __init__(self, chart: FourKeyChart, offset: Seconds = 0):  # TODO: Set this dynamically
         judgements = [
             #        ("name",           "key"             ms, score, acc, hp=0)
@@ -51,9 +61,9 @@ class FourKeyEngine(Engine[FourKeyChart, FourKeyNote]):
         self.latest_judgement_time = None
         self.all_judgements: list[tuple[Seconds, Seconds, Judgement]] = []
 
-        self.current_events: list[DigitalKeyEvent[Range4]] = []
+        self.lane_judge: LaneJudge[FourKeyNote] = LaneJudge(self.chart.notes, 4)
 
-        self.last_p1_action: Action | None = None
+        self.last_p1_lane: Range4 | None = None
         self.last_note_missed = False
         self.streak = 0
         self.max_streak = 0
@@ -62,34 +72,55 @@ class FourKeyEngine(Engine[FourKeyChart, FourKeyNote]):
         self.sustain_score_per_sec = self.judgements[0].score
         self.miss_on_sustain_break = True
 
+        # Sustains are scored from when they were hit to when they were let go (or ended), straight from the
+        # input timestamps, so it doesn't matter how often we update.
         self.active_sustains: list[FourKeyNote] = []
+        self.releases: list[deque[Seconds]] = [deque() for _ in range(4)]
+        self.commited_score: float = 0
         self.keystate: tuple[bool, bool, bool, bool] = (False, False, False, False)
 
-    def on_button_press(self, keymap: KeyMap) -> None:
-        self.keystate = keymap.fourkey.state
-        # ignore spam during front/back porch
-        if (self.chart_time < self.chart.notes[0].time - self.hit_window \
-           or self.chart_time > self.chart.notes[-1].time + self.hit_window):
-            return
-        action = keymap.fourkey.pressed_action
-        if action is None:
-            return
-        key = cast(Range4, keymap.fourkey.actions.index(action))
-        self.current_events.append(DigitalKeyEvent(self.chart_time, key, "down"))
-
-    def on_button_release(self, keymap: KeyMap) -> None:
-        self.keystate = keymap.fourkey.state
-        if self.last_p1_action is not None and not self.last_p1_action.held:
-            self.last_p1_action = None
-        # ignore spam during front/back porch
-        if (self.chart_time < self.chart.notes[0].time - self.hit_window \
-           or self.chart_time > self.chart.notes[-1].time + self.hit_window):
-            return
-        action = keymap.fourkey.released_action
-        if action is None:
-            return
-        key = cast(Range4, keymap.fourkey.actions.index(action))
-        self.current_events.append(DigitalKeyEvent(self.chart_time, key, "up"))
+    def set_keystate(self, lane: Range4, down: bool) -> None:
+        # Held keys come from the input events rather than the live keymap, so replays hold the same keys.
+        keystate = list(self.keystate)
+        keystate[lane] = down
+        self.keystate = cast(tuple[bool, bool, bool, bool], tuple(keystate))
+
+    @staticmethod
+    def bind_inputs(keymap: KeyMap) -> dict[Action, Range4]:
+        return {action: cast(Range4, i) for i, action in enumerate(keymap.fourkey.actions)}
+
+    def save_state(self) -> EngineState:
+        state = super().save_state()
+        state["lane_judge"] = self.lane_judge.save_state()
+        state["releases"] = tuple(tuple(r) for r in self.releases)
+        return state
+
+    def load_state(self, state: EngineState) -> None:
+        super().load_state(state)
+        self.lane_judge.load_state(state["lane_judge"])
+        self.releases = [deque(r) for r in state["releases"]]
+
+    def reset_stats(self) -> None:
+        super().reset_stats()
+        self.commited_score = 0
+        self.hp = 1
+        self.has_died = False
+        self.all_judgements.clear()
+
+    def on_input(self, events: Sequence[DigitalKeyEvent[Range4]]) -> None:
+        for event in events:
+            lane = event.key
+            self.set_keystate(lane, event.down)
+            if not event.down:
+                self.releases[lane].append(event.time)
+                if lane == self.last_p1_lane:
+                    self.last_p1_lane = None
+                continue
+            # ignore spam during front/back porch
+            if (event.time < self.chart.notes[0].time - self.hit_window \
+               or event.time > self.chart.notes[-1].time + self.hit_window):
+                continue
+            self.lane_judge.press(lane, event.time)
 
     @property
     def average_acc(self) -> float:
@@ -97,45 +128,17 @@ class FourKeyEngine(Engine[FourKeyChart, FourKeyNote]):
         return mean(j) if j else 0
 
     def calculate_score(self) -> None:
-        # Get all non-scored notes within the current window
-        for note in self.current_notes[:]:
-            if note.time > self.chart_time + self.hit_window:
-                break
-
-            # Get sustains in the window and add them to the active sustains list
-            if note.is_sustain and note not in self.active_sustains:
-                self.active_sustains.append(note)
-            # Missed notes (current time is higher than max allowed time for note)
-            if self.chart_time - self.hit_window > note.time:
-                note.missed = True
-                note.hit_time = math.inf  # how smart is this? :thinking:
-                self.score_note(note)
-                self.current_notes.remove(note)
-            else:
-                # Check non-used events to see if one matches our note
-                for event in (e for e in self.current_events if e.new_state == "down"):
-                    # We've determined the note was hit
-                    if event.key == note.lane and abs(event.time - note.time) <= self.hit_window:
-                        note.hit = True
-                        note.hit_time = event.time
-                        self.score_note(note)
-                        try:
-                            self.current_notes.remove(note)
-                        except ValueError:
-                            logger.info("Note removal failed!")
-                        self.current_events.remove(event)
-                        self.last_note_hit = note
-                        break
-
-        for sustain in self.active_sustains:
-            if self.chart_time > sustain.end + self.hit_window:
-                self.active_sustains.remove(sustain)
+        # Hit or miss everything that's been decided since the last frame (sustains start when they're hit)
+        for note in self.lane_judge.judge(self.chart_time, self.hit_window):
+            self.score_note(note)
+            if note.hit:
+                self.last_note_hit = note
 
         # Check sustains
         self.score_sustains()
 
         # Make sure we can't go below min_hp or above max_hp
-        self.hp = clamp(self.min_hp, self.hp, self.max_hp)
+        self.hp = min(max(self.hp, self.min_hp), self.max_hp)
         if self.hp == self.min_hp:
             self.has_died = True
 
@@ -154,7 +157,7 @@ class FourKeyEngine(Engine[FourKeyChart, FourKeyNote]):
 
         # Score the note
         j = self.get_note_judgement(note)
-        self.score += j.score
+        self.commited_score += j.score
         self.weighted_hit_notes += j.accuracy_weight
 
         # Judge the player
@@ -164,7 +167,7 @@ class FourKeyEngine(Engine[FourKeyChart, FourKeyNote]):
         self.all_judgements.append((self.latest_judgement_time, rt, self.latest_judgement))
 
         # Animation and hit/miss tracking
-        self.last_p1_action = keymap.fourkey.actions[note.lane]
+        self.last_p1_lane = note.lane
         if note.missed:
             self.misses += 1
             self.streak = 0
@@ -176,21 +179,36 @@ class FourKeyEngine(Engine[FourKeyChart, FourKeyNote]):
             self.last_note_missed = False
 
             # We just hit a sustain, get it set as active:
-            if note.is_sustain and note not in self.active_sustains:
+            # (By identity, every Note compares equal to every other one.)
+            if note.is_sustain and all(s is not note for s in self.active_sustains):
                 self.active_sustains.append(note)
 
+    def sustain_score(self, sustain: FourKeyNote, until: Seconds) -> float:
+        """What holding this sustain from when it was hit until `until` is worth."""
+        start = max(sustain.time, sustain.hit_time)  # type: ignore -- only hit sustains are active
+        return self.sustain_score_per_sec * max(0.0, min(until, sustain.end) - start)
+
+    def end_sustain(self, sustain: FourKeyNote, time: Seconds) -> None:
+        self.commited_score += self.sustain_score(sustain, time)
+        self.active_sustains = [s for s in self.active_sustains if s is not sustain]
+        if time < sustain.end and self.miss_on_sustain_break:
+            self.streak = 0
+
     def score_sustains(self) -> None:
-        dt = GLOBAL_CLOCK.dt
-
-        kill = []
-        for sustain in self.active_sustains:
-            if self.keystate[sustain.lane]:
-                self.score += self.sustain_score_per_sec * dt
-            else:
-                if self.miss_on_sustain_break:
-                    self.streak = 0
-                kill.append(sustain)
-        self.active_sustains = [s for s in self.active_sustains if s not in kill]
+        for lane, releases in enumerate(self.releases):
+            while releases:
+                released = releases.popleft()
+                for sustain in self.active_sustains:
+                    # Letting go before the sustain was hit doesn't count against it
+                    if sustain.lane == lane and sustain.hit_time <= released:  # type: ignore -- only hit sustains are active
+                        self.end_sustain(sustain, released)
+                        break
+
+        for sustain in [s for s in self.active_sustains if s.end <= self.chart_time]:
+            self.end_sustain(sustain, sustain.end)
+
+        # Show the sustains filling up as they're held
+        self.score = self.commited_score + sum(self.sustain_score(s, self.chart_time) for s in self.active_sustains)
 
     def generate_results(self) -> BaseResults:
         return Results(
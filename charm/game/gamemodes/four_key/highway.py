@@ -1,5 +1,4 @@
-from functools import cache
-from importlib.resources import files
+from functools import partial
 import logging
 
 import PIL.Image
@@ -8,28 +7,28 @@ import arcade
 from arcade import SpriteList, Texture
 from arcade.types import Color
 
-import charm.data.images.skins as skins
 from charm.core.charm import load_missing_texture
+from charm.lib.assets import ASSETS, Skin
+from charm.lib.atlas import BakedAtlas, bake
 from charm.lib.pool import Pool, SpritePool
 from charm.lib.utils import img_from_path
 
-from charm.game.generic import Highway
-from charm.game.generic.sprite import NoteSprite, StrikelineSprite, SustainSprites, SustainTextureDict, SustainTextures, get_note_color_by_beat
+from charm.game.generic import Highway, NoteCursor
+from charm.game.generic.sprite import BEAT_COLORS, NoteSprite, StrikelineSprite, SustainSprites, SustainTextureDict, SustainTextures, get_note_color_by_beat
 from .chart import FourKeyChart, FourKeyNote, FourKeyNoteType
 from .engine import FourKeyEngine
 
 logger = logging.getLogger("charm")
 
 
-@cache
-def load_note_texture(note_type: str, note_lane: int, height: int, value: int = 0, *, fnf: bool = False) -> Texture:
+def load_note_texture(skin: Skin, note_type: str, note_lane: int, height: int, value: int = 0, *, fnf: bool = False) -> Texture:
     if value and note_type == FourKeyNoteType.NORMAL:
         # "Beat colors", which color a note based on where it lands in the beat.
         # This is useful for desnely packed patterns, and some rhythm games rely
         # on it for readability.
         image_name = f"gray-{note_lane + 1}"
         try:
-            image = img_from_path(files(skins) / "fourkey" / f"{image_name}.png")
+            image = img_from_path(skin.find("fourkey", f"{image_name}.png"))
             if image.height != height:
                 width = int((height / image.height) * image.width)
                 image = image.resize((width, height), PIL.Image.LANCZOS)
@@ -46,9 +45,9 @@ def load_note_texture(note_type: str, note_lane: int, height: int, value: int =
         image_name = f"{note_type}-{note_lane + 1}"
         try:
             if fnf:  # HACK: probably not a great way to do this!
-                image = img_from_path(files(skins) / "fnf" / f"{image_name}.png")
+                image = img_from_path(skin.find("fnf", f"{image_name}.png"))
             else:
-                image = img_from_path(files(skins) / "fourkey" / f"{image_name}.png")
+                image = img_from_path(skin.find("fourkey", f"{image_name}.png"))
             if image.height != height:
                 width = int((height / image.height) * image.width)
                 image = image.resize((width, height), PIL.Image.LANCZOS)
@@ -58,45 +57,57 @@ def load_note_texture(note_type: str, note_lane: int, height: int, value: int =
     return Texture(image)
 
 
+def note_texture_height(note_type: str, size: int) -> int:
+    return size // 2 if note_type == "cap" else size
+
+
+def bake_note_textures(skin: Skin, size: int) -> BakedAtlas:
+    """Every note, sustain and strikeline texture the highway uses at `size` (and every beat color), in one atlas."""
+    recipes = {}
+    for lane in range(4):
+        for note_type in (FourKeyNoteType.NORMAL, FourKeyNoteType.BOMB, FourKeyNoteType.DEATH, FourKeyNoteType.HEAL, FourKeyNoteType.CAUTION, FourKeyNoteType.STRIKELINE, "tail", "body", "cap"):
+            recipes[f"{note_type}-{lane}"] = partial(load_note_texture, skin, note_type, lane, note_texture_height(note_type, size))
+        for value in BEAT_COLORS:
+            recipes[f"{FourKeyNoteType.NORMAL}-{lane}-{value}"] = partial(load_note_texture, skin, FourKeyNoteType.NORMAL, lane, size, value)
+    return bake("fourkey", skin.folders("fourkey"), size, recipes)
+
+
 class FourKeyHighway(Highway[FourKeyChart, FourKeyNote, FourKeyEngine]):
     def __init__(self, chart: FourKeyChart, engine: FourKeyEngine, pos: tuple[int, int], size: tuple[int, int] | None = None, gap: int = 5):
         super().__init__(chart, engine, pos, size, gap)
 
+        # Baked (or read off disk) while the rest of the highway gets set up
+        atlas = ASSETS.load(("fourkey", self.note_size), partial(bake_note_textures, size=self.note_size))
+
         # TODO: re-add the functionality of
         self.viewport = 0.75  # TODO: BPM scaling?
 
         # NOTE POOL DEFINITION AND CONSTRUCTION
 
-        # Generators are great for ease, but it means we can't really 'scrub' backwards through the song
-        # So this is a patch job at best.
-        self._note_generator = (note for note in self.notes if note.type != 'sustain')
-        self._note_pool: SpritePool[NoteSprite] = SpritePool([NoteSprite(x=-1000.0, y=-1000.0) for _ in range(1000)])
+        # Notes are drawn until they end, so a seek picks up anything still on screen.
+        self._note_cursor: NoteCursor[FourKeyNote] = NoteCursor((note for note in self.notes if note.type != 'sustain'), by_end=True)
+        self._note_pool: SpritePool[NoteSprite] = SpritePool.from_callback(
+            self.pool_size(self._note_cursor), lambda _: NoteSprite(x=-1000.0, y=-1000.0), name="4K notes"
+        )
         # self._note_sprites = SpriteList(capacity=1024)
         # self._note_sprites.extend(self._note_pool.source)
 
+        self._atlas: BakedAtlas = atlas.result()
         self._note_textures = {
-            t: {l: load_note_texture(t, l, self.note_size) for l in range(4)} for t in (FourKeyNoteType.NORMAL, FourKeyNoteType.BOMB, FourKeyNoteType.DEATH, FourKeyNoteType.HEAL, FourKeyNoteType.CAUTION)
+            t: {l: self.note_texture(t, l) for l in range(4)} for t in (FourKeyNoteType.NORMAL, FourKeyNoteType.BOMB, FourKeyNoteType.DEATH, FourKeyNoteType.HEAL, FourKeyNoteType.CAUTION)
         }
 
-        self._next_note = next(self._note_generator, None)
-
         # SUSTAIN POOL DEFINITION AND CONSTRUCTION
 
-        # Generators are great for ease, but it means we can't really 'scrub' backwards through the song
-        # So this is a patch job at best.
-        self._sustain_generator = (note for note in self.notes if note.length)
+        self._sustain_cursor: NoteCursor[FourKeyNote] = NoteCursor((note for note in self.notes if note.length), by_end=True)
 
-        self._sustain_pool: Pool[SustainSprites] = Pool([SustainSprites(self.note_size) for _ in range(100)])
         self._sustain_sprites = SpriteList(capacity=512)
-        for sustain in self._sustain_pool.source:
-            self._sustain_sprites.extend(sustain.get_sprites())
+        self._sustain_pool: Pool[SustainSprites] = Pool.from_callback(self.pool_size(self._sustain_cursor), self._make_sustain, name="4K sustains")
 
         self._sustain_textures: dict[int, SustainTextureDict] = {
-            i: {'primary': SustainTextures(load_note_texture('tail', i, self.note_size), load_note_texture('body', i, self.note_size), load_note_texture('cap', i, self.note_size // 2))}
+            i: {'primary': SustainTextures(self.note_texture('tail', i), self.note_texture('body', i), self.note_texture('cap', i))}
         for i in range(4)}
 
-        self._next_sustain = next(self._sustain_generator, None)
-
         self.bg_color: Color = Color(0, 0, 0, 128)  # SKIN
         self.show_hit_window = False
 
@@ -106,8 +117,8 @@ class FourKeyHighway(Highway[FourKeyChart, FourKeyNote, FourKeyEngine]):
             x = self.lane_x(lane) + self.note_size/2.0
             sprite = StrikelineSprite(
                 x, y,
-                active_texture=load_note_texture("normal", lane, self.note_size),
-                inactive_texture=load_note_texture("strikeline", lane, self.note_size)
+                active_texture=self.note_texture("normal", lane),
+                inactive_texture=self.note_texture("strikeline", lane)
             )
             self.strikeline.append(sprite)
 
@@ -119,32 +130,53 @@ class FourKeyHighway(Highway[FourKeyChart, FourKeyNote, FourKeyEngine]):
 
         self.keystate = (False, False, False, False)
 
+    def _make_sustain(self, idx: int) -> SustainSprites:
+        sustain = SustainSprites(self.note_size)
+        self._sustain_sprites.extend(sustain.get_sprites())
+        return sustain
+
+    def note_texture(self, note_type: str, lane: int, value: int = 0) -> Texture:
+        key = f"{note_type}-{lane}-{value}" if value and note_type == FourKeyNoteType.NORMAL else f"{note_type}-{lane}"
+        return self._atlas.get(key, lambda: load_note_texture(self.skin, note_type, lane, note_texture_height(note_type, self.note_size), value))
+
     def update(self, song_time: float) -> None:
         super().update(song_time)
 
-        while self._next_note is not None and self._next_note.time <= (song_time + self.viewport) and self._note_pool.has_free_slot():
+        until = song_time + self.viewport
+        while self._note_pool.has_free_slot() and (note := self._note_cursor.pop(until)) is not None:
             sprite = self._note_pool.get()
-            sprite.texture = self._note_textures[self._next_note.type][self._next_note.lane]
-            sprite.note = self._next_note
-            sprite.position = self.lane_x(self._next_note.lane) + sprite.width/2.0, self.note_y(sprite.note.time) - sprite.height/2.0
+            sprite.texture = self._note_textures[note.type][note.lane]
+            sprite.note = note
+            sprite.position = self.lane_x(note.lane) + sprite.width/2.0, self.note_y(note.time) - sprite.height/2.0
             sprite.visible = True
+            self._note_pool.set_key(sprite, note.time)
 
-            self._next_note = next(self._note_generator, None)
-
-        while self._next_sustain is not None and self._next_sustain.time <= (song_time + self.viewport) and self._sustain_pool.has_free_slot():
+        while self._sustain_pool.has_free_slot() and (note := self._sustain_cursor.pop(until)) is not None:
             sustain = self._sustain_pool.get()
             sustain.place(
-                self._next_sustain,
-                self.lane_x(self._next_sustain.lane) + sustain.size/2.0,
+                note,
+                self.lane_x(note.lane) + sustain.size/2.0,
                 self.strikeline_y - sustain.size/2.0,
-                self._next_sustain.length * self.px_per_s,
-                self._sustain_textures[self._next_sustain.lane]
+                note.length * self.px_per_s,
+                self._sustain_textures[note.lane]
             )
 
-            self._next_sustain = next(self._sustain_generator, None)
-
         self.update_strikeline()
 
+    def seek(self, song_time: float) -> None:
+        super().seek(song_time)
+        for sprite in self._note_pool.given():
+            sprite.position = -1000.0, -1000.0
+            sprite.visible = False
+        self._note_pool.give_all()
+        for sustain in self._sustain_pool.given():
+            sustain.hide()
+        self._sustain_pool.give_all()
+
+        # Everything still on screen gets a sprite again on the next update.
+        self._note_cursor.seek(song_time - 0.1)
+        self._sustain_cursor.seek(song_time - 0.1)
+
     def update_strikeline(self) -> None:
         if self.keystate == self.engine.keystate:
             return
@@ -182,17 +214,17 @@ class FourKeyHighway(Highway[FourKeyChart, FourKeyNote, FourKeyEngine]):
                                                   (255, 0, 0, 128))
             self.strikeline.draw()
 
-            for sprite in self._note_pool.given_items:
-                # TODO note_y and lane_x need to work of center not top left
-                sprite.center_y = self.note_y(sprite.note.time) - sprite.height/2.0
-                sprite.center_x = self.lane_x(sprite.note.lane) + sprite.width/2.0
-
+            # Notes stay in their lane, so only y changes. Only the notes near the strikeline can be hit or go past it.
+            # TODO note_y and lane_x need to work of center not top left
+            times = self._note_pool.given_keys()
+            self._note_pool.move_given(y=self.note_ys(times) - self.note_size/2.0)
+            for sprite in self._note_pool.given_where(times <= self.song_time + self.engine.hit_window):
                 if sprite.note.hit or sprite.note.end <= (self.song_time - 0.1):
                     sprite.position = -1000.0, -1000.0
                     sprite.visible = False
                     self._note_pool.give(sprite)
 
-            for sustain in self._sustain_pool.given_items:
+            for sustain in self._sustain_pool.given():
                 sustain.update_texture()
                 sustain.update_sustain(self.note_y(sustain.note.time) - sustain.size/2.0, sustain.note.length * self.px_per_s)
                 if sustain.note.end <= (self.song_time - 0.1):
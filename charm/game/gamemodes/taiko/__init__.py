@@ -1,7 +1,13 @@
+from charm.lib.lazy import lazy_exports
+
 from .chart import TaikoNoteType, TaikoNote, TaikoChart
-from .display import TaikoDisplay
 from .engine import TaikoEngine
-from .highway import TaikoHighway
+
+__getattr__ = lazy_exports(__name__, {
+    "TaikoDisplay": ".display",
+    "TaikoHighway": ".highway"
+})
+
 
 __all__ = [
     "TaikoNoteType",
@@ -36,6 +36,9 @@ class TaikoDisplay(Display[TaikoChart, TaikoEngine]):
         self.timer.current_time = song_time
         self.timer.update(self._win.delta_time)
 
+    def seek(self, song_time: Seconds) -> None:
+        self.highway.seek(song_time)
+
     def draw(self) -> None:
         self.highway.draw()
 
@@ -1,8 +1,6 @@
-from typing import Any
-from collections.abc import Generator, Sequence
+from collections.abc import Sequence
 
-from functools import cache
-from importlib.resources import files
+from functools import partial
 import logging
 
 import PIL.Image
@@ -10,22 +8,21 @@ import PIL.Image
 from arcade import LRBT, draw_arc_filled, draw_arc_outline, draw_circle_outline, draw_rect_filled, draw_circle_filled, Texture, color
 
 from charm.core.charm import load_missing_texture
+from charm.lib.assets import ASSETS, Skin
+from charm.lib.atlas import BakedAtlas, bake
 from charm.lib.pool import SpritePool
 from charm.lib.utils import img_from_path
 
-from charm.game.generic import NoteSprite, AutoEngine, Engine, Highway
+from charm.game.generic import NoteSprite, AutoEngine, Engine, Highway, NoteCursor
 from .chart import TaikoChart, TaikoNoteType, TaikoNote
 from .engine import TaikoEngine
 
-import charm.data.images.skins as skins
-
 logger = logging.getLogger("charm")
 
-@cache
-def load_note_texture(note_type: str, height: int) -> Texture:
+def load_note_texture(skin: Skin, note_type: str, height: int) -> Texture:
     image_name = f"{note_type}"
     try:
-        image = img_from_path(files(skins) / "taiko" / f"{image_name}.png")
+        image = img_from_path(skin.find("taiko", f"{image_name}.png"))
         if image.height != height:
             width = int((height / image.height) * image.width)
             image = image.resize((width, height), PIL.Image.LANCZOS)
@@ -34,6 +31,13 @@ def load_note_texture(note_type: str, height: int) -> Texture:
         return load_missing_texture(height, height)
     return Texture(image)
 
+
+def bake_note_textures(skin: Skin, size: int) -> BakedAtlas:
+    """Every note texture the highway uses at `size`, in one atlas."""
+    recipes = {note_type: partial(load_note_texture, skin, note_type, size) for note_type in TaikoNoteType}
+    return bake("taiko", skin.folders("taiko"), size, recipes)
+
+
 TAIKO_LANE_COUNT = 1  #*
 
 
@@ -42,11 +46,13 @@ class TaikoHighway(Highway[TaikoChart, TaikoNote, TaikoEngine]):
         super().__init__(chart, engine, pos, size, gap, viewport)
         self.color = (0, 0, 0, 128)  # TODO: eventually this will be a scrolling image.
 
-        # Generators are great for ease, but it means we can't really 'scrub' backwards through the song
-        # So this is a patch job at best.
-        self._note_generator: Generator[TaikoNote, Any, None] = (note for note in self.notes) # type: ignore[]
-        self._note_pool: SpritePool[NoteSprite] = SpritePool([NoteSprite(x=-1000.0, y=-1000.0) for _ in range(1000)])
-        self._next_note: TaikoNote | None = next(self._note_generator, None)
+        # Baked (or read off disk) while the rest of the highway gets set up
+        atlas = ASSETS.load(("taiko", self.note_size), partial(bake_note_textures, size=self.note_size))
+        self._note_cursor: NoteCursor[TaikoNote] = NoteCursor(self.notes)
+        self._note_pool: SpritePool[NoteSprite] = SpritePool.from_callback(
+            self.pool_size(self._note_cursor, self.horizontal_viewport), lambda _: NoteSprite(x=-1000.0, y=-1000.0), name="Taiko notes"
+        )
+        self._atlas: BakedAtlas = atlas.result()
 
         # Auto highway viz
         self.auto = isinstance(Engine, AutoEngine)
@@ -76,24 +82,35 @@ class TaikoHighway(Highway[TaikoChart, TaikoNote, TaikoEngine]):
     def update(self, song_time: float) -> None:
         super().update(song_time)
 
-        while self._next_note is not None and self._next_note.time <= (self.song_time + self.horizontal_viewport) and self._note_pool.has_free_slot():
-            note = self._next_note
+        until = self.song_time + self.horizontal_viewport
+        while self._note_pool.has_free_slot() and (note := self._note_cursor.pop(until)) is not None:
             sprite = self._note_pool.get()
-            sprite.texture = load_note_texture(note.type, self.note_size)
+            sprite.texture = self._atlas.get(note.type, partial(load_note_texture, self.skin, note.type, self.note_size))
             sprite.position = -self.note_y(note.time), self.y + (self.h / 2)
             sprite.scale = 1.5 if note.large else 1.0
             sprite.visible = True
             sprite.note = note
+            self._note_pool.set_key(sprite, note.time)
 
-            self._next_note = next(self._note_generator, None)
-
-        for sprite in self._note_pool.given_items:
-            sprite.center_x = -self.note_y(sprite.note.time)
+        # Every note moves at once, and only the ones near the strikeline can be hit or go past it
+        times = self._note_pool.given_keys()
+        self._note_pool.move_given(x=-self.note_ys(times))
+        for sprite in self._note_pool.given_where(times <= song_time + self.engine.hit_window):
             if sprite.note.hit or sprite.note.time <= (song_time - 0.1):
                 sprite.visible = False
                 sprite.position = -1000.0, -1000.0
                 self._note_pool.give(sprite)
 
+    def seek(self, song_time: float) -> None:
+        super().seek(song_time)
+        for sprite in self._note_pool.given():
+            sprite.visible = False
+            sprite.position = -1000.0, -1000.0
+        self._note_pool.give_all()
+
+        # Everything still on screen gets a sprite again on the next update.
+        self._note_cursor.seek(song_time - 0.1)
+
     @property
     def pos(self) -> tuple[int, int]:
         return self._pos
@@ -1,14 +1,27 @@
-from .chart import Note, Event, BPMChangeEvent, Chart, CountdownEvent, BaseChart
-from .display import Display, BaseDisplay
+from charm.lib.lazy import lazy_exports
+
+from .chart import Note, Event, BPMChangeEvent, Chart, CountdownEvent, LyricEvent, BaseChart
 from .judgement import Judgement
-from .engine import EngineEvent, DigitalKeyEvent, Engine, AutoEngine, BaseEngine
-from .highway import Highway
+from .judging import LaneJudge
+from .engine import EngineEvent, DigitalKeyEvent, Engine, AutoEngine, BaseEngine, EngineState
 from .metadata import ChartSetMetadata, ChartMetadata
-from .results import Results, ScoreJSON, Heatmap, BaseResults
+from .results import Results, ScoreJSON, BaseResults
 from .chartset import ChartSet
-from .sprite import NoteSprite
+from .replay import Replay, ReplayRecorder, ReplayPlayer
 from .parser import Parser
 
+# Everything above is plain Python, so engines can be run (and pickled) without a window.
+# The parts that draw need arcade, they only get imported when they're asked for.
+__getattr__ = lazy_exports(__name__, {
+    "Display": ".display",
+    "BaseDisplay": ".display",
+    "Highway": ".highway",
+    "NoteCursor": ".highway",
+    "Heatmap": ".heatmap",
+    "NoteSprite": ".sprite"
+})
+
+
 
 __all__ = [
     "Note",
@@ -16,16 +29,20 @@ __all__ = [
     "BPMChangeEvent",
     "Chart",
     "CountdownEvent",
+    "LyricEvent",
     "BaseChart",
     "Display",
     "BaseDisplay",
     "Judgement",
+    "LaneJudge",
     "EngineEvent",
     "DigitalKeyEvent",
     "Engine",
     "AutoEngine",
     "BaseEngine",
+    "EngineState",
     "Highway",
+    "NoteCursor",
     "ChartSetMetadata",
     "ChartMetadata",
     "Results",
@@ -33,6 +50,9 @@ __all__ = [
     "Heatmap",
     "BaseResults",
     "ChartSet",
+    "Replay",
+    "ReplayRecorder",
+    "ReplayPlayer",
     "NoteSprite",
     "Parser"
 ]
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from bisect import bisect_left, insort
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
 from enum import StrEnum
 from functools import total_ordering
-from typing import Any, Generic, Self, TypeVar
+from heapq import merge
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Generic, Self, SupportsIndex, TypeVar, overload
 
+from charm.lib.listview import ListView
 from charm.lib.types import Seconds
 
 from .metadata import ChartMetadata
 
+if TYPE_CHECKING:
+    from nindex import Index
+
+    from .practice import Section
+
 type BaseNote = Note[BaseChart, StrEnum]
 type BaseChart = Chart[BaseNote]
 
@@ -131,12 +140,170 @@ class CountdownEvent(Event):
         return self.__repr__()
 
 
+class LyricEvent(Event):
+    """A line (or a bit of a line) of lyrics.
+
+    * `length: float`: how long it's shown for.
+    * `text: str`: the lyric itself.
+    * `karaoke: str`: the whole line it's part of, if it's sung a bit at a time."""
+    def __init__(self, time: Seconds, length: Seconds, text: str, karaoke: str = ""):
+        self.time = time
+        self.length = length
+        self.text = text
+        self.karaoke = karaoke
+
+    @property
+    def end_time(self) -> Seconds:
+        return self.time + self.length
+
+    @end_time.setter
+    def end_time(self, v: Seconds) -> None:
+        self.length = v - self.time
+
+
+_time = attrgetter("time")
+
+
+class EventList(list[Event]):
+    """A chart's events, which also keeps them split up by type.
+
+    It's a normal list (in whatever order the events were added, or sorted into) but every change
+    also files the event under its type, in time order. That makes `of_type` a dictionary lookup
+    instead of a scan over every event, no matter how the parser builds the list up."""
+    def __init__(self, events: Iterable[Event] = ()):
+        super().__init__()
+        # Every event by its exact type, in time order
+        self._by_type: dict[type[Event], list[Event]] = {}
+        # Answers to of_type and index, dropped whenever an event of a type under them changes
+        self._answers: dict[type[Event], list[Event]] = {}
+        self._indices: dict[tuple[type[Event], str], Index[Any, Any]] = {}
+        self.extend(events)
+
+    def __reduce__(self) -> tuple[type[EventList], tuple[list[Event]]]:
+        # Pickling a list subclass adds the items before its attributes are back, so just build it again.
+        return (EventList, (list(self),))
+
+    def _changed(self, t: type[Event]) -> None:
+        for q in [q for q in self._answers if issubclass(t, q)]:
+            del self._answers[q]
+        for key in [key for key in self._indices if issubclass(t, key[0])]:
+            del self._indices[key]
+
+    def _file(self, event: Event) -> None:
+        t = type(event)
+        if (events := self._by_type.get(t)) is None:
+            events = self._by_type[t] = []
+        # Parsers mostly add events in order, so this is usually just an append
+        if not events or events[-1].time <= event.time:
+            events.append(event)
+        else:
+            insort(events, event, key=_time)
+        self._changed(t)
+
+    def _unfile(self, event: Event) -> None:
+        t = type(event)
+        events = self._by_type[t]
+        i = bisect_left(events, event.time, key=_time)
+        while i < len(events) and events[i] is not event:
+            i += 1
+        if i == len(events):
+            # Its time was changed after it was added, so it isn't where it should be
+            i = next(i for i, e in enumerate(events) if e is event)
+        del events[i]
+        self._changed(t)
+
+    def of_type[T: Event](self, t: type[T]) -> list[T]:
+        """Every event that's a `t` (subclasses included), in time order.
+
+        This is the store's own list, not a copy. Don't change it, change the EventList."""
+        if (events := self._answers.get(t)) is None:
+            matching = [v for k, v in self._by_type.items() if issubclass(k, t)]
+            # Usually it's just the one type, otherwise they're merged (and the merge kept until one of them changes)
+            events = self._answers[t] = matching[0] if len(matching) == 1 else list(merge(*matching, key=_time))
+        return events  # type: ignore[return-value]
+
+    def type_index[T: Event](self, t: type[T], attr: str = "time") -> Index[Any, T]:
+        """An `Index` over `of_type(t)` by `attr`, kept until events of that type change."""
+        if (index := self._indices.get((t, attr))) is None:
+            from nindex import Index
+            # Its own copy, so it can't change under the index
+            index = self._indices[(t, attr)] = Index(list(self.of_type(t)), attr)
+        return index
+
+    # -- Everything that changes the list has to go through the types too --
+
+    def append(self, event: Event) -> None:
+        super().append(event)
+        self._file(event)
+
+    def extend(self, events: Iterable[Event]) -> None:
+        events = list(events)
+        super().extend(events)
+        for event in events:
+            self._file(event)
+
+    def __iadd__(self, events: Iterable[Event]) -> Self:  # type: ignore[override]
+        self.extend(events)
+        return self
+
+    def insert(self, i: SupportsIndex, event: Event) -> None:
+        super().insert(i, event)
+        self._file(event)
+
+    def remove(self, event: Event) -> None:
+        self.pop(self.index(event))
+
+    def pop(self, i: SupportsIndex = -1) -> Event:
+        event = super().pop(i)
+        self._unfile(event)
+        return event
+
+    def clear(self) -> None:
+        super().clear()
+        for t in list(self._by_type):
+            self._changed(t)
+        self._by_type.clear()
+
+    @overload
+    def __setitem__(self, i: SupportsIndex, value: Event) -> None: ...
+    @overload
+    def __setitem__(self, i: slice, value: Iterable[Event]) -> None: ...
+    def __setitem__(self, i: SupportsIndex | slice, value: Event | Iterable[Event]) -> None:
+        if isinstance(i, slice):
+            old, new = self[i], list(value)  # type: ignore[arg-type]
+            super().__setitem__(i, new)
+        else:
+            old, new = [self[i]], [value]
+            super().__setitem__(i, value)  # type: ignore[arg-type]
+        for event in old:
+            self._unfile(event)
+        for event in new:
+            self._file(event)  # type: ignore[arg-type]
+
+    def __delitem__(self, i: SupportsIndex | slice) -> None:
+        old = self[i] if isinstance(i, slice) else [self[i]]
+        super().__delitem__(i)
+        for event in old:
+            self._unfile(event)
+
+
 class Chart(Generic[N]):
     """A collection of notes and events, with helpful metadata."""
     def __init__(self, metadata: ChartMetadata, notes: Sequence[N], events: Sequence[Event]) -> None:
         self.metadata: ChartMetadata = metadata
         self.notes = list(notes)
-        self.events = list(events)
+        self.events = events
+
+        # A time sorted copy for notes_between, made when it's first asked for
+        self._note_timeline: tuple[list[N], list[Seconds]] | None = None
+
+    @property
+    def events(self) -> EventList:
+        return self._events
+
+    @events.setter
+    def events(self, events: Iterable[Event]) -> None:
+        self._events = EventList(events)
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.metadata.gamemode}/{self.metadata.instrument}/{self.metadata.difficulty}>"
@@ -145,8 +312,33 @@ class Chart(Generic[N]):
         return self.__repr__()
 
     def events_by_type[T: Event](self, t: type[T]) -> list[T]:
-        return [e for e in self.events if isinstance(e, t)]
+        """Every event that's a `t`, in time order. This is the chart's own list, copy it before changing it."""
+        return self._events.of_type(t)
+
+    def event_index[T: Event](self, t: type[T], attr: str = "time") -> Index[Any, T]:
+        """An `Index` of the events that are a `t` by `attr`. It's cached until events of that type are added or removed."""
+        return self._events.type_index(t, attr)
+
+    def notes_between(self, start: Seconds, end: Seconds) -> ListView[N]:
+        """Every note starting in [start, end), in time order.
+
+        This is two bisects and a view (nothing gets copied) so it costs the same however long the chart is,
+        it's meant for things that run every frame. Only use it once the chart's done being parsed."""
+        if self._note_timeline is None or len(self._note_timeline[0]) != len(self.notes):
+            notes = sorted(self.notes, key=lambda n: n.time)
+            self._note_timeline = (notes, [n.time for n in notes])
+        notes, times = self._note_timeline
+        return ListView(notes, bisect_left(times, start), bisect_left(times, end))
+
+    def events_between[T: Event](self, t: type[T], start: Seconds, end: Seconds) -> ListView[T]:
+        """Every event of type `t` starting in [start, end), in time order. See `notes_between`."""
+        events = self.events_by_type(t)
+        return ListView(events, bisect_left(events, start, key=_time), bisect_left(events, end, key=_time))
 
     def calculate_indices(self) -> None:
         """An overridable method for charts to generate their NIndex collections"""
         pass
+
+    def sections(self) -> Sequence[Section]:
+        """The named parts of the song (verse, chorus...) in time order, for practice mode. Most charts don't have any."""
+        return ()
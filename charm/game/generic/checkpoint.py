@@ -0,0 +1,121 @@
+"""
+Rewinding an engine.
+
+Engines only go forward, and judging writes straight into the notes, so going back means
+putting both the engine and the notes back how they were. Every so often `Checkpoints` saves
+the engine's state (`Engine.save_state`) and the hit/miss state of the notes near the current time.
+
+Notes well behind a checkpoint can't change any more, and notes well ahead of it haven't been
+touched yet, so a checkpoint only has to keep the few in between. Rewinding loads the
+last checkpoint before the target, then plays the recorded frames back up to it. A rewind
+is never more than `interval` seconds of frames, no matter how far into the song it is.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+import math
+
+from charm.lib.types import Seconds
+
+from .engine import BaseEngine, EngineState
+from .replay import ReplayFrame, play_frame
+
+CHECKPOINT_INTERVAL: Seconds = 2.0
+# Extra room past the hit window on both sides, for anything that judges a little outside it
+CHECKPOINT_MARGIN: Seconds = 1.0
+
+HIT = 1
+MISSED = 2
+
+
+@dataclass
+class Checkpoint:
+    time: Seconds  # The song time of the last frame before it
+    frame_idx: int  # How many frames had been played
+    state: EngineState
+    # The notes in [lo, hi), by time. Everything before lo is settled and everything after hi is untouched.
+    lo: int
+    hi: int
+    note_states: bytes
+    hit_times: array[float]  # nan for notes without one
+
+
+class Checkpoints:
+    """Snapshots of an engine as it's fed `frames`, so it can be rewound.
+
+    `frames` is the list the frames are being played from (a replay's) or recorded into (a recorder's.)"""
+    def __init__(self, engine: BaseEngine, frames: list[ReplayFrame], interval: Seconds = CHECKPOINT_INTERVAL):
+        self.engine = engine
+        self.frames = frames
+        self.interval = interval
+
+        self.notes = sorted(engine.chart.notes, key=lambda n: n.time)
+        self.note_times: list[Seconds] = [n.time for n in self.notes]
+
+        self.checkpoints: list[Checkpoint] = []
+        self.times: list[Seconds] = []
+        self.next_time: Seconds = -math.inf
+        self.take(0)
+
+    @property
+    def horizon(self) -> Seconds:
+        return self.engine.hit_window + CHECKPOINT_MARGIN
+
+    def take(self, frame_idx: int) -> Checkpoint:
+        """Save the engine as it is after playing `frames[:frame_idx]`."""
+        # The first checkpoint is wherever the engine started, which isn't always the start of the song (see practice mode.)
+        time = self.frames[frame_idx - 1].time if frame_idx else -math.inf
+        chart_time = self.engine.chart_time
+        lo = bisect_right(self.note_times, chart_time - self.horizon)
+        hi = bisect_right(self.note_times, chart_time + self.horizon)
+
+        notes = self.notes[lo:hi]
+        note_states = bytes(note.hit * HIT | note.missed * MISSED for note in notes)
+        hit_times = array("d", (math.nan if note.hit_time is None else note.hit_time for note in notes))
+
+        checkpoint = Checkpoint(time, frame_idx, self.engine.save_state(), lo, hi, note_states, hit_times)
+        self.checkpoints.append(checkpoint)
+        self.times.append(time)
+        self.next_time = time + self.interval
+        return checkpoint
+
+    def update(self, frame_idx: int) -> None:
+        """Call after every frame, with how many frames the engine has been given so far."""
+        if frame_idx and self.frames[frame_idx - 1].time >= self.next_time:
+            self.take(frame_idx)
+
+    def restore(self, checkpoint: Checkpoint) -> None:
+        # Anything judged since the checkpoint goes back to untouched first.
+        hi = bisect_right(self.note_times, self.engine.chart_time + self.horizon)
+        for note in self.notes[checkpoint.hi:hi]:
+            note.hit = note.missed = False
+            note.hit_time = None
+        for note, state, hit_time in zip(self.notes[checkpoint.lo:checkpoint.hi], checkpoint.note_states, checkpoint.hit_times, strict=True):
+            note.hit = bool(state & HIT)
+            note.missed = bool(state & MISSED)
+            note.hit_time = None if math.isnan(hit_time) else hit_time
+        self.engine.load_state(checkpoint.state)
+
+    def reset(self) -> None:
+        """Put the engine back how it was before it was given any frames."""
+        self.rewind(-math.inf)
+
+    def rewind(self, song_time: Seconds) -> int:
+        """Put the engine back how it was at `song_time`, and forget every checkpoint after it.
+
+        Returns how many frames the engine has now been given. Anything recorded after that
+        is from a future that didn't happen, and should be thrown away."""
+        idx = max(bisect_right(self.times, song_time) - 1, 0)
+        checkpoint = self.checkpoints[idx]
+        del self.checkpoints[idx + 1:]
+        del self.times[idx + 1:]
+        self.restore(checkpoint)
+        self.next_time = checkpoint.time + self.interval
+
+        frame_idx = checkpoint.frame_idx
+        while frame_idx < len(self.frames) and self.frames[frame_idx].time <= song_time:
+            play_frame(self.engine, self.frames[frame_idx])
+            frame_idx += 1
+        return frame_idx
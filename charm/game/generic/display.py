@@ -34,6 +34,10 @@ class Display(Generic[C, E]):
     def unpause(self) -> None:
         pass
 
+    def seek(self, song_time: Seconds) -> None:
+        """The song jumped to `song_time` (a seek, or a practice loop restarting.)"""
+        pass
+
     # -- DEBUG METHODS --
 
     def debug_fetch_note_sprites_at_point(self, point: Point) -> list[NoteSprite]:
@@ -1,19 +1,30 @@
 from __future__ import annotations
-from typing import Generic, Literal, TypeVar
+from collections import deque
+from collections.abc import Hashable, Sequence
+from copy import copy
+from typing import TYPE_CHECKING, Any, Generic, Literal, TypeVar
 
+from bisect import bisect_left, bisect_right
 import math
 
 from charm.lib.types import Seconds
-from charm.core.keymap import KeyMap
 
 from .chart import BaseChart, BaseNote
 from .judgement import Judgement
 from .results import BaseResults, Results
 
+if TYPE_CHECKING:
+    # Only ever handed to the engine, the engine itself never touches pyglet's input.
+    from charm.core.keymap import Action, KeyMap
+
 KeyStates = list[bool]
 Key = int
 
 
+def _copy_field[T](value: T) -> T:
+    return copy(value) if isinstance(value, (list, dict, set, deque)) else value
+
+
 class EngineEvent:
     """Any Event that happens at a time. Meant to be subclassed."""
     def __init__(self, time: float):
@@ -52,11 +63,23 @@ class DigitalKeyEvent[K](EngineEvent):
 
 type BaseEngine = Engine[BaseChart, BaseNote]
 
+type EngineState = dict[str, Any]
+
 C = TypeVar("C", bound=BaseChart, covariant=True)
 N = TypeVar("N", bound=BaseNote, covariant=True)
 
 
 class Engine(Generic[C, N]):
+    # Settings that change how a play is judged, these get saved with replays
+    config_fields: tuple[str, ...] = ("offset",)
+    # Scoring state that checkpoints keep (see charm.game.generic.checkpoint.) Lists, dicts, sets and deques
+    # get copied, anything else has to be immutable, or at least never changed in place.
+    state_fields: tuple[str, ...] = (
+        "chart_time", "score", "hits", "misses", "streak", "max_streak", "weighted_hit_notes", "last_note_hit", "keystate"
+    )
+    # Lists that are only ever appended to, a checkpoint just needs to know how long they were.
+    state_logs: tuple[str, ...] = ()
+
     def __init__(self, chart: C, judgements: list[Judgement] | None = None, offset: Seconds = 0):
         """The class that processes user inputs into score according to a Chart."""
         self.chart = chart
@@ -147,6 +170,38 @@ class Engine(Generic[C, N]):
                 return f"SDCB (-{self.misses})"
         return "Clear"
 
+    def get_config(self) -> dict[str, Any]:
+        return {f: getattr(self, f) for f in self.config_fields}
+
+    def set_config(self, config: dict[str, Any]) -> None:
+        for f, v in config.items():
+            if f in self.config_fields:
+                setattr(self, f, v)
+
+    def save_state(self) -> EngineState:
+        """Everything needed to put the engine back how it is now, apart from the notes' own hit/miss state."""
+        state = {f: _copy_field(getattr(self, f)) for f in self.state_fields}
+        state.update({f: len(getattr(self, f)) for f in self.state_logs})
+        return state
+
+    def load_state(self, state: EngineState) -> None:
+        # Copied again, so the same state can be loaded more than once.
+        for f in self.state_fields:
+            setattr(self, f, _copy_field(state[f]))
+        for f in self.state_logs:
+            del getattr(self, f)[state[f]:]
+
+    def reset_stats(self) -> None:
+        """Start scoring from nothing again, without moving the engine or forgetting what's been judged.
+
+        Used by practice mode, so each time round the loop is scored on its own."""
+        self.score = 0
+        self.hits = 0
+        self.misses = 0
+        self.streak = 0
+        self.max_streak = 0
+        self.weighted_hit_notes = 0
+
     def update(self, song_time: Seconds) -> None:
         self.chart_time = song_time + self.offset
 
@@ -158,6 +213,18 @@ class Engine(Generic[C, N]):
         pass
         # TODO: Maybe remove?
 
+    @staticmethod
+    def bind_inputs(keymap: KeyMap) -> dict[Action, Hashable]:
+        """Which of the keymap's actions this engine wants, and the key each one turns into in `on_input`.
+
+        Engines only ever see their own keys (lanes, frets...), never an `Action`, so they don't need
+        a window to run, and replays don't depend on how the player had their keys bound."""
+        return {}
+
+    def on_input(self, events: Sequence[DigitalKeyEvent[Hashable]]) -> None:
+        """Every key pressed or released since the last update, oldest first, stamped in chart time."""
+        pass
+
     def calculate_score(self) -> None:
         raise NotImplementedError
 
@@ -180,6 +247,8 @@ class Engine(Generic[C, N]):
 
 
 class AutoEngine(Engine[BaseChart, BaseNote]):
+    state_fields = (*Engine.state_fields, "cursor")
+
     def __init__(self, chart: BaseChart, offset: float = 0, lanes: int = 4):
         super().__init__(chart,
                          [Judgement("Auto", "auto", chart.notes[-1].end, 0, 0),
@@ -187,25 +256,58 @@ class AutoEngine(Engine[BaseChart, BaseNote]):
                           offset)
         self.keystate = (False, ) * lanes
 
+        # The auto engine hits every note dead on, so the whole run is known ahead of time:
+        # the first `cursor` notes are done, and everything else is still coming.
+        self.notes: list[BaseNote] = sorted(self.chart.notes, key=lambda n: n.time)
+        self.note_times: list[Seconds] = [n.time for n in self.notes]
+        self.cursor: int = 0
+
     def calculate_score(self) -> None:
-        # Get all non-scored notes within the current window
-        for note in [n for n in self.current_notes if n.time <= self.chart_time + self.hit_window]:
-            # Missed notes (current time is higher than max allowed time for note)
-            # But Digi, that would never happen, this is the auto engine!
-            # Trueee, except of course if the game is lagging or there is a skip in the song or something.
-            # I think it's worth tracking that.
-            if self.chart_time > note.time + self.hit_window:
-                note.missed = True
-                note.hit_time = math.inf
-                self.score_note(note)
-                self.current_notes.remove(note)
-            # Hit every note
-            elif self.chart_time >= note.time:
-                note.hit = True
+        # Everything up to now gets hit
+        hit_to = bisect_right(self.note_times, self.chart_time, lo=self.cursor)
+        if hit_to == self.cursor:
+            return
+        # Missed notes (current time is higher than max allowed time for note)
+        # But Digi, that would never happen, this is the auto engine!
+        # Trueee, except of course if the game is lagging or there is a skip in the song or something.
+        # I think it's worth tracking that.
+        miss_to = max(self.cursor, bisect_left(self.note_times, self.chart_time - self.hit_window, lo=self.cursor, hi=hit_to))
+
+        for note in self.notes[self.cursor:miss_to]:
+            note.missed = True
+            note.hit_time = math.inf
+        for note in self.notes[miss_to:hit_to]:
+            note.hit = True
+            note.hit_time = note.time
+
+        # Misses always come before hits here, so we can apply the whole batch at once.
+        if miss_to > self.cursor:
+            self.misses += miss_to - self.cursor
+            self.streak = 0
+        if hit_to > miss_to:
+            self.hits += hit_to - miss_to
+            self.streak += hit_to - miss_to
+            self.max_streak = max(self.streak, self.max_streak)
+            self.last_note_hit = self.notes[hit_to - 1]
+        self.cursor = hit_to
+
+    def seek(self, time: Seconds) -> None:
+        """Jump to `time` as if every note before it was hit. The counters are O(log n),
+        only the notes between the old and new position get touched."""
+        self.chart_time = time
+        cursor = bisect_right(self.note_times, time)
+        if cursor < self.cursor:
+            for note in self.notes[cursor:self.cursor]:
+                note.hit = note.missed = False
+                note.hit_time = None
+        else:
+            for note in self.notes[self.cursor:cursor]:
+                note.hit, note.missed = True, False
                 note.hit_time = note.time
-                self.score_note(note)
-                self.current_notes.remove(note)
-                self.last_note_hit = note
+        self.cursor = cursor
+        self.hits = self.streak = self.max_streak = cursor
+        self.misses = 0
+        self.last_note_hit = self.notes[cursor - 1] if cursor else None
 
     def score_note(self, note: BaseNote) -> None:
         # Ignore notes we haven't done anything with yet
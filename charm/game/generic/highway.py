@@ -1,8 +1,12 @@
+from bisect import bisect_right
+from collections.abc import Iterable, Sequence
 from typing import Generic, TypeVar
+import numpy as np
 import arcade
 from arcade import Camera2D
 from arcade.camera import Projector
 
+from charm.lib.assets import ASSETS, Skin
 from charm.lib.types import Seconds
 
 from .chart import BaseChart, BaseNote
@@ -16,6 +20,49 @@ N = TypeVar("N", bound=BaseNote, covariant=True)
 E = TypeVar("E", bound=BaseEngine, covariant=True)
 
 
+class NoteCursor(Generic[N]):
+    """Hands out notes in time order as they come into view, for a highway to make sprites for.
+
+    Unlike a generator it can jump anywhere in the song with a bisect, so seeking only costs as
+    much as the notes that end up on screen. With `by_end`, notes stay wanted until they end rather
+    than until they start (for sustains, or anything else drawn until its end.)"""
+    def __init__(self, notes: Iterable[N], *, by_end: bool = False):
+        self.notes: list[N] = sorted(notes, key=lambda n: n.time)
+        self.times: list[float] = [n.time for n in self.notes]
+        # A note can start this long before `after` and still end after it
+        self.by_end = by_end
+        self.longest: float = max((n.length for n in self.notes), default=0) if by_end else 0
+        self.idx: int = 0
+        # Notes that end at or before this are skipped, they'd only be put away again
+        self.after: float = -float('inf')
+
+    def pop(self, until: Seconds) -> N | None:
+        """The next note that starts at or before `until`, if there is one."""
+        while self.idx < len(self.notes) and self.times[self.idx] <= until:
+            note = self.notes[self.idx]
+            self.idx += 1
+            if note.end > self.after:
+                return note
+        return None
+
+    def seek(self, after: Seconds) -> None:
+        """Start again from the first note that ends after `after`."""
+        self.idx = bisect_right(self.times, after - self.longest)
+        self.after = after
+
+    def peak(self, ahead: Seconds, behind: Seconds) -> int:
+        """The most notes that are ever wanted at once, if each is wanted from `ahead` seconds before it starts
+        until `behind` seconds after it starts (or ends, with `by_end`.) This is how big a sprite pool has to be."""
+        # Sliding the window along the song is the same as stretching every note by it and counting overlaps
+        ends = sorted((n.end if self.by_end else n.time) + behind + ahead for n in self.notes)
+        most = gone = 0
+        for idx, start in enumerate(self.times):
+            while ends[gone] < start:
+                gone += 1
+            most = max(most, idx + 1 - gone)
+        return most
+
+
 class Highway(Generic[C, N, E]):
     def __init__(self, chart: C, engine: E, pos: tuple[int, int], size: tuple[int, int] | None = None, gap: int = 5, viewport: float = 1.0, *, downscroll: bool = False, static_camera: Projector = None, highway_camera: Projector = None):
         """A time-based display of current and upcoming notes to be hit by the player."""
@@ -28,6 +75,8 @@ class Highway(Generic[C, N, E]):
         self.downscroll = downscroll
         self.viewport: float = viewport
         self.window = arcade.get_window()  # ???: This can't be a good idea, right? ~Digi - Yeah, but its how arcade is designed ~Dragon
+        # Whatever skin the view is loading from (see `ASSETS.using`)
+        self.skin: Skin = ASSETS.skin
         self.size = size if size is not None else (self.window.width // 3, self.window.height)
 
         # !: This isn't a valid assumption for the hero/rock gamemode.
@@ -35,6 +84,11 @@ class Highway(Generic[C, N, E]):
         self.highway_camera: Projector = highway_camera or Camera2D()
         self.song_time: float = 0
 
+    def pool_size(self, cursor: NoteCursor, ahead: Seconds | None = None) -> int:
+        """Enough sprites for the busiest part of the chart. Notes come into view `ahead` seconds early (the viewport
+        by default) and get put away 0.1s after they pass, give or take a frame. The pools still grow if it's not enough."""
+        return cursor.peak(self.viewport if ahead is None else ahead, 0.1 + 1 / 30)
+
     @property
     def pos(self) -> tuple[int, int]:
         return self._pos
@@ -90,8 +144,8 @@ class Highway(Generic[C, N, E]):
         return self.h - 25
 
     @property
-    def visible_notes(self) -> list[N]:
-        return [n for n in self.notes if self.song_time - self.viewport < n.time <= self.song_time + self.viewport]
+    def visible_notes(self) -> Sequence[N]:
+        return self.chart.notes_between(self.song_time - self.viewport, self.song_time + self.viewport)
 
     def apos(self, rpos: tuple[int, int]) -> tuple[int, int]:
         return (rpos[0] + self.pos[0], rpos[1] + self.pos[1])
@@ -105,8 +159,18 @@ class Highway(Generic[C, N, E]):
             return (self.px_per_s * rt) + self.strikeline_y
         return (-self.px_per_s * rt) + self.strikeline_y + self.y
 
+    def note_ys(self, times: np.ndarray) -> np.ndarray:
+        """`note_y` for a whole array of times at once. Notes move at a constant speed, so two points on the line will do."""
+        start = self.note_y(self.song_time)
+        speed = self.note_y(self.song_time + 1) - start
+        return start + speed * (times - self.song_time)
+
     def update(self, song_time: Seconds) -> None:
         self.song_time = song_time
 
+    def seek(self, song_time: Seconds) -> None:
+        """Jump straight to `song_time`, for when the song doesn't just carry on from the last update."""
+        self.song_time = song_time
+
     def draw(self) -> None:
         raise NotImplementedError
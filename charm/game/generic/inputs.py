@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from collections.abc import Hashable, Mapping
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from charm.lib.types import Seconds
+
+from .engine import DigitalKeyEvent
+
+if TYPE_CHECKING:
+    from charm.core.keymap import Action, KeyMap
+
+
+class InputTimeline:
+    """Turns the keymap's raw input log into `DigitalKeyEvent`s in chart time, for an engine.
+
+    Actions are swapped for the engine's own keys on the way through (see `Engine.bind_inputs`),
+    so this is the only part of judging that knows about the keymap.
+
+    Every event keeps the time the OS reported it, rather than the time of the frame that
+    happened to process it, so judging doesn't get worse at lower frame rates."""
+    def __init__(self, keymap: KeyMap, bindings: Mapping[Action, Hashable], offset: Seconds = 0.0):
+        self.keymap = keymap
+        self.bindings = bindings
+        # The engine's offset, chart time is song time plus this (see `Engine.update`)
+        self.offset = offset
+        # Song seconds per real second, for when the song is slowed down (see practice mode)
+        self.rate: float = 1.0
+
+    def clear(self) -> None:
+        """Forget anything that was pressed before now, e.g. while paused."""
+        self.keymap.state.drain()
+
+    def collect(self, song_time: Seconds, now: float | None = None) -> list[DigitalKeyEvent[Hashable]]:
+        """Every bound key pressed or released since the last collect, oldest first.
+
+        `song_time` is where the song is right `now`, and the song runs in step with the
+        monotonic clock, so an input `x` seconds ago happened at `song_time - x * rate`,
+        which is `offset` earlier than the chart time it's stamped with."""
+        now = perf_counter() if now is None else now
+        chart_time = song_time + self.offset
+        events: list[DigitalKeyEvent[Hashable]] = []
+        for raw in self.keymap.state.drain():
+            time = chart_time - (now - raw.time) * self.rate
+            state = "down" if raw.down else "up"
+            # The actions were looked up when the key was pressed, just keep the ones the engine wants.
+            for action in raw.actions:
+                if action in self.bindings:
+                    events.append(DigitalKeyEvent(time, self.bindings[action], state))
+        return events
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable, Sequence
+
+from charm.lib.types import Seconds
+
+from .chart import BaseNote
+
+
+class LaneJudge[N: BaseNote]:
+    """Matches key presses to notes, one lane at a time.
+
+    Each lane keeps a cursor to its earliest unjudged note and a queue of key-down times that
+    haven't been used yet. Since both are in time order, a press can only ever match the note
+    under the cursor, so judging never has to look past the hit window no matter how long the chart is.
+    """
+    def __init__(self, notes: Iterable[N], lanes: int):
+        self.lanes: list[list[N]] = [[] for _ in range(lanes)]
+        for note in sorted(notes, key = lambda n: n.time):
+            self.lanes[note.lane].append(note)
+        self.heads: list[int] = [0] * lanes
+        self.presses: list[deque[Seconds]] = [deque() for _ in range(lanes)]
+
+    def save_state(self) -> tuple[tuple[int, ...], tuple[tuple[Seconds, ...], ...]]:
+        return tuple(self.heads), tuple(tuple(p) for p in self.presses)
+
+    def load_state(self, state: tuple[tuple[int, ...], tuple[tuple[Seconds, ...], ...]]) -> None:
+        heads, presses = state
+        self.heads = list(heads)
+        self.presses = [deque(p) for p in presses]
+
+    def press(self, lane: int, time: Seconds) -> None:
+        self.presses[lane].append(time)
+
+    def next_note(self, lane: int) -> N | None:
+        """The earliest note in this lane that hasn't been hit or missed."""
+        notes = self.lanes[lane]
+        head = self.heads[lane]
+        return notes[head] if head < len(notes) else None
+
+    @property
+    def finished(self) -> bool:
+        return all(head >= len(notes) for head, notes in zip(self.heads, self.lanes, strict = True))
+
+    def judge(self, time: Seconds, window: Seconds, held: Sequence[bool] = (), hold_only: Callable[[N], bool] | None = None) -> list[N]:
+        """Hit or miss every note that can be decided at `time`.
+
+        Notes that `hold_only` accepts don't need a press, holding their lane down when they're in the window is enough.
+        Returns the judged notes in chart order, with `hit`/`missed`/`hit_time` already set."""
+        judged: list[N] = []
+        for lane, notes in enumerate(self.lanes):
+            head = self.heads[lane]
+            presses = self.presses[lane]
+            while head < len(notes):
+                note = notes[head]
+                if note.time > time + window:
+                    break
+                # Presses too early for this note are too early for every note after it too.
+                while presses and presses[0] < note.time - window:
+                    presses.popleft()
+                if hold_only is not None and hold_only(note):
+                    # These never take a press, that's for whatever note comes next.
+                    if held and held[lane]:
+                        note.hit = True
+                        note.hit_time = note.time
+                    elif note.time < time - window:
+                        note.missed = True
+                        note.hit_time = float("inf")
+                    else:
+                        break
+                elif presses and presses[0] <= note.time + window:
+                    note.hit = True
+                    note.hit_time = presses.popleft()
+                elif note.time < time - window:
+                    note.missed = True
+                    note.hit_time = float("inf")
+                else:
+                    # Still in the window, wait for the player.
+                    break
+                judged.append(note)
+                head += 1
+            else:
+                # Nothing left in this lane to press.
+                presses.clear()
+            self.heads[lane] = head
+        judged.sort(key = lambda n: (n.time, n.lane))
+        return judged
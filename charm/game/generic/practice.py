@@ -0,0 +1,76 @@
+"""
+Practice mode, playing one part of a song over and over.
+
+A `PracticeLoop` is the A-B range being looped, picked by time or by a chart's sections
+(`Chart.sections`), and how fast to play it. Every time the song gets to the end of the loop
+it jumps back to a little before the start, so there's time to get ready for the first note.
+
+Jumping back has to be cheap, since it happens mid-song every loop: `GameView` keeps the
+engine's state at the loop start (as the first checkpoint, see `charm.game.generic.checkpoint`)
+and a second set of audio players already sitting at the restart, so a restart is just a swap.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Protocol, Self
+
+from charm.lib.types import Seconds
+
+# How far before the loop the song restarts from
+PRACTICE_LEAD_IN: Seconds = 2.0
+MIN_PRACTICE_RATE = 0.25
+MAX_PRACTICE_RATE = 1.0
+PRACTICE_RATE_STEP = 0.05
+
+
+class Section(Protocol):
+    """A named part of a song, starting at `time` and lasting until the next one."""
+    time: Seconds
+    name: str
+
+
+@dataclass
+class PracticeLoop:
+    start: Seconds
+    end: Seconds
+    rate: float = 1.0
+    lead_in: Seconds = PRACTICE_LEAD_IN
+    name: str = ""
+
+    def __post_init__(self) -> None:
+        if self.end <= self.start:
+            raise ValueError(f"A practice loop has to end after it starts ({self.start:.3f}s -> {self.end:.3f}s)")
+        self.set_rate(self.rate)
+
+    def set_rate(self, rate: float) -> float:
+        """Change the speed, keeping it in range (and on round numbers, since it's usually stepped.) Returns the new rate."""
+        self.rate = round(min(max(rate, MIN_PRACTICE_RATE), MAX_PRACTICE_RATE), 2)
+        return self.rate
+
+    @property
+    def restart(self) -> Seconds:
+        """Where the song jumps back to when it gets to the end."""
+        return max(self.start - self.lead_in, 0.0)
+
+    @classmethod
+    def from_sections(cls, sections: Sequence[Section], first: int, last: int | None = None, *, song_end: Seconds, rate: float = 1.0) -> Self:
+        """Loop `sections[first]` through `sections[last]` (or just the first one), the last one ending where the next starts."""
+        last = first if last is None else last
+        if not 0 <= first <= last < len(sections):
+            raise IndexError(f"No sections {first}-{last}, there are only {len(sections)}")
+        end = sections[last + 1].time if last + 1 < len(sections) else song_end
+        name = sections[first].name if first == last else f"{sections[first].name} - {sections[last].name}"
+        return cls(sections[first].time, end, rate, name=name)
+
+    @classmethod
+    def around(cls, sections: Sequence[Section], time: Seconds, *, song_end: Seconds, rate: float = 1.0) -> Self:
+        """Loop the section playing at `time` (or the first section, if it's before all of them.)"""
+        idx = max(bisect_right([s.time for s in sections], time) - 1, 0)
+        return cls.from_sections(sections, idx, song_end=song_end, rate=rate)
+
+    def __str__(self) -> str:
+        span = f"{self.start:.2f}s-{self.end:.2f}s"
+        rate = f" @ {self.rate:.0%}" if self.rate != 1.0 else ""
+        return f"{self.name} ({span}){rate}" if self.name else f"{span}{rate}"
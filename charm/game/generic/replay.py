@@ -0,0 +1,248 @@
+"""
+Recording plays, and playing them back.
+
+A replay is everything an engine was fed during a play: every input event it got, and the song
+time of every frame it was updated on, along with which chart it was and how the engine was set up.
+Feeding that back into a fresh engine for the same chart gives back the same play.
+
+Times are kept in whole microseconds. The recorder hands the engine the rounded times too,
+so the play that gets saved is exactly the play that happened.
+
+On disk it's `CHRP`, a version byte, then a zlib compressed blob of:
+a u32 length and a JSON header, then one record per event/frame. A record is a varint code
+(0 for a frame, 1 + 2 * key index + down for an input) followed by a zigzag varint of the
+time since the last record.
+
+Inputs are stored as the engine's own keys (lanes, frets, ...) rather than keymap actions, so
+a replay plays back the same no matter how the keys are bound, and without a window.
+"""
+from __future__ import annotations
+
+from collections.abc import Hashable, Sequence
+from dataclasses import asdict, dataclass, field
+from hashlib import sha1
+from pathlib import Path
+from time import time as now
+from typing import Any
+import json
+import struct
+import zlib
+
+from charm.lib.errors import ReplayError
+from charm.lib.types import Seconds
+
+from .engine import BaseEngine, DigitalKeyEvent
+from .judgement import Judgement
+from .metadata import ChartMetadata
+from .results import ScoreJSON
+
+REPLAY_MAGIC = b"CHRP"
+REPLAY_VERSION = 2
+TICKS_PER_SECOND = 1_000_000
+
+FRAME = 0
+
+
+def to_ticks(time: Seconds) -> int:
+    return round(time * TICKS_PER_SECOND)
+
+
+def quantize(time: Seconds) -> Seconds:
+    """Round a time the same way it'll be stored."""
+    return to_ticks(time) / TICKS_PER_SECOND
+
+
+def chart_hash(metadata: ChartMetadata) -> str:
+    """Identifies a chart by the contents of its file, and which chart in the file it is."""
+    h = sha1()
+    with metadata.path.open("rb") as f:
+        while chunk := f.read(1 << 16):
+            h.update(chunk)
+    h.update(f"{metadata.gamemode}/{metadata.instrument}/{metadata.difficulty}".encode())
+    return h.hexdigest()
+
+
+def _write_varint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _zigzag(n: int) -> int:
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+@dataclass
+class ReplayFrame:
+    """One engine update: the inputs it was given, then the song time it was updated to."""
+    time: Seconds
+    events: list[DigitalKeyEvent[Hashable]] = field(default_factory=list)
+
+
+def play_frame(engine: BaseEngine, frame: ReplayFrame) -> None:
+    """Give the engine one frame, the same way GameView does."""
+    engine.on_input(frame.events)
+    engine.update(frame.time)
+    engine.calculate_score()
+
+
+@dataclass
+class Replay:
+    gamemode: str
+    chart_hash: str
+    config: dict[str, Any]
+    judgements: list[Judgement]
+    frames: list[ReplayFrame]
+    results: ScoreJSON | None = None
+    created: float = field(default_factory=now)
+
+    @property
+    def length(self) -> Seconds:
+        return self.frames[-1].time if self.frames else 0.0
+
+    def to_bytes(self) -> bytes:
+        keys: dict[Hashable, int] = {}
+        records = bytearray()
+        last = 0
+        for frame in self.frames:
+            for event in frame.events:
+                idx = keys.setdefault(event.key, len(keys))
+                ticks = to_ticks(event.time)
+                _write_varint(records, 1 + 2 * idx + event.down)
+                _write_varint(records, _zigzag(ticks - last))
+                last = ticks
+            ticks = to_ticks(frame.time)
+            _write_varint(records, FRAME)
+            _write_varint(records, _zigzag(ticks - last))
+            last = ticks
+
+        header = json.dumps({
+            "gamemode": self.gamemode,
+            "chart_hash": self.chart_hash,
+            "config": self.config,
+            "judgements": [asdict(j) for j in self.judgements],
+            "keys": list(keys),
+            "results": self.results,
+            "created": self.created
+        }).encode()
+        body = struct.pack("<I", len(header)) + header + records
+        return REPLAY_MAGIC + bytes((REPLAY_VERSION,)) + zlib.compress(body, 9)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Replay:
+        if data[:4] != REPLAY_MAGIC:
+            raise ReplayError("This isn't a Charm replay.")
+        if data[4] != REPLAY_VERSION:
+            raise ReplayError(f"Replay version {data[4]} can't be read by replay version {REPLAY_VERSION}.")
+        try:
+            body = zlib.decompress(data[5:])
+        except zlib.error as e:
+            raise ReplayError(f"Replay is corrupted ({e}).") from e
+        header_length, = struct.unpack_from("<I", body)
+        pos = 4 + header_length
+        header = json.loads(body[4:pos])
+        # Keys come back as whatever JSON made of them, which is fine for ints and strings (and IntEnums.)
+        keys: list[Hashable] = header["keys"]
+
+        frames: list[ReplayFrame] = []
+        events: list[DigitalKeyEvent[Hashable]] = []
+        ticks = 0
+        while pos < len(body):
+            code, pos = _read_varint(body, pos)
+            delta, pos = _read_varint(body, pos)
+            ticks += _unzigzag(delta)
+            time = ticks / TICKS_PER_SECOND
+            if code == FRAME:
+                frames.append(ReplayFrame(time, events))
+                events = []
+                continue
+            idx, down = divmod(code - 1, 2)
+            events.append(DigitalKeyEvent(time, keys[idx], "down" if down else "up"))
+
+        return cls(
+            header["gamemode"],
+            header["chart_hash"],
+            header["config"],
+            [Judgement(**j) for j in header["judgements"]],
+            frames,
+            header["results"],
+            header["created"]
+        )
+
+    def save(self, path: Path) -> None:
+        path.write_bytes(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: Path) -> Replay:
+        return cls.from_bytes(path.read_bytes())
+
+
+class ReplayRecorder:
+    """Sits between the input timeline and the engine, keeping a copy of everything the engine is given."""
+    def __init__(self, engine: BaseEngine):
+        self.engine = engine
+        metadata = engine.chart.metadata
+        self.gamemode = metadata.gamemode
+        self.chart_hash = chart_hash(metadata)
+        self.config = engine.get_config()
+        self.judgements = list(engine.judgements)
+        self.frames: list[ReplayFrame] = []
+
+    def record(self, song_time: Seconds, events: Sequence[DigitalKeyEvent[Hashable]]) -> tuple[Seconds, list[DigitalKeyEvent[Hashable]]]:
+        """Keep this frame, and get back the (rounded) song time and events to give the engine."""
+        song_time = quantize(song_time)
+        rounded = [DigitalKeyEvent(quantize(e.time), e.key, e.new_state) for e in events]
+        self.frames.append(ReplayFrame(song_time, rounded))
+        return song_time, rounded
+
+    def finish(self, results: ScoreJSON | None = None) -> Replay:
+        return Replay(self.gamemode, self.chart_hash, self.config, self.judgements, self.frames, results)
+
+
+class ReplayPlayer:
+    """Feeds a replay into a fresh engine, either along with the song or all at once."""
+    def __init__(self, replay: Replay, engine: BaseEngine):
+        self.replay = replay
+        self.engine = engine
+        self.frame_idx: int = 0
+
+        engine.set_config(replay.config)
+        engine.judgements = list(replay.judgements)
+
+    @property
+    def finished(self) -> bool:
+        return self.frame_idx >= len(self.replay.frames)
+
+    def play_to(self, song_time: Seconds) -> None:
+        """Run every recorded frame up to `song_time`, for watching a replay as the song plays."""
+        frames = self.replay.frames
+        while self.frame_idx < len(frames) and frames[self.frame_idx].time <= song_time:
+            play_frame(self.engine, frames[self.frame_idx])
+            self.frame_idx += 1
+
+    def run(self) -> None:
+        """Run the whole replay as fast as possible."""
+        self.play_to(float("inf"))
+
+    def verify(self) -> bool:
+        """Does playing the replay back give the results it was saved with?"""
+        self.run()
+        if self.replay.results is None:
+            return True
+        return self.engine.generate_results().to_score_json() == self.replay.results
@@ -0,0 +1,247 @@
+"""
+Run engines against charts without a window, to see how expensive they are.
+
+The harness parses a chartset, makes up an input stream for the engine (hitting everything
+perfectly, hitting everything a bit off, mashing, or pressing a pile of extra keys with every
+note), then steps the engine through the song at a fixed frame rate, timing every `calculate_score`.
+
+    python -m charm.game.harness path/to/chartset --pattern humanized --fps 240
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from collections.abc import Hashable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from random import Random
+from time import perf_counter, perf_counter_ns
+from typing import Any
+
+from charm.lib.errors import NoParserError
+from charm.lib.types import Seconds
+
+from charm.game.generic import AutoEngine, BaseChart, BaseEngine, DigitalKeyEvent
+from charm.game.registry import REGISTRY
+
+PATTERNS = ("perfect", "humanized", "mashing", "chords")
+
+# How long a tap is held for, if the note doesn't say
+TAP_LENGTH: Seconds = 0.05
+# The standard deviation of a humanized hit
+HUMAN_JITTER: Seconds = 0.015
+# Presses per second while mashing
+MASH_RATE: float = 12.0
+# Notes that a player should leave alone
+AVOIDED_TYPES = {"bomb", "death", "caution", "strikeline", "sustain"}
+
+
+def load_charts(path: Path, gamemode: str | None = None) -> list[BaseChart]:
+    """Parse every chart in a chartset folder, with the first parser that can read it."""
+    file_names = [f.name for f in path.iterdir()]
+    for spec in REGISTRY.parsers:
+        if gamemode is not None and spec.gamemode != gamemode:
+            continue
+        if not spec.might_be_chartset(file_names):
+            continue
+        parser = spec.load()
+        if not parser.is_possible_chartset(path):
+            continue
+        charts: list[BaseChart] = []
+        for metadata in parser.parse_chart_metadata(path):
+            charts.extend(parser.parse_chart(metadata))
+        return charts
+    raise NoParserError(path.stem)
+
+
+def reset_chart(chart: BaseChart) -> None:
+    """Forget every hit and miss, so the chart can be played again."""
+    for note in chart.notes:
+        note.hit = note.missed = False
+        note.hit_time = None
+
+
+def make_engine(chart: BaseChart, engine: str | None = None) -> BaseEngine:
+    """The engine for this chart's gamemode, or the engine from another gamemode (or `"auto"`.)"""
+    if engine == "auto":
+        return AutoEngine(chart)
+    return REGISTRY.gamemodes[engine or chart.metadata.gamemode].engine(chart)
+
+
+def _merge(presses: dict[Any, list[tuple[Seconds, Seconds]]]) -> list[DigitalKeyEvent[Hashable]]:
+    """Turn (down, up) pairs per key into one event stream, making sure presses on the same key don't overlap."""
+    events: list[DigitalKeyEvent[Hashable]] = []
+    for key, spans in presses.items():
+        spans.sort()
+        for (down, up), nxt in zip(spans, [*spans[1:], None], strict=True):
+            if nxt is not None:
+                up = min(up, nxt[0] - 0.001)
+            events.append(DigitalKeyEvent(down, key, "down"))
+            events.append(DigitalKeyEvent(max(up, down), key, "up"))
+    events.sort(key=lambda e: e.time)
+    return events
+
+
+def _lane_inputs(engine: BaseEngine, pattern: str, rng: Random) -> list[DigitalKeyEvent[Hashable]]:
+    lanes = range(len(engine.lane_judge.lanes))
+    presses: dict[int, list[tuple[Seconds, Seconds]]] = {lane: [] for lane in lanes}
+    notes = [n for n in engine.chart.notes if n.type not in AVOIDED_TYPES]
+    if pattern == "mashing":
+        time, end = min(n.time for n in notes) - 1, max(n.end for n in notes) + 1
+        while time < end:
+            time += rng.expovariate(MASH_RATE)
+            presses[rng.choice(lanes)].append((time, time + TAP_LENGTH))
+        return _merge(presses)
+
+    for note in notes:
+        if note.lane not in lanes:
+            continue
+        down = note.time + (rng.gauss(0, HUMAN_JITTER) if pattern == "humanized" else 0)
+        up = max(note.end, down + TAP_LENGTH)
+        presses[note.lane].append((down, up))
+        if pattern == "chords":
+            for lane in rng.sample(lanes, rng.randint(1, 2)):
+                if lane != note.lane:
+                    presses[lane].append((down, down + TAP_LENGTH))
+    return _merge(presses)
+
+
+def _fret_inputs(engine: BaseEngine, pattern: str, rng: Random) -> list[DigitalKeyEvent[Hashable]]:
+    frets = list(range(5))
+    events: list[DigitalKeyEvent[Hashable]] = []
+    held: set[int] = set()
+
+    def fret(time: Seconds, shape: set[int]) -> None:
+        for f in sorted(held - shape):
+            events.append(DigitalKeyEvent(time, f, "up"))
+        for f in sorted(shape - held):
+            events.append(DigitalKeyEvent(time, f, "down"))
+        held.clear()
+        held.update(shape)
+
+    def strum(time: Seconds) -> None:
+        events.append(DigitalKeyEvent(time, "strum", "down"))
+        events.append(DigitalKeyEvent(time + TAP_LENGTH / 2, "strum", "up"))
+
+    chords = engine.chart.chords
+    if pattern == "mashing":
+        time, end = chords[0].time - 1, chords[-1].end + 1
+        while time < end:
+            time += rng.expovariate(MASH_RATE)
+            if rng.random() < 0.5:
+                strum(time)
+            else:
+                fret(time, held ^ {rng.choice(frets)})
+    else:
+        for chord in chords:
+            time = chord.time + (rng.gauss(0, HUMAN_JITTER) if pattern == "humanized" else 0)
+            shape = {f for f in chord.frets if f in frets}
+            if pattern == "chords":
+                shape.add(rng.choice(frets))
+            if chord.type in ("hopo", "tap") and shape != held:
+                # Tapped, changing the fretting is the hit
+                fret(time, shape)
+                continue
+            # Fret a hair early, the same way a player would
+            fret(time - 0.005, shape)
+            strum(time)
+        fret(chords[-1].end + 0.1, set())
+    events.sort(key=lambda e: e.time)
+    return events
+
+
+def generate_inputs(engine: BaseEngine, pattern: str = "perfect", seed: int = 0) -> list[DigitalKeyEvent[Hashable]]:
+    """A made up input stream for `engine`'s chart, in time order. `AutoEngine` doesn't take any."""
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown input pattern {pattern!r}, expected one of {PATTERNS}")
+    rng = Random(seed)
+    if hasattr(engine, "lane_judge"):
+        return _lane_inputs(engine, pattern, rng)
+    if hasattr(engine, "chords"):
+        return _fret_inputs(engine, pattern, rng)
+    return []
+
+
+@dataclass
+class SimulationResult:
+    engine: str
+    pattern: str
+    simulated: Seconds
+    wall: float
+    latencies: list[int]  # every calculate_score, in ns
+    score: float
+    hits: int
+    misses: int
+
+    @property
+    def speed(self) -> float:
+        """Simulated seconds per wall second."""
+        return self.simulated / self.wall if self.wall else float("inf")
+
+    def percentile(self, p: float) -> float:
+        """The `p`th percentile `calculate_score` time, in ms."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] / 1_000_000
+
+    def __str__(self) -> str:
+        return (
+            f"{self.engine:<16} {self.pattern:<10} {self.speed:>10.1f}x  "
+            f"p50 {self.percentile(50):.3f}ms  p95 {self.percentile(95):.3f}ms  p99 {self.percentile(99):.3f}ms  "
+            f"score {self.score:.0f} ({self.hits} hit/{self.misses} miss)"
+        )
+
+
+def simulate(engine: BaseEngine, events: Sequence[DigitalKeyEvent[Hashable]], fps: float = 240, pattern: str = "") -> SimulationResult:
+    """Play the whole chart through `engine`, the same way GameView does a frame at a time."""
+    notes = engine.chart.notes
+    start = min(n.time for n in notes) - 1
+    end = max(n.end for n in notes) + 1
+    frames = int((end - start) * fps) + 1
+
+    latencies: list[int] = []
+    idx = 0
+    wall_start = perf_counter()
+    for frame in range(frames):
+        time = start + frame / fps
+        first = idx
+        while idx < len(events) and events[idx].time <= time:
+            idx += 1
+        engine.on_input(events[first:idx])
+        engine.update(time)
+        before = perf_counter_ns()
+        engine.calculate_score()
+        latencies.append(perf_counter_ns() - before)
+    wall = perf_counter() - wall_start
+
+    return SimulationResult(type(engine).__name__, pattern, end - start, wall, latencies, engine.score, engine.hits, engine.misses)
+
+
+def run(chart: BaseChart, pattern: str = "perfect", engine: str | None = None, fps: float = 240, seed: int = 0) -> SimulationResult:
+    """Simulate a fresh play of `chart`."""
+    reset_chart(chart)
+    e = make_engine(chart, engine)
+    return simulate(e, generate_inputs(e, pattern, seed), fps, pattern)
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Run Charm's engines headless and time them.")
+    parser.add_argument("path", type=Path, help="a chartset folder")
+    parser.add_argument("--gamemode", help="only use parsers for this gamemode")
+    parser.add_argument("--engine", help="use this gamemode's engine (or 'auto') instead of the chart's own")
+    parser.add_argument("--difficulty", help="only run charts with this difficulty")
+    parser.add_argument("--pattern", choices=PATTERNS, action="append", help="input patterns to try (default: all)")
+    parser.add_argument("--fps", type=float, default=240)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for chart in load_charts(args.path, args.gamemode):
+        if args.difficulty is not None and chart.metadata.difficulty != args.difficulty:
+            continue
+        print(chart.metadata)
+        for pattern in args.pattern or PATTERNS:
+            print(f"  {run(chart, pattern, args.engine, args.fps, args.seed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,19 @@
 Threaded chart loading Oh lorde what have I done ~ DragonMoffon
 """
 import logging
-from operator import attrgetter
 import tomllib
-from typing import cast
 from collections.abc import Iterator, Sequence
 from pathlib import Path
-from itertools import groupby
+from zipfile import BadZipFile
 from queue import Queue
 from threading import Thread, Lock
 
 from charm.core.paths import songspath
+from charm.lib.archive import ChartArchive, ChartPath, is_archive
 from charm.lib.errors import CharmError, ChartUnparseableError, MissingGamemodeError, NoParserError, AmbigiousParserError, log_charmerror, NoChartsError
 
 from charm.game.generic import ChartSet, ChartSetMetadata, ChartMetadata, Parser, BaseChart
-from charm.game.parsers import FNFParser, FNFV2Parser, ManiaParser, SMParser, DotChartParser, TaikoParser
+from charm.game.registry import REGISTRY, ParserSpec
 
 from time import sleep
 
@@ -24,14 +23,6 @@ logger = logging.getLogger("charm")
 CHARM_TOML_METADATA_FIELDS = ["title", "artist", "album", "length", "genre", "year", "difficulty",
                               "charter", "preview_start", "preview_end", "source", "album_art", "alt_title"]
 
-# TODO: Parse MIDI
-all_parsers: list[type[Parser]] = [FNFParser, FNFV2Parser, ManiaParser, SMParser, DotChartParser, TaikoParser]
-parsers_by_gamemode: dict[str, list[type[Parser]]] = {
-    cast(str, gamemode): list(values)
-    for gamemode, values
-    in groupby(sorted(all_parsers, key=attrgetter("gamemode")), attrgetter("gamemode"))
-}
-
 class ThreadError(Exception):
     pass
 
@@ -56,8 +47,8 @@ def get_album_art_path_from_metadata(metadata: ChartSetMetadata) -> str | None:
     return None if art_path is None else art_path.name
 
 
-def read_charm_metadata(metadata_src: Path) -> ChartSetMetadata:
-    with open(metadata_src, "rb") as f:
+def read_charm_metadata(metadata_src: ChartPath) -> ChartSetMetadata:
+    with metadata_src.open("rb") as f:
         t = tomllib.load(f)
         # Assuming there should be a TOML table called "metadata", pretend it's there but empty if missing
         d = t.get("metadata", {})
@@ -66,8 +57,11 @@ def read_charm_metadata(metadata_src: Path) -> ChartSetMetadata:
         return ChartSetMetadata(**m)
 
 
-def find_chartset_parser(parsers: Sequence[type[Parser]], path: Path) -> type[Parser]:
-    valid_parsers = [p for p in parsers if p.is_possible_chartset(path)]
+def find_chartset_parser(parsers: Sequence[ParserSpec], path: ChartPath) -> type[Parser]:
+    # Only import the parsers that have a chance of reading this folder.
+    file_names = [f.name for f in path.iterdir()]
+    candidates = [p.load() for p in parsers if p.might_be_chartset(file_names)]
+    valid_parsers = [p for p in candidates if p.is_possible_chartset(path)]
     if not valid_parsers:
         raise ThreadError(f'NoParserError: {path}')
     if len(valid_parsers) > 1:
@@ -137,8 +131,7 @@ class ChartLoader:
             return test_set is self._free_chartsets
 
     def load_chartsets(self) -> None:
-        gamemodes = ('fnf', '4k', 'hero', 'taiko')
-        for gamemode in gamemodes:
+        for gamemode in tuple(REGISTRY.gamemodes):
             self._load_gamemode_chartsets(gamemode)
 
         with self._finished_lock:
@@ -157,7 +150,7 @@ class ChartLoader:
         with self._grown_lock:
             self._grown = True
 
-    def _load_path_chartsets(self, parsers: Sequence[type[Parser]], chartset_path: Path, metadata: ChartSetMetadata, directory_metadata: ChartSetMetadata | None = None):
+    def _load_path_chartsets(self, parsers: Sequence[ParserSpec], chartset_path: ChartPath, metadata: ChartSetMetadata, directory_metadata: ChartSetMetadata | None = None):
         chartset_metadata = ChartSetMetadata(chartset_path)
         charts = []
 
@@ -180,7 +173,7 @@ class ChartLoader:
             metadata.album_art = get_album_art_path_from_metadata(metadata)
         self._add_chartset(ChartSet(chartset_path, metadata, charts))
 
-    def _load_path_chartsets_recursive(self, parsers: Sequence[type[Parser]], chartset_path: Path, metadata: ChartSetMetadata):
+    def _load_path_chartsets_recursive(self, parsers: Sequence[ParserSpec], chartset_path: ChartPath, metadata: ChartSetMetadata):
         charm_metadata_path = (chartset_path / 'charm.toml')
         directory_metadata = None if not charm_metadata_path.exists() else read_charm_metadata(charm_metadata_path)
         try:
@@ -196,22 +189,43 @@ class ChartLoader:
             metadata = metadata.update(directory_metadata)
 
         for d in chartset_path.iterdir():
+            archive = None
+            if isinstance(d, Path) and is_archive(d):
+                # .osz/.zip packs are walked in place, they behave just like another folder.
+                try:
+                    archive = ChartArchive.open(d)
+                except (OSError, BadZipFile, ValueError) as e:
+                    logger.error(f"Unable to open chartset archive {d}: {e}")
+                    continue
+                d = archive.root
             if not d.is_dir():
                 continue
             self._load_path_chartsets_recursive(parsers, d, metadata)
+            if archive is not None:
+                # Scanning is done with it, it gets opened again when one of its charts is played.
+                archive.close()
 
     def _load_gamemode_chartsets(self, gamemode: str) -> None:
         root = songspath / gamemode
         if not root.exists():
-            raise ThreadError(f'MissingGamemodeError: {gamemode}')
+            # Only the built-in gamemodes get their folders made up front, plugin ones get theirs here.
+            try:
+                root.mkdir(parents=True)
+            except OSError as e:
+                logger.error(f"Unable to make a songs folder for gamemode {gamemode}: {e}")
+                return
+            logger.info(f"Made songs folder {root} for gamemode {gamemode}")
         metadata = ChartSetMetadata(root)
-        self._load_path_chartsets_recursive(parsers_by_gamemode[gamemode], root, metadata)
+        self._load_path_chartsets_recursive(REGISTRY.parsers_for(gamemode), root, metadata)
 
 
 CHART_LOADER = ChartLoader()
 
 def load_chart(chart_metadata: ChartMetadata) -> Sequence[BaseChart]:
-    for parser in parsers_by_gamemode[chart_metadata.gamemode]:
+    for spec in REGISTRY.parsers_for(chart_metadata.gamemode):
+        if not spec.might_parse_chart(chart_metadata.path):
+            continue
+        parser = spec.load()
         if parser.is_parsable_chart(chart_metadata.path):
             logger.debug(f"Parsing with {parser}")
             return parser.parse_chart(chart_metadata)
@@ -1,9 +1,15 @@
-from .fnf import FNFParser
-from .fnfv2 import FNFV2Parser
-from .mania import ManiaParser
-from .sm import SMParser
-from .dotchart import DotChartParser
-from .taiko import TaikoParser
+from charm.lib.lazy import lazy_exports
+
+# Parsers are imported lazily (see charm.game.registry), importing one shouldn't import all of them.
+__getattr__ = lazy_exports(__name__, {
+    "FNFParser": ".fnf",
+    "FNFV2Parser": ".fnfv2",
+    "ManiaParser": ".mania",
+    "SMParser": ".sm",
+    "DotChartParser": ".dotchart",
+    "TaikoParser": ".taiko"
+})
+
 
 __all__ = [
     "FNFParser",
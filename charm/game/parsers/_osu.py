@@ -5,6 +5,7 @@
 # I plan to create an object that creates a RawXXXChart, and then an actual Parser object will "pretend" to do the full
 # file -> charts flow, using this middle step in the process.
 
+from bisect import bisect_right
 from dataclasses import dataclass, field
 from functools import total_ordering
 from pathlib import Path
@@ -18,22 +19,25 @@ from charm.game.generic import BPMChangeEvent
 from charm.lib.types import Seconds
 from charm.lib.utils import clamp
 
+# Fragments, only used to build the patterns below.
 NUM = r"[\d.-]+"
 INT = r"\d+"
 ZO = r"[01]"
-RE_KV_TYPE_1 = r"(.+):(.+)"
-RE_KV_TYPE_2 = r"(.+): (.+)"
-RE_KV_TYPE_3 = r"(.+) : (.+)"
-RE_TIMING_POINT = fr"({NUM}),({NUM}),({INT}),({INT}),({INT}),({INT}),({ZO}),({INT})$"
 RE_DEFAULT = fr"({INT}),({INT}),({INT}),({INT}),({INT})"
-RE_HIT_SAMPLE = fr"({INT}):({INT}):({INT}):({INT}):(.+)?"
-RE_HIT_CIRCLE = fr"{RE_DEFAULT},({RE_HIT_SAMPLE})$"
 RE_PIPE_SEP_INT = r"\d+(\|\d+)*"
 RE_PIPE_SEP_COLON_SEP_INT = r"\d+:\d+(?:\|\d+:\d+)*"
 
-RE_SLIDER = fr"{RE_DEFAULT},([BCLP])\|({RE_PIPE_SEP_COLON_SEP_INT}),({INT}),({NUM}),({RE_HIT_SAMPLE})$"
-RE_SPINNER = fr"{RE_DEFAULT},({INT}),({RE_HIT_SAMPLE})$"
-RE_HOLD = fr"{RE_DEFAULT},({INT}):({RE_HIT_SAMPLE})$"
+# These get matched against every line of the file, so compile them once up here.
+RE_KV_TYPE_1 = re.compile(r"(.+):(.+)")
+RE_KV_TYPE_2 = re.compile(r"(.+): (.+)")
+RE_KV_TYPE_3 = re.compile(r"(.+) : (.+)")
+RE_TIMING_POINT = re.compile(fr"({NUM}),({NUM}),({INT}),({INT}),({INT}),({INT}),({ZO}),({INT})$")
+RE_HIT_SAMPLE = re.compile(fr"({INT}):({INT}):({INT}):({INT}):(.+)?")
+RE_HIT_CIRCLE = re.compile(fr"{RE_DEFAULT},({RE_HIT_SAMPLE.pattern})$")
+
+RE_SLIDER = re.compile(fr"{RE_DEFAULT},([BCLP])\|({RE_PIPE_SEP_COLON_SEP_INT}),({INT}),({NUM}),({RE_HIT_SAMPLE.pattern})$")
+RE_SPINNER = re.compile(fr"{RE_DEFAULT},({INT}),({RE_HIT_SAMPLE.pattern})$")
+RE_HOLD = re.compile(fr"{RE_DEFAULT},({INT}):({RE_HIT_SAMPLE.pattern})$")
 
 logger = logging.getLogger("charm")
 
@@ -324,7 +328,7 @@ class RawOsuChart:
     @classmethod
     def parse(cls, path: Path) -> "RawOsuChart":
         """https://osu.ppy.sh/wiki/en/Client/File_formats/Osu_(file_format)"""
-        with open(path, encoding = "utf-8") as p:
+        with path.open(encoding = "utf-8") as p:
             lines = p.readlines()
 
         chart = RawOsuChart()
@@ -341,7 +345,7 @@ class RawOsuChart:
             elif current_header is None:
                 continue
             elif current_header == "General":
-                if m := re.match(RE_KV_TYPE_2, line):
+                if m := RE_KV_TYPE_2.match(line):
                     match m.group(1):
                         case "AudioFilename":
                             chart.general.audio_filename = m.group(2)
@@ -368,7 +372,7 @@ class RawOsuChart:
                 # We're ignoring editor-only data right now, since we don't have a chart editor.
                 pass
             elif current_header == "Metadata":
-                if m := re.match(RE_KV_TYPE_1, line):
+                if m := RE_KV_TYPE_1.match(line):
                     match m.group(1):
                         case "Title":
                             chart.metadata.title = m.group(2)
@@ -389,7 +393,7 @@ class RawOsuChart:
                         case _:
                             logger.debug(f"Unknown Metadata metadata '{m.group(1)}' (Line {line_num}).")
             elif current_header == "Difficulty":
-                if m := re.match(RE_KV_TYPE_1, line):
+                if m := RE_KV_TYPE_1.match(line):
                     match m.group(1):
                         case "HPDrainRate":
                             chart.difficulty.hp_drain_rate = float(m.group(2))
@@ -409,7 +413,7 @@ class RawOsuChart:
                 pass
             # ## HERE BEGINS REGEX HELL ## #
             elif current_header == "TimingPoints":
-                if m := re.match(RE_TIMING_POINT, line):
+                if m := RE_TIMING_POINT.match(line):
                     # The first timing point has to be uninherited by nature.
                     uninherited = bool(int(m.group(7))) or not chart.timing_points
                     time = int(float(m.group(1))) / 1000
@@ -438,16 +442,16 @@ class RawOsuChart:
                 pass
             elif current_header == "HitObjects":
                 # x,y,time,type,hitSound,hitSample
-                if m := re.match(RE_HIT_CIRCLE, line):
+                if m := RE_HIT_CIRCLE.match(line):
                     x, y, time, object_type, hit_sound = get_standard_data_from_match(m)
                     # Hit sample
                     hit_sample_data = m.group(6)
-                    m2 = re.search(RE_HIT_SAMPLE, hit_sample_data)
+                    m2 = RE_HIT_SAMPLE.search(hit_sample_data)
                     if m2 is None:
                         raise ChartParseError(line_num, f"Unparseable hit sample data '{line}'.")
                     hit_sample = hit_sample_from_match(m2)
                     chart.hit_objects.append(OsuHitCircle(x, y, time, object_type, hit_sound, hit_sample))
-                elif m := re.match(RE_SLIDER, line):
+                elif m := RE_SLIDER.match(line):
                     x, y, time, object_type, hit_sound = get_standard_data_from_match(m)
                     # Slider specific
                     slider_type = m.group(6)
@@ -461,7 +465,7 @@ class RawOsuChart:
                     length = float(m.group(9))
                     # Hit sample
                     hit_sample_data = m.group(10)
-                    m2 = re.search(RE_HIT_SAMPLE, hit_sample_data)
+                    m2 = RE_HIT_SAMPLE.search(hit_sample_data)
                     if m2 is None:
                         raise ChartParseError(line_num, f"Unparseable hit sample data '{line}'.")
                     hit_sample = hit_sample_from_match(m2)
@@ -469,22 +473,22 @@ class RawOsuChart:
                                        slider_type, curve_points, slides, length, [], [], hit_sample)
                     chart.hit_objects.append(slider)
 
-                elif m := re.match(RE_SPINNER, line):
+                elif m := RE_SPINNER.match(line):
                     x, y, time, object_type, hit_sound = get_standard_data_from_match(m)
                     end_time = int(m.group(6)) / 1000
                     # Hit sample
                     hit_sample_data = m.group(7)
-                    m2 = re.search(RE_HIT_SAMPLE, hit_sample_data)
+                    m2 = RE_HIT_SAMPLE.search(hit_sample_data)
                     if m2 is None:
                         raise ChartParseError(line_num, f"Unparseable hit sample data '{line}'.")
                     hit_sample = hit_sample_from_match(m2)
                     chart.hit_objects.append(OsuSpinner(x, y, time, object_type, hit_sound, end_time, hit_sample))
-                elif m := re.match(RE_HOLD, line):
+                elif m := RE_HOLD.match(line):
                     x, y, time, object_type, hit_sound = get_standard_data_from_match(m)
                     end_time = int(m.group(6)) / 1000
                     # Hit sample
                     hit_sample_data = m.group(7)
-                    m2 = re.search(RE_HIT_SAMPLE, hit_sample_data)
+                    m2 = RE_HIT_SAMPLE.search(hit_sample_data)
                     if m2 is None:
                         raise ChartParseError(line_num, f"Unparseable hit sample data '{line}'.")
                     hit_sample = hit_sample_from_match(m2)
@@ -494,6 +498,8 @@ class RawOsuChart:
             else:
                 raise ChartParseError(line_num, f"Unknown header '{current_header}'.")
 
+        # osu! wants timing points in order anyway, but the lookups below bisect them, so make sure.
+        chart.timing_points.sort(key = lambda t: t.time)
         for ho in chart.hit_objects:
             if isinstance(ho, OsuSlider):
                 ho.end_time = chart.calculate_slider_length(ho) + ho.time
@@ -502,5 +508,12 @@ class RawOsuChart:
 
     def calculate_slider_length(self, slider: OsuSlider) -> Seconds:
         """https://osu.ppy.sh/wiki/en/Client/File_formats/osu_%28file_format%29#sliders"""
-        latest_timing_point = [t for t in self.timing_points if t.time <= slider.time][-1]
+        latest_timing_point = self.timing_point_at(slider.time)
         return (slider.px_length / (self.difficulty.slider_multiplier * 100 * latest_timing_point.slider_velocity_multipler) * latest_timing_point.beat_length) * slider.slides
+
+    def timing_point_at(self, time: Seconds) -> OsuTimingPoint:
+        """The timing point active at `time`. Inherited points already carry their parent's BPM,
+        so the latest point covers both the beat length and the slider velocity."""
+        # Anything before the first timing point uses the first one, like osu! does.
+        i = bisect_right(self.timing_points, time, key = lambda t: t.time)
+        return self.timing_points[max(i - 1, 0)]
@@ -27,9 +27,7 @@ from charm.game.gamemodes.five_fret import (
     BeatEvent,
     FiveFretNoteType
 )
-from charm.game.displayables.lyric_animator import LyricEvent
-
-from charm.game.generic import ChartMetadata, ChartSetMetadata, Parser
+from charm.game.generic import ChartMetadata, ChartSetMetadata, LyricEvent, Parser
 
 logger = logging.getLogger("charm")
 
@@ -144,7 +142,8 @@ def calculate_chart_note_flags(chart: FiveFretChart) -> None:
 
 def parse_chart_text_events(chart: FiveFretChart) -> None:
     current_solo = None
-    for e in chart.events_by_type(TextEvent):
+    # A copy, since the events get removed as we go
+    for e in list(chart.events_by_type(TextEvent)):
         if e.text == "solo":
             current_solo = e
             chart.events.remove(e)
@@ -204,7 +203,7 @@ def create_chart_beat_events(chart: FiveFretChart, time_sig_seconds: Index[Secon
     beats: list[BeatEvent] = []
     current_time = 0
     last_note = chart.notes[-1]
-    bpm_events = chart.events_by_type(BPMChangeTickEvent)
+    bpm_events = [*chart.events_by_type(BPMChangeTickEvent)]
     bpm_events.append(BPMChangeTickEvent(last_note.time, last_note.tick, bpm_events[-1].new_bpm))
     current_id = 0 # UNUSED
     for current_bpm_event, next_bpm_event in itertools.pairwise(bpm_events):
@@ -253,7 +252,8 @@ class DotChartParser(Parser):
         if not (path / "song.ini").exists():
             raise NoMetadataError(path.stem)
         parser = configparser.ConfigParser(interpolation = None, strict = False)
-        parser.read((path / "song.ini").absolute(), encoding = "utf-8")
+        with (path / "song.ini").open(encoding = "utf-8") as f:
+            parser.read_file(f)
         if "song" not in parser and "Song" not in parser:
             raise MetadataParseError("Song header not found in metadata!")
         song_header = "song" if "song" in parser else "Song"
@@ -286,7 +286,7 @@ class DotChartParser(Parser):
         metadatas: list[ChartMetadata] = []
         if not (path / "notes.chart").exists():
             raise NoChartsError(path.stem)
-        with open(path / "notes.chart", encoding = "utf-8") as f:
+        with (path / "notes.chart").open(encoding = "utf-8") as f:
             chartfile = f.readlines()
 
         for line in chartfile:
@@ -303,7 +303,7 @@ class DotChartParser(Parser):
     def parse_chart(chart_data: ChartMetadata) -> Sequence[FiveFretChart]:
         if not (chart_data.path).exists():
             raise NoChartsError(chart_data.path.stem)
-        with open(chart_data.path, encoding = "utf-8") as f:
+        with chart_data.path.open(encoding = "utf-8") as f:
             chartfile = f.readlines()
 
         target_header = f"{chart_data.difficulty}{chart_data.instrument}"
@@ -426,10 +426,8 @@ class DotChartParser(Parser):
         create_chart_chords(chart)
         calculate_chart_note_flags(chart)
         parse_chart_text_events(chart)
-        # We will recalc this later, but we don't need to sort or index the others yet so do only what we must.
-        ts_events = chart.events_by_type(TSEvent)
-        calculate_chart_hopos(chart, Index[Ticks, TSEvent](ts_events, "tick"), resolution)
-        create_chart_beat_events(chart, Index[Seconds, TSEvent](ts_events, "time"))
+        calculate_chart_hopos(chart, chart.event_index(TSEvent, "tick"), resolution)
+        create_chart_beat_events(chart, chart.event_index(TSEvent, "time"))
         # The chart events are messed up before now. There are a bunch of sorted events with unsorted events tacked on the end
         # If this ever needs changing I am so sorry.
         chart.events.extend(DotChartParser.calculate_countdowns(chart))
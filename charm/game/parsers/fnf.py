@@ -9,9 +9,8 @@ from collections.abc import Sequence
 
 from charm.lib.errors import ChartPostReadParseError, UnknownLanesError
 from charm.lib.types import Milliseconds, Seconds
-from charm.game.displayables.lyric_animator import LyricEvent
 
-from charm.game.generic import BPMChangeEvent, Event, ChartMetadata, ChartSetMetadata, Parser
+from charm.game.generic import BPMChangeEvent, Event, ChartMetadata, ChartSetMetadata, LyricEvent, Parser
 from charm.game.gamemodes.fnf import CameraFocusEvent, FNFChart, FNFNote, FNFNoteType
 
 logger = logging.getLogger("charm")
@@ -54,7 +53,7 @@ class FNFParser(Parser):
         if path.suffix != ".json":
             return False
         else:
-            with open(path, encoding = "utf-8") as f:
+            with path.open(encoding = "utf-8") as f:
                 try:
                     j = json.load(f)
                 except json.JSONDecodeError:
@@ -93,12 +92,12 @@ class FNFParser(Parser):
 
     @staticmethod
     def parse_chart(chart_data: ChartMetadata) -> Sequence[FNFChart]:
-        with open(chart_data.path) as p:
+        with chart_data.path.open() as p:
             j: SongFileJson = json.load(p)
         fnf_overrides = None
         override_path = chart_data.path.parent / "fnf.json"
         if override_path.exists() and override_path.is_file():
-            with open(override_path) as f:
+            with override_path.open() as f:
                 fnf_overrides = json.load(f)
         songdata = j["song"]
 
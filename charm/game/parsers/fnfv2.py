@@ -144,7 +144,7 @@ class FNFV2Parser(Parser):
         if path.suffix != ".json":
             return False
         else:
-            with open(path, encoding = "utf-8") as f:
+            with path.open(encoding = "utf-8") as f:
                 try:
                     j = json.load(f)
                 except json.JSONDecodeError:
@@ -160,7 +160,7 @@ class FNFV2Parser(Parser):
 
     @staticmethod
     def parse_chartset_metadata(path: Path) -> ChartSetMetadata:
-        with open(path / f'{path.name}-metadata.json') as data_file:
+        with (path / f'{path.name}-metadata.json').open() as data_file:
             metadata = json.load(data_file) # TODO: Give TypedDict
         play_data = metadata.get('playData', {}) # TODO: Give TypedDict
         return ChartSetMetadata(
@@ -177,7 +177,7 @@ class FNFV2Parser(Parser):
         stem = path.name
         chart_path = path / (stem + "-chart.json")
         meta_path = path / (stem + "-metadata.json")
-        with open(meta_path) as m:
+        with meta_path.open() as m:
             metadata: MetadataJSON = json.load(m)
         metadatas: list[ChartMetadata] = []
         for d in metadata["playData"]["difficulties"]:
@@ -186,11 +186,11 @@ class FNFV2Parser(Parser):
 
     @staticmethod
     def parse_chart(chart_data: ChartMetadata) -> Sequence[FNFChart]:
-        with open(chart_data.path) as p:
+        with chart_data.path.open() as p:
             j: SongFileJSON = json.load(p)
 
         fnf_metadata_path = chart_data.path.parent / (chart_data.path.parent.stem + "-metadata.json")
-        with open(fnf_metadata_path) as m:
+        with fnf_metadata_path.open() as m:
             metadata: MetadataJSON = json.load(m)
 
         p1_metadata = ChartMetadata(chart_data.gamemode, chart_data.difficulty, chart_data.path, "1")
@@ -206,7 +206,7 @@ class FNFV2Parser(Parser):
         fnf_overrides = None
         override_path = chart_data.path.parent / "fnf.json"
         if override_path.exists() and override_path.is_file():
-            with open(override_path) as f:
+            with override_path.open() as f:
                 fnf_overrides = json.load(f)
         if fnf_overrides:
             # This is done because some mods use "extra lanes" differently, so I have to provide
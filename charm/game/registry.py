@@ -0,0 +1,158 @@
+"""
+Where Charm finds out which parsers and gamemodes exist.
+
+Every parser and gamemode is declared here with just enough info to decide if it's worth
+importing (which gamemode it's for, which files it cares about) and a `module:Attribute`
+reference to the real thing. The implementation only gets imported the first time it's needed,
+so starting Charm doesn't drag in simfile, every gamemode's sprites, etc.
+
+Third-party formats can register themselves through the `charm.parsers` and `charm.gamemodes`
+entry point groups, pointing at a `ParserSpec` or `GameModeSpec` respectively:
+
+    [project.entry-points."charm.parsers"]
+    bms = "charm_bms.spec:BMS_PARSER"
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from functools import cache
+from importlib import import_module
+from importlib.metadata import EntryPoint, entry_points
+from threading import Lock
+from typing import TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    from charm.game.generic import BaseDisplay, BaseEngine, Parser
+    from charm.lib.archive import ChartPath
+
+logger = logging.getLogger("charm")
+
+PARSER_ENTRY_POINTS = "charm.parsers"
+GAMEMODE_ENTRY_POINTS = "charm.gamemodes"
+
+
+@cache
+def _resolve(target: str) -> object:
+    """Import `module:Attribute` and return the attribute."""
+    module_name, _, attr = target.partition(":")
+    return getattr(import_module(module_name), attr)
+
+
+@dataclass(frozen=True)
+class ParserSpec:
+    """A parser that hasn't been imported yet.
+
+    `chartset_files` are the patterns a folder has to contain at least one of for the parser to even
+    be asked, and `chart_files` the patterns a chart file has to match. They only need to be loose
+    enough to never rule out something the parser could actually read."""
+    name: str
+    gamemode: str
+    target: str
+    chartset_files: tuple[str, ...]
+    chart_files: tuple[str, ...]
+
+    def load(self) -> type[Parser]:
+        return _resolve(self.target)
+
+    def might_be_chartset(self, file_names: Iterable[str]) -> bool:
+        return any(fnmatchcase(n, p) for n in file_names for p in self.chartset_files)
+
+    def might_parse_chart(self, path: ChartPath) -> bool:
+        return any(fnmatchcase(path.name, p) for p in self.chart_files)
+
+
+@dataclass(frozen=True)
+class GameModeSpec:
+    """A gamemode that hasn't been imported yet."""
+    # ?: Add other gamemode properties?
+    # !: We are doing a single engine per mode, prevents multiplayer, but lets leave that for after MVP
+    key: str
+    engine_target: str
+    display_target: str
+
+    @property
+    def engine(self) -> type[BaseEngine]:
+        return _resolve(self.engine_target)
+
+    @property
+    def display(self) -> type[BaseDisplay]:
+        return _resolve(self.display_target)
+
+
+BUILTIN_PARSERS: tuple[ParserSpec, ...] = (
+    # TODO: Parse MIDI
+    ParserSpec("fnf", "fnf", "charm.game.parsers.fnf:FNFParser", ("*.json",), ("*.json",)),
+    ParserSpec("fnfv2", "fnf", "charm.game.parsers.fnfv2:FNFV2Parser", ("*.json",), ("*.json",)),
+    ParserSpec("mania", "4k", "charm.game.parsers.mania:ManiaParser", ("*.osu",), ("*.osu",)),
+    ParserSpec("sm", "4k", "charm.game.parsers.sm:SMParser", ("*.sm", "*.ssc"), ("*.sm", "*.ssc")),
+    ParserSpec("dotchart", "hero", "charm.game.parsers.dotchart:DotChartParser", ("*.chart",), ("notes.chart",)),
+    ParserSpec("taiko", "taiko", "charm.game.parsers.taiko:TaikoParser", ("*.osu",), ("*.osu",)),
+)
+
+BUILTIN_GAMEMODES: tuple[GameModeSpec, ...] = (
+    GameModeSpec("fnf", "charm.game.gamemodes.fnf:FNFEngine", "charm.game.gamemodes.fnf:FNFDisplay"),  # TODO: Doesn't work with Auto Engine
+    GameModeSpec("4k", "charm.game.gamemodes.four_key:FourKeyEngine", "charm.game.gamemodes.four_key:FourKeyDisplay"),
+    GameModeSpec("hero", "charm.game.gamemodes.five_fret:FiveFretEngine", "charm.game.gamemodes.five_fret:FiveFretDisplay"),
+    GameModeSpec("taiko", "charm.game.generic:AutoEngine", "charm.game.gamemodes.taiko:TaikoDisplay"),
+)
+
+
+class Registry:
+    """All the known parsers and gamemodes. Plugins get picked up the first time anything is looked up."""
+    def __init__(self, parsers: Sequence[ParserSpec], gamemodes: Sequence[GameModeSpec]):
+        self._parsers: list[ParserSpec] = list(parsers)
+        self._gamemodes: dict[str, GameModeSpec] = {g.key: g for g in gamemodes}
+        self._plugins_loaded = False
+        self._lock = Lock()
+
+    def _ensure_plugins(self) -> None:
+        # The chart loader thread and the main thread can both get here first.
+        with self._lock:
+            if self._plugins_loaded:
+                return
+            self._plugins_loaded = True
+            for ep in entry_points(group = GAMEMODE_ENTRY_POINTS):
+                if (spec := self._load_entry_point(ep, GameModeSpec)) is not None:
+                    self._gamemodes[spec.key] = spec
+            for ep in entry_points(group = PARSER_ENTRY_POINTS):
+                if (spec := self._load_entry_point(ep, ParserSpec)) is not None:
+                    self._parsers.append(spec)
+
+    @staticmethod
+    def _load_entry_point[T](ep: EntryPoint, kind: type[T]) -> T | None:
+        # A broken plugin shouldn't stop Charm from starting.
+        try:
+            spec = ep.load()
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Unable to load plugin '{ep.name}' ({ep.value}): {e}")
+            return None
+        if not isinstance(spec, kind):
+            logger.error(f"Plugin '{ep.name}' ({ep.value}) is not a {kind.__name__}, ignoring it.")
+            return None
+        logger.info(f"Loaded plugin {kind.__name__} '{ep.name}'")
+        return spec
+
+    def register_parser(self, spec: ParserSpec) -> None:
+        self._parsers.append(spec)
+
+    def register_gamemode(self, spec: GameModeSpec) -> None:
+        self._gamemodes[spec.key] = spec
+
+    @property
+    def parsers(self) -> list[ParserSpec]:
+        self._ensure_plugins()
+        return self._parsers
+
+    @property
+    def gamemodes(self) -> dict[str, GameModeSpec]:
+        self._ensure_plugins()
+        return self._gamemodes
+
+    def parsers_for(self, gamemode: str) -> list[ParserSpec]:
+        return [p for p in self.parsers if p.gamemode == gamemode]
+
+
+REGISTRY = Registry(BUILTIN_PARSERS, BUILTIN_GAMEMODES)
@@ -0,0 +1,312 @@
+"""
+Read-only chartset packs (`.osz`, `.zip`) that can be walked and parsed without extracting them.
+
+An `ArchivePath` quacks like the subset of `pathlib.Path` that the loader and parsers use, so a
+chartset inside an archive goes through exactly the same code as a chartset in a real folder.
+The central directory of each archive is read once, when it is first opened. Stored (uncompressed)
+members, which is how most packs store their audio, are served as zero-copy slices of an mmap of
+the archive, everything else goes through `zipfile`.
+
+Only the `MAX_OPEN_ARCHIVES` most recently used archives keep their file open, since scanning a
+big library goes through every pack in it. The rest are closed and opened again when they're read.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Buffer, Iterator
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+from threading import RLock
+from typing import IO, Any, BinaryIO, ClassVar
+from weakref import WeakSet, WeakValueDictionary
+from zipfile import ZipFile, ZipInfo, ZIP_STORED
+import io
+import logging
+import mmap
+import struct
+
+logger = logging.getLogger("charm")
+
+ARCHIVE_SUFFIXES = {".osz", ".zip"}
+MAX_OPEN_ARCHIVES = 32
+
+# The fixed part of a zip local file header is 30 bytes long,
+# and the file name and extra field lengths live at the end of it.
+_LOCAL_HEADER_SIZE = 30
+_LOCAL_HEADER_LENGTHS = struct.Struct("<HH")
+_LOCAL_HEADER_LENGTHS_OFFSET = 26
+
+
+def is_archive(path: Path) -> bool:
+    """Could this file be a chartset pack?"""
+    return path.suffix.lower() in ARCHIVE_SUFFIXES and path.is_file()
+
+
+class MemberReader(io.RawIOBase):
+    """A seekable, read-only stream over a memoryview, so stored members never get copied out of the mmap."""
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        match whence:
+            case io.SEEK_SET:
+                pos = offset
+            case io.SEEK_CUR:
+                pos = self._pos + offset
+            case io.SEEK_END:
+                pos = len(self._view) + offset
+            case _:
+                raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer: Buffer) -> int:
+        with memoryview(buffer) as view, view.cast("B") as out:
+            start = min(self._pos, len(self._view))
+            end = min(start + len(out), len(self._view))
+            size = end - start
+            out[:size] = self._view[start:end]
+        self._pos = end
+        return size
+
+    def close(self) -> None:
+        self._view.release()
+        super().close()
+
+
+class ChartArchive:
+    """An opened chartset pack. Use `ChartArchive.open` so that each archive is only read once.
+
+    The archive's file is opened again whenever it's needed, after being closed by `close()` or
+    for not having been used in a while."""
+    _opened: ClassVar[WeakValueDictionary[Path, ChartArchive]] = WeakValueDictionary()
+    # The archives that have their file open, least recently used first.
+    _recent: ClassVar[OrderedDict[Path, ChartArchive]] = OrderedDict()
+    _lock: ClassVar[RLock] = RLock()
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file: BinaryIO | None = None
+        self._mmap: mmap.mmap | None = None
+        self.zipfile: ZipFile | None = None
+        self._streams: WeakSet[IO[bytes]] = WeakSet()
+        self._open_file()
+
+        self.infos: dict[str, ZipInfo] = {}
+        self.children: dict[str, list[str]] = {"": []}
+        for info in self.zipfile.infolist():
+            name = info.filename.rstrip("/")
+            if not info.is_dir():
+                self.infos[name] = info
+            self._add_entry(name, is_dir=info.is_dir())
+
+    def _open_file(self) -> None:
+        self._file = self.path.open("rb")
+        try:
+            # ZipFile reads the central directory here.
+            self.zipfile = ZipFile(self._file)
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            self._file = None
+            raise
+
+    def _close_file(self) -> bool:
+        """Returns False (and leaves it open) if anything is still reading from the archive."""
+        if self._mmap is None:
+            return True
+        if any(not stream.closed for stream in self._streams):
+            return False
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Someone still has a view of a stored member
+            return False
+        self.zipfile.close()
+        self._file.close()
+        self._file = self._mmap = self.zipfile = None
+        return True
+
+    def _use(self) -> None:
+        """Make sure the file is open, and close the ones that haven't been used for longest if too many are."""
+        if self._mmap is None:
+            self._open_file()
+        self._recent[self.path] = self
+        self._recent.move_to_end(self.path)
+        excess = len(self._recent) - MAX_OPEN_ARCHIVES
+        for archive in list(self._recent.values())[:-1]:
+            if excess <= 0:
+                break
+            if archive.close():
+                excess -= 1
+
+    def close(self) -> bool:
+        """Close the archive's file, if nothing is reading from it. Reading anything else out of it opens it again."""
+        with self._lock:
+            if not self._close_file():
+                return False
+            self._recent.pop(self.path, None)
+            return True
+
+    @property
+    def is_open(self) -> bool:
+        return self._mmap is not None
+
+    def _add_entry(self, name: str, *, is_dir: bool) -> None:
+        # Zips don't have to list the folders they contain, so add every missing parent along the way.
+        if is_dir and name in self.children:
+            return
+        if is_dir:
+            self.children[name] = []
+        parent = name.rpartition("/")[0]
+        if parent not in self.children:
+            self._add_entry(parent, is_dir=True)
+        self.children[parent].append(name)
+
+    @classmethod
+    def open(cls, path: Path) -> ChartArchive:
+        path = path.resolve()
+        with cls._lock:
+            archive = cls._opened.get(path)
+            if archive is None:
+                archive = cls._opened[path] = cls(path)
+            archive._use()
+            return archive
+
+    @property
+    def root(self) -> ArchivePath:
+        return ArchivePath(self, "")
+
+    def view(self, name: str) -> memoryview | None:
+        """A zero-copy view of a member's bytes, or None if the member is compressed or encrypted."""
+        info = self.infos[name]
+        if info.compress_type != ZIP_STORED or info.flag_bits & 0x1:
+            return None
+        with self._lock:
+            self._use()
+            # The local header can have a different extra field than the central directory, so read its lengths from it.
+            name_length, extra_length = _LOCAL_HEADER_LENGTHS.unpack_from(self._mmap, info.header_offset + _LOCAL_HEADER_LENGTHS_OFFSET)
+            start = info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length
+            return memoryview(self._mmap)[start:start + info.file_size]
+
+    def open_member(self, name: str) -> IO[bytes]:
+        with self._lock:
+            self._use()
+            view = self.view(name)
+            stream = self.zipfile.open(self.infos[name]) if view is None else io.BufferedReader(MemberReader(view))
+            self._streams.add(stream)
+        return stream
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.path}>"
+
+
+class ArchivePath:
+    """A path to a file or folder inside a `ChartArchive`.
+
+    The root of an archive is named after the archive's stem, since it stands in for the chartset's folder."""
+    def __init__(self, archive: ChartArchive, at: str):
+        self.archive = archive
+        self.at = at
+
+    @property
+    def name(self) -> str:
+        if not self.at:
+            return self.archive.path.stem
+        return self.at.rpartition("/")[2]
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self.name).stem
+
+    @property
+    def suffix(self) -> str:
+        return PurePosixPath(self.name).suffix if self.at else ""
+
+    @property
+    def parent(self) -> ArchivePath | Path:
+        if not self.at:
+            return self.archive.path.parent
+        return ArchivePath(self.archive, self.at.rpartition("/")[0])
+
+    def joinpath(self, *others: str) -> ArchivePath:
+        at = PurePosixPath(self.at, *others).as_posix()
+        return ArchivePath(self.archive, "" if at == "." else at)
+
+    def __truediv__(self, other: str) -> ArchivePath:
+        return self.joinpath(other)
+
+    def absolute(self) -> ArchivePath:
+        return self
+
+    def exists(self) -> bool:
+        return self.is_file() or self.is_dir()
+
+    def is_file(self) -> bool:
+        return self.at in self.archive.infos
+
+    def is_dir(self) -> bool:
+        return self.at in self.archive.children
+
+    def iterdir(self) -> Iterator[ArchivePath]:
+        if not self.is_dir():
+            raise NotADirectoryError(str(self))
+        return (ArchivePath(self.archive, child) for child in self.archive.children[self.at])
+
+    def glob(self, pattern: str) -> Iterator[ArchivePath]:
+        """Only matches the direct children of this folder, which is all the parsers ask for."""
+        pattern = pattern.removeprefix("./")
+        return (child for child in self.iterdir() if fnmatchcase(child.name, pattern))
+
+    def open(self, mode: str = "r", encoding: str | None = None, errors: str | None = None, newline: str | None = None) -> IO[Any]:
+        if mode not in {"r", "rb"}:
+            raise ValueError(f"Chart archives are read-only, can't open with mode '{mode}'")
+        if not self.is_file():
+            raise FileNotFoundError(str(self))
+        stream = self.archive.open_member(self.at)
+        if mode == "rb":
+            return stream
+        return io.TextIOWrapper(stream, encoding, errors, newline)
+
+    def read_bytes(self) -> bytes:
+        with self.open("rb") as f:
+            return f.read()
+
+    def read_text(self, encoding: str | None = None) -> str:
+        with self.open("r", encoding = encoding) as f:
+            return f.read()
+
+    def read_view(self) -> memoryview | bytes:
+        """The member's bytes, without copying them if the member is stored."""
+        view = self.archive.view(self.at)
+        return view if view is not None else self.read_bytes()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ArchivePath):
+            return (self.archive.path, self.at) == (other.archive.path, other.at)
+        return False
+
+    def __hash__(self) -> int:
+        return hash((self.archive.path, self.at))
+
+    def __str__(self) -> str:
+        return str(self.archive.path / self.at) if self.at else str(self.archive.path)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self}>"
+
+
+type ChartPath = Path | ArchivePath
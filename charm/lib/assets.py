@@ -0,0 +1,175 @@
+"""
+Skins, and loading what's in them.
+
+A `Skin` is where a chart's textures come from. Every file is looked for in the chart's own
+`skin` folder first, then the skin picked in the settings (a folder in `datadir/skins`), then
+the base skin that ships with Charm, so a skin only has to have the files it changes.
+
+`ASSETS` loads things out of a skin on worker threads and keeps them while something is using
+them. Views own what they load: anything loaded inside `ASSETS.using(view, skin)` belongs to
+that view, and once every view that owns an asset has called `ASSETS.release(view)` it's thrown
+away, textures and all, so going from one skinned chart to another doesn't keep everything around.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Hashable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from importlib.resources import files
+from importlib.resources.abc import Traversable
+from threading import Lock
+from typing import Any, Self
+from weakref import WeakSet
+import logging
+
+import arcade
+from arcade import Texture
+
+from charm.core.paths import skinspath
+from charm.core.settings import settings
+import charm.data.images.skins
+
+logger = logging.getLogger("charm")
+
+ASSET_WORKERS = 4
+
+
+class Skin:
+    """Where a skin's files are. Each file is looked for in every root in turn, and the first one found wins."""
+    def __init__(self, *roots: Traversable):
+        self.roots = roots
+
+    @classmethod
+    def base(cls) -> Self:
+        return cls(files(charm.data.images.skins))
+
+    @classmethod
+    def for_chart(cls, chart_folder: Traversable | None = None) -> Self:
+        """The chart folder's own skin, then the one in the settings, then the base skin."""
+        roots: list[Traversable] = []
+        if chart_folder is not None and (folder := chart_folder / "skin").is_dir():
+            roots.append(folder)
+        if settings.skin and (folder := skinspath / settings.skin).is_dir():
+            roots.append(folder)
+        elif settings.skin:
+            logger.warning(f"Skin {settings.skin} isn't in {skinspath}, using the base skin")
+        return cls(*roots, files(charm.data.images.skins))
+
+    def find(self, *parts: str) -> Traversable:
+        for root in self.roots:
+            path = root.joinpath(*parts)
+            if path.is_file():
+                return path
+        raise FileNotFoundError("/".join(parts))
+
+    def folders(self, *parts: str) -> list[Traversable]:
+        """Every root's version of a folder, for working out if anything in it has changed."""
+        return [path for root in self.roots if (path := root.joinpath(*parts)).is_dir()]
+
+    @property
+    def key(self) -> tuple[str, ...]:
+        return tuple(str(root) for root in self.roots)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Skin) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"<Skin {' > '.join(self.key)}>"
+
+
+@dataclass
+class Asset:
+    future: Future[Any]
+    # The views using it. Weak, so a view that's gone away without being released doesn't keep it
+    # (and its id being reused by a new view can't mix their assets up.)
+    owners: WeakSet[object] = field(default_factory=WeakSet)
+    kept: bool = False  # Loaded without an owner, so only `clear()` gets rid of it
+
+
+def textures_of(value: object) -> tuple[Texture, ...]:
+    """The textures an asset has made, so they can be taken out of the texture atlas."""
+    if isinstance(value, Texture):
+        return (value,)
+    textures = getattr(value, "textures", None)
+    return tuple(textures()) if callable(textures) else ()
+
+
+class AssetManager:
+    def __init__(self, workers: int = ASSET_WORKERS):
+        self._workers = ThreadPoolExecutor(workers, thread_name_prefix="charm-assets")
+        self._assets: dict[tuple[Skin, Hashable], Asset] = {}
+        self._lock = Lock()
+        # What's being loaded for, and out of which skin. Set with `using()`.
+        self.owner: object | None = None
+        self.skin: Skin = Skin.base()
+
+    @contextmanager
+    def using(self, owner: object, skin: Skin) -> Iterator[Skin]:
+        """Everything loaded in here is from `skin`, and kept until `owner` is released."""
+        old = self.owner, self.skin
+        self.owner, self.skin = owner, skin
+        try:
+            yield skin
+        finally:
+            self.owner, self.skin = old
+
+    def load[T](self, key: Hashable, loader: Callable[[Skin], T]) -> Future[T]:
+        """Start loading an asset from the current skin on a worker thread, or get the one that's already loading.
+
+        `loader` is called with the skin. Assets loaded outside of `using()` don't have an owner, and stay until `clear()`."""
+        skin = self.skin
+        with self._lock:
+            asset = self._assets.get((skin, key))
+            if asset is None:
+                asset = self._assets[(skin, key)] = Asset(self._workers.submit(loader, skin))
+            if self.owner is None:
+                asset.kept = True
+            else:
+                asset.owners.add(self.owner)
+        return asset.future
+
+    def get[T](self, key: Hashable, loader: Callable[[Skin], T]) -> T:
+        """`load()`, and wait for it."""
+        return self.load(key, loader).result()
+
+    def release(self, owner: object) -> None:
+        """`owner` is done with everything it loaded. Anything nothing else is using gets thrown away."""
+        with self._lock:
+            for asset in self._assets.values():
+                asset.owners.discard(owner)
+            unused = {k: a for k, a in self._assets.items() if not a.owners and not a.kept}
+            for k in unused:
+                del self._assets[k]
+        for asset in unused.values():
+            self._evict(asset)
+        if unused:
+            logger.debug(f"Released {len(unused)} assets, {len(self._assets)} still loaded")
+
+    def clear(self) -> None:
+        with self._lock:
+            assets = list(self._assets.values())
+            self._assets.clear()
+        for asset in assets:
+            self._evict(asset)
+
+    def _evict(self, asset: Asset) -> None:
+        # Anything still loading never got as far as the texture atlas
+        if asset.future.cancel() or not asset.future.done() or asset.future.exception() is not None:
+            return
+        textures = textures_of(asset.future.result())
+        if not textures:
+            return
+        atlas = arcade.get_window().ctx.default_atlas
+        for texture in textures:
+            if atlas.has_texture(texture):
+                atlas.remove(texture)
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+
+ASSETS = AssetManager()
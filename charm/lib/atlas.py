@@ -0,0 +1,154 @@
+"""
+Baked texture atlases.
+
+Skins are lots of little PNGs that get resized (and sometimes recolored) to fit a highway, which
+is slow to redo every launch and for every new note size. Baking does all of that once, packs
+the results into one image and saves it next to a JSON map of where each texture is. Atlases
+are keyed by the skin's files (their names, sizes and modification times, which is a lot cheaper
+than reading them all), what's in them, and the size they're for, so changing any of those bakes
+a new one, and otherwise loading a skin is opening a single image.
+
+Atlases aren't cached here, load them through `charm.lib.assets.ASSETS` so they're let go of.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping, Sequence
+from hashlib import sha1
+from importlib.resources.abc import Traversable
+from pathlib import Path
+from typing import Self
+import json
+import logging
+
+import PIL.Image
+from arcade import Texture
+
+from charm.core.paths import atlaspath
+from charm.lib.utils import img_from_path
+
+logger = logging.getLogger("charm")
+
+# Bump this if the way things are baked changes, so old atlases stop being used
+ATLAS_VERSION = 1
+ATLAS_WIDTH = 2048
+
+type Region = tuple[int, int, int, int]  # x, y, w, h
+
+
+def hash_files(folder: Traversable) -> str:
+    """Identifies everything in a folder (and the folders in it) by name, size and modification time.
+
+    Files that can't be stat'd (like ones in a chart archive) are identified by their contents instead."""
+    h = sha1()
+    stack = [folder]
+    while stack:
+        for item in sorted(stack.pop().iterdir(), key=lambda i: i.name):
+            if item.is_dir():
+                stack.append(item)
+                continue
+            h.update(item.name.encode())
+            if isinstance(item, Path):
+                stat = item.stat()
+                h.update(f"{stat.st_size}/{stat.st_mtime_ns}".encode())
+            else:
+                h.update(item.read_bytes())
+    return h.hexdigest()
+
+
+class AtlasVersionError(Exception):
+    """The atlas on disk was baked by a different version of Charm."""
+
+
+class BakedAtlas:
+    """Named textures, all cut out of one image."""
+    def __init__(self, name: str, image: PIL.Image.Image, regions: Mapping[str, Region]):
+        self.name = name
+        self.image = image
+        self.regions = dict(regions)
+        self._textures: dict[str, Texture] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.regions
+
+    def __getitem__(self, key: str) -> Texture:
+        texture = self._textures.get(key)
+        if texture is None:
+            x, y, w, h = self.regions[key]
+            texture = Texture(self.image.crop((x, y, x + w, y + h)), hash=f"{self.name}/{key}")
+            self._textures[key] = texture
+        return texture
+
+    def get(self, key: str, fallback: Callable[[], Texture]) -> Texture:
+        """The texture for `key`, or `fallback()` for anything that wasn't baked (which is then kept with the rest.)"""
+        if key in self.regions:
+            return self[key]
+        texture = self._textures.get(key)
+        if texture is None:
+            texture = self._textures[key] = fallback()
+        return texture
+
+    def textures(self) -> list[Texture]:
+        """Every texture that's been made out of the atlas so far."""
+        return list(self._textures.values())
+
+    @classmethod
+    def pack(cls, name: str, images: Mapping[str, PIL.Image.Image]) -> Self:
+        """Lay the images out in rows, tallest first, so every row wastes as little height as it can."""
+        width = max(ATLAS_WIDTH, *(image.width for image in images.values()), 1)
+        regions: dict[str, Region] = {}
+        x = y = row_height = 0
+        for key, image in sorted(images.items(), key=lambda i: -i[1].height):
+            if x + image.width > width:
+                x, y, row_height = 0, y + row_height, 0
+            regions[key] = (x, y, image.width, image.height)
+            x += image.width
+            row_height = max(row_height, image.height)
+
+        atlas = PIL.Image.new("RGBA", (width, max(y + row_height, 1)), (0, 0, 0, 0))
+        for key, (x, y, _, _) in regions.items():
+            atlas.paste(images[key].convert("RGBA"), (x, y))
+        return cls(name, atlas, regions)
+
+    def save(self, path: Path) -> None:
+        self.image.save(path.with_suffix(".png"))
+        with path.with_suffix(".json").open("w") as f:
+            json.dump({"version": ATLAS_VERSION, "regions": self.regions}, f)
+
+    @classmethod
+    def load(cls, name: str, path: Path) -> Self:
+        with path.with_suffix(".json").open("r") as f:
+            data = json.load(f)
+        if data["version"] != ATLAS_VERSION:
+            raise AtlasVersionError(f"Atlas {name} is version {data['version']}, not {ATLAS_VERSION}")
+        regions = {key: tuple(region) for key, region in data["regions"].items()}
+        return cls(name, img_from_path(path.with_suffix(".png")).convert("RGBA"), regions)
+
+
+def bake(skin: str, sources: Sequence[Traversable], size: int, recipes: Mapping[str, Callable[[], Texture]]) -> BakedAtlas:
+    """Every texture in `recipes` (made by calling it) for a skin at `size`, from disk if it's been baked before.
+
+    `sources` are the folders the skin's files come from, anything changing in them means baking again."""
+    h = sha1()
+    for source in sources:
+        h.update(hash_files(source).encode())
+    h.update(f"{ATLAS_VERSION}/{size}/{','.join(sorted(recipes))}".encode())
+    name = f"{skin}-{size}-{h.hexdigest()[:16]}"
+    path = atlaspath / name
+
+    try:
+        atlas = BakedAtlas.load(name, path)
+    except (OSError, ValueError, KeyError, AtlasVersionError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning(f"Unable to load atlas {name}, baking it again | {e}")
+    else:
+        if atlas.regions.keys() == recipes.keys():
+            return atlas
+
+    atlas = BakedAtlas.pack(name, {key: recipe().image for key, recipe in recipes.items()})
+    try:
+        atlas.save(path)
+    except OSError as e:
+        logger.warning(f"Unable to save atlas {name} | {e}")
+    else:
+        logger.info(f"Baked {len(recipes)} textures into atlas {name}")
+    return atlas
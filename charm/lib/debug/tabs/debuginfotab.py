@@ -8,6 +8,8 @@ from collections import deque
 import numpy as np
 from imgui_bundle import imgui, imgui_ctx
 
+from charm.lib.pool import named_pools
+
 
 class DebugInfoTab:
     def __init__(self, window: DigiWindow) -> None:
@@ -58,4 +60,7 @@ class DebugInfoTab:
             )
             imgui.spacing()
             imgui.separator()
+            # Pools (peak is the most ever in use at once)
+            for pool in named_pools():
+                imgui.text(f"{pool.name}: {pool.next_idx}/{pool.size} (peak {pool.high_water}, grew {pool.grown}x)")
             # imgui.text(f"{self.window.ctx.limits.RENDERER}")
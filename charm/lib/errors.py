@@ -1,16 +1,15 @@
 from __future__ import annotations
 
 import logging
+import sys
 import traceback
 from importlib.resources import files
-from typing import ClassVar
-
-import PIL, PIL.Image, PIL.ImageDraw  # noqa: E401
-import arcade
-from arcade import Sprite, Texture, color as colors
+from typing import TYPE_CHECKING, ClassVar
 
 import charm.data.images.errors
-from charm.lib.utils import img_from_path
+
+if TYPE_CHECKING:
+    from arcade import Sprite, Texture
 
 MAX_REPEATS = 50
 
@@ -36,16 +35,23 @@ class CharmError(Exception):
         self.icon_name = icon
         self._repeat = repeat
         super().__init__(message)
+        # The engines and parsers raise these too, and they have to work without arcade (or a window) at all.
+        arcade = sys.modules.get("arcade")
+        if arcade is None:
+            return
         try:
             window = arcade.get_window()
         except RuntimeError:
             # If we aren't in an arcade Window (e.g., unit testing) we don't need the sprite stuff.
             return
 
+        import PIL.Image
+        from charm.lib.utils import img_from_path
+
         if icon not in CharmError._icon_textures:
             icon_img = img_from_path(files(charm.data.images.errors) / f"{self.icon_name}.png")
             icon_img.resize((32, 32), PIL.Image.LANCZOS)
-            CharmError._icon_textures[icon] = Texture(icon_img)
+            CharmError._icon_textures[icon] = arcade.Texture(icon_img)
 
         self._icon = CharmError._icon_textures[icon]
         self.sprite = self.get_sprite()
@@ -59,14 +65,18 @@ class CharmError(Exception):
     def repeat(self, i: int) -> None:
         self._repeat = i
         if i > MAX_REPEATS:
+            import arcade
             arcade.get_window().close()
 
     def redraw(self) -> None:
+        import arcade
         window = arcade.get_window()
         self.sprite = self.get_sprite()
         self.sprite.position = window.center
 
     def get_sprite(self) -> Sprite:
+        import arcade
+        from arcade import Sprite, Texture, color as colors
         window = arcade.get_window()
         _tex = Texture.create_empty(f"_error-{self.title}-{self.message}", (500, 200))
         default_atlas = window.ctx.default_atlas
@@ -182,6 +192,11 @@ class ScoreDBVersionMismatchError(CharmError):
         super().__init__(title="Score DB version mismatch!", message=f"Version {version} mismatched with correct version {correct_version}!")
 
 
+class ReplayError(CharmError):
+    def __init__(self, message: str):
+        super().__init__(title="Unreadable replay!", message=message)
+
+
 class InvalidNoteLengthError(CharmError):
     def __init__(self, length: float, body_length: float):
         super().__init__(
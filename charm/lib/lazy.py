@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from importlib import import_module
+
+
+def lazy_exports(package: str, modules: Mapping[str, str]) -> Callable[[str], object]:
+    """A module `__getattr__` that only imports each of `modules` (name -> relative module) when the name is asked for.
+
+    Use it as `__getattr__ = lazy_exports(__name__, {...})`, for names that would drag in something
+    heavy (like arcade) that the rest of the package doesn't need."""
+    def __getattr__(name: str) -> object:
+        if name in modules:
+            return getattr(import_module(modules[name], package), name)
+        raise AttributeError(f"module {package!r} has no attribute {name!r}")
+    return __getattr__
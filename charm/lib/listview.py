@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from typing import overload
+
+
+class ListView[T](Sequence[T]):
+    """A read-only window onto `items[start:stop]`, without copying anything out of the list.
+
+    It reads straight from the list, so it sees items being changed, but anything that moves
+    items around (inserting, removing, sorting) moves them under the view too."""
+    __slots__ = ("_items", "_start", "_stop")
+
+    def __init__(self, items: list[T], start: int = 0, stop: int | None = None):
+        self._items = items
+        self._start, self._stop, _ = slice(start, stop).indices(len(items))
+        self._stop = max(self._stop, self._start)
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    @overload
+    def __getitem__(self, i: int) -> T: ...
+    @overload
+    def __getitem__(self, i: slice) -> Sequence[T]: ...
+    def __getitem__(self, i: int | slice) -> T | Sequence[T]:
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                # Going backwards, `stop` can be -1, which means something else entirely once it's offset into the list
+                return [self._items[self._start + j] for j in range(start, stop, step)]
+            return ListView(self._items, self._start + start, self._start + max(stop, start))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("ListView index out of range")
+        return self._items[self._start + i]
+
+    def __iter__(self) -> Iterator[T]:
+        return map(self._items.__getitem__, range(self._start, self._stop))
+
+    def __reversed__(self) -> Iterator[T]:
+        return map(self._items.__getitem__, reversed(range(self._start, self._stop)))
+
+    def __repr__(self) -> str:
+        return f"<ListView [{self._start}:{self._stop}] of {len(self._items)}>"
@@ -5,6 +5,8 @@ from pyglet.media.codecs.pyogg import PyOggDecoder
 from arcade import Sound
 from arcade.resources import resolve_resource_path
 
+from charm.lib.archive import ArchivePath
+
 pyogg_decoder = PyOggDecoder()
 
 
@@ -23,3 +25,19 @@ class OGGSound(Sound):
             self.file_name, streaming=streaming, decoder=pyogg_decoder)
 
         self.min_distance = 100000000  # setting the players to this allows for 2D panning with 3D audio
+
+
+class ArchiveSound(Sound):
+    """A sound streamed straight out of a chartset archive, without extracting it to disk."""
+    def __init__(self, member: ArchivePath):
+        if not member.is_file():
+            raise FileNotFoundError(f"The sound file '{member}' is not a file or can't be read.")
+
+        self.file_name: str = str(member)
+
+        # The source reads from this as it streams, so it has to stay open as long as the sound does.
+        self._file = member.open("rb")
+        self.source: media.StreamingSource = media.load(
+            member.name, file=self._file, streaming=True, decoder=pyogg_decoder if member.suffix == ".ogg" else None)
+
+        self.min_distance = 100000000  # setting the players to this allows for 2D panning with 3D audio
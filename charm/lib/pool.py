@@ -1,8 +1,23 @@
 from __future__ import annotations
 from typing import Self
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+import logging
+from weakref import WeakSet
+import numpy as np
 from arcade import SpriteList, BasicSprite
 
+logger = logging.getLogger("charm")
+
+# How many items a pool makes at a time once it runs out
+POOL_CHUNK = 32
+
+# Every pool with a name, for the debug menu
+_named_pools: WeakSet[Pool] = WeakSet()
+
+
+def named_pools() -> list[Pool]:
+    return sorted(_named_pools, key=lambda p: p.name)
+
 
 class Pool[T]:
     """
@@ -19,18 +34,31 @@ class Pool[T]:
     The weakness here is that if the number of used items stays small with small variations the same items
     will be used over and over again, but that isn't really an issue.
 
-    the slowest part is getting the item's index, so we could speed it up with some dictionaries, but
-    that adds complexity and memory that probably isn't worth it. Also using the idx methods exclude that step
-    so if you need the speed that is the way to use the Pool.
+    Every item's index is kept in a dict (by id, so items don't have to be hashable), so giving an
+    item back is O(1) rather than a search through the whole pool.
+
+    With a `factory` the pool never runs out, it makes `chunk` more items whenever it's empty.
+    `high_water` is the most items that have been given out at once, which is what the pool should
+    have been sized to. Pools with a `name` show up in the debug menu.
     """
-    def __init__(self, items: list[T]):
+    def __init__(self, items: list[T], *, factory: Callable[[int], T] | None = None, chunk: int = POOL_CHUNK, name: str = ""):
         self._source: list[T] = items
         self._size: int = len(self._source)
         self._free_idx: int = 0
+        self._slots: dict[int, int] = {id(item): idx for idx, item in enumerate(items)}
+
+        self._factory = factory
+        self.chunk = chunk
+        self.name = name
+        self.high_water: int = 0
+        self.grown: int = 0
+        if name:
+            _named_pools.add(self)
 
     @classmethod
-    def from_callback(cls, size: int, callback: Callable[[int], T]) -> Self:
-        return cls([(callback(idx) for idx in range(size))])
+    def from_callback(cls, size: int, callback: Callable[[int], T], *, grow: bool = True, chunk: int = POOL_CHUNK, name: str = "") -> Self:
+        """A pool of `size` items made by `callback(idx)`, which it keeps using to grow (unless `grow` is False.)"""
+        return cls([callback(idx) for idx in range(size)], factory=callback if grow else None, chunk=chunk, name=name)
 
     @property
     def source(self) -> list[T]:
@@ -44,6 +72,15 @@ class Pool[T]:
     def free_items(self) -> tuple[T, ...]:
         return tuple(self._source[self._free_idx:])
 
+    def given(self) -> Iterator[T]:
+        """Every given item, without copying them out like `given_items` does.
+
+        It goes from the last given item to the first, so items can be given back along the way:
+        the item that gets swapped into a returned item's place has always been seen already."""
+        source = self._source
+        for idx in range(self._free_idx - 1, -1, -1):
+            yield source[idx]
+
     @property
     def size(self) -> int:
         return self._size
@@ -53,23 +90,55 @@ class Pool[T]:
         return self._free_idx
 
     def has_free_slot(self) -> bool:
-        return self._free_idx < self._size
+        """If `get()` will work, either because there's a free item or because the pool can make one."""
+        return self._free_idx < self._size or self._factory is not None
 
     def get(self) -> T:
         if self._free_idx >= self._size:
-            raise IndexError('No free items to return')
+            if self._factory is None:
+                raise IndexError('No free items to return')
+            self.grow()
 
         item = self._source[self._free_idx]
         self._free_idx += 1
+        self.high_water = max(self.high_water, self._free_idx)
         return item
 
+    def grow(self, count: int | None = None) -> None:
+        """Make `count` (or `chunk`) more free items."""
+        if self._factory is None:
+            raise ValueError('trying to grow a pool without a factory')
+        count = self.chunk if count is None else count
+        items = [self._factory(self._size + idx) for idx in range(count)]
+        for idx, item in enumerate(items, self._size):
+            self._slots[id(item)] = idx
+        self._extend(items)
+        self._size += count
+        self.grown += 1
+        logger.debug(f"Pool {self.name or '(unnamed)'} grew to {self._size} items")
+
+    def _extend(self, items: list[T]) -> None:
+        self._source.extend(items)
+
     def give(self, item: T) -> None:
-        idx = self._source.index(item)
+        idx = self._slots.get(id(item))
+        if idx is None:
+            raise ValueError('trying to return an item which is not from this pool')
         if idx >= self._free_idx:
             raise ValueError('trying to return an item which was already returned')
 
         self._free_idx -= 1
-        self._source[self._free_idx], self._source[idx] = item, self._source[self._free_idx]
+        self._swap(idx, self._free_idx)
+
+    def give_all(self) -> None:
+        """Take back every item at once. Anything that needs doing to them first (like hiding them) is up to you."""
+        self._free_idx = 0
+
+    def _swap(self, a: int, b: int) -> None:
+        source = self._source
+        source[a], source[b] = source[b], source[a]
+        self._slots[id(source[a])] = a
+        self._slots[id(source[b])] = b
 
 
 # TODO: make a SpritePool that works better with how Spritelists work internally
@@ -133,22 +202,71 @@ class OrderedPool[T]:
 
 
 class SpritePool[S: BasicSprite](Pool[S]):
-    def __init__(self, items: list[S]):
-        self._size: int = len(items)
-        self._source: SpriteList[S] = SpriteList(capacity=self._size)
-        self._source.extend(items)
-        self._free_idx: int = 0
-
-    def give(self, item: S) -> None:
-        idx = self._source.index(item)
-        if idx >= self._free_idx:
-            raise ValueError('trying to return an item which was already returned')
+    """
+    A Pool of sprites, drawn as one SpriteList (only the given ones get drawn.)
 
-        self._free_idx -= 1
+    Every sprite also gets a number in `keys` (a highway uses the time of the note it's showing) so
+    the given sprites can be worked on all at once with numpy: `given_keys()` lines up with the given
+    sprites, and `move_given()` writes new positions for all of them straight into the SpriteList's buffer.
+    """
+    def __init__(self, items: list[S], *, factory: Callable[[int], S] | None = None, chunk: int = POOL_CHUNK, name: str = ""):
+        super().__init__(items, factory=factory, chunk=chunk, name=name)
+        self._source: SpriteList[S] = SpriteList(capacity=max(self._size, 1))
+        self._source.extend(items)
+        self.keys: np.ndarray = np.zeros(self._size)
 
-        self._source.sprite_list.append(self._source.sprite_list.pop(idx))
-        self._source._sprite_index_data.append(self._source._sprite_index_data.pop(idx))  # noqa: SLF001
+    def _extend(self, items: list[S]) -> None:
+        # New sprites go on the end, which is where the free ones are anyway
+        self._source.extend(items)
+        self.keys = np.concatenate((self.keys, np.zeros(len(items))))
+
+    def given(self) -> Iterator[S]:
+        sprites = self._source.sprite_list
+        for idx in range(self._free_idx - 1, -1, -1):
+            yield sprites[idx]
+
+    def given_where(self, mask: np.ndarray) -> Iterator[S]:
+        """The given sprites where `mask` (lined up with `given_keys()`) is true. They can be given back along the way."""
+        sprites = self._source.sprite_list
+        for idx in np.flatnonzero(mask)[::-1]:
+            yield sprites[idx]
+
+    def set_key(self, item: S, key: float) -> None:
+        self.keys[self._slots[id(item)]] = key
+
+    def given_keys(self) -> np.ndarray:
+        return self.keys[:self._free_idx]
+
+    def move_given(self, x: np.ndarray | float | None = None, y: np.ndarray | float | None = None) -> None:
+        """Move every given sprite at once (leaving out x or y leaves it where it is.)
+
+        This skips the sprites' own position setters, so their `position` is out of date until it's set again.
+        Nothing reads it back while they're given out, and putting them away sets it."""
+        if not self._free_idx:
+            return
+        sprite_list = self._source
+        slots = np.frombuffer(sprite_list._sprite_index_data, dtype=np.intc, count=self._free_idx)  # noqa: SLF001
+        # x, y and depth for every slot in the buffer
+        positions = np.frombuffer(sprite_list._sprite_pos_data, dtype=np.single).reshape(-1, 3)  # noqa: SLF001
+        if x is not None:
+            positions[slots, 0] = x
+        if y is not None:
+            positions[slots, 1] = y
+        sprite_list._sprite_pos_changed = True  # noqa: SLF001
+
+    def _swap(self, a: int, b: int) -> None:
+        if a == b:
+            return
+        # Only the draw order changes, the sprites keep their slots in the buffer.
+        sprites = self._source.sprite_list
+        index_data = self._source._sprite_index_data  # noqa: SLF001
+        sprites[a], sprites[b] = sprites[b], sprites[a]
+        index_data[a], index_data[b] = index_data[b], index_data[a]
         self._source._sprite_index_changed = True  # noqa: SLF001
+        keys = self.keys
+        keys[a], keys[b] = keys[b], keys[a]
+        self._slots[id(sprites[a])] = a
+        self._slots[id(sprites[b])] = b
 
     # TODO: Add args
     def draw(self) -> None:
@@ -1,30 +1,45 @@
 import logging
 from typing import Self
-from pathlib import Path
 
 from arcade import Sound
 from arcade.clock import GLOBAL_CLOCK
-from charm.lib.oggsound import OGGSound
+from pyglet.media import Player, StaticSource
+from charm.lib.archive import ArchivePath, ChartPath
+from charm.lib.oggsound import ArchiveSound, OGGSound
 
 from charm.core.settings import MixerNames, settings
 
 logger = logging.getLogger("charm")
 
+# How close a seek has to be to the prepared time to use the prepared players
+PREPARED_TOLERANCE = 0.001
+
 class TrackCollection:
     def __init__(self, sounds: list[Sound], mixer: MixerNames = "music"):
         self.start_time: float = -1.0
         self.delay: float = 0.0
         self.mixer = mixer
-        self.tracks = [s.play(volume = settings.get_volume(self.mixer)) for s in sounds]
+        self.sounds = sounds
+        self.tracks: list[Player] = [s.play(volume = settings.get_volume(self.mixer)) for s in sounds]
+        # A spare player per sound, paused and waiting at _prepared_time (see prepare)
+        self._prepared: list[Player] = []
+        self._prepared_time: float | None = None
+        self._rate: float = 1.0
         self.pause()
         self.seek(0.0)
 
     @classmethod
-    def from_path(cls, path: Path) -> Self:
+    def from_path(cls, path: ChartPath) -> Self:
         track_files = [f for f in path.iterdir() if f.is_file() and f.suffix in {".ogg", ".mp3", ".wav"}]
-        tracks = [OGGSound(track) if track.suffix == '.ogg' else Sound(track) for track in track_files]
+        tracks = [cls._load_track(track) for track in track_files]
         return cls(tracks)
 
+    @staticmethod
+    def _load_track(track: ChartPath) -> Sound:
+        if isinstance(track, ArchivePath):
+            return ArchiveSound(track)
+        return OGGSound(track) if track.suffix == '.ogg' else Sound(track)
+
     @property
     def time(self) -> float:
         if not self.tracks:
@@ -56,15 +71,64 @@ class TrackCollection:
         for t in self.tracks:
             t.volume = v
 
+    @property
+    def rate(self) -> float:
+        """How fast the song plays, 1.0 being normal. This changes the pitch too."""
+        return self._rate
+
+    @rate.setter
+    def rate(self, r: float) -> None:
+        self._rate = r
+        for t in (*self.tracks, *self._prepared):
+            t.pitch = r
+
     def seek(self, time: float) -> None:
         playing = self.playing
         if playing:
             self.pause()
-        for t in self.tracks:
-            t.seek(time)
+        if not self._swap_prepared(time):
+            for t in self.tracks:
+                t.seek(time)
         if playing:
             self.play()
 
+    def prepare(self, time: float | None) -> None:
+        """Keep a second set of players waiting at `time`, so seeking there is a swap rather than
+        a seek and a rebuffer (e.g. every time a practice loop restarts.) `None` gets rid of them.
+
+        Only sounds that are fully in memory can be played twice at once, streamed ones just seek like normal."""
+        self._drop_prepared()
+        if time is None or not self.sounds or not all(isinstance(s.source, StaticSource) for s in self.sounds):
+            return
+        for s in self.sounds:
+            player = s.play(volume = 0)
+            player.pause()
+            player.pitch = self._rate
+            player.seek(time)
+            self._prepared.append(player)
+        self._prepared_time = time
+
+    def _swap_prepared(self, time: float) -> bool:
+        if self._prepared_time is None or abs(self._prepared_time - time) > PREPARED_TOLERANCE:
+            return False
+        volume = self.volume
+        old, self.tracks = self.tracks, self._prepared
+        for t in self.tracks:
+            t.volume = volume
+        # The old players become the spares, so the next time round is ready too.
+        for t in old:
+            t.pause()
+            t.seek(time)
+        self._prepared = old
+        return True
+
+    def _drop_prepared(self) -> None:
+        for t in self._prepared:
+            t.pause()
+            t.delete()
+        self._prepared = []
+        self._prepared_time = None
+
     def start(self, delay: float = 0.0) -> None:
         self.pause()
         self.seek(0)
@@ -92,6 +156,7 @@ class TrackCollection:
 
     def close(self) -> None:
         self.pause()
+        self._drop_prepared()
         for t in self.tracks:
             t.delete()
         self.tracks = []
@@ -103,7 +168,10 @@ class TrackCollection:
     def sync(self) -> None:
         self.log_sync()
         maxtime = max(t.time for t in self.tracks)
-        self.seek(maxtime)
+        # Only the players that are behind, a seek would throw away whatever a prepared player has buffered.
+        for t in self.tracks:
+            if t.time != maxtime:
+                t.seek(maxtime)
 
     def log_sync(self) -> None:
         mintime = min(t.time for t in self.tracks)
@@ -214,7 +214,10 @@ class UnifiedChartsetMenuElement(Element):
         #TODO: If the song element doesn't exist, delay the opening, or track that it needs to happen at creation
 
         if chartset.metadata.album_art:
-            _img = PIL.Image.open(chartset.metadata.path / chartset.metadata.album_art)
+            # Opened through the path so album art inside chartset archives works too.
+            with (chartset.metadata.path / chartset.metadata.album_art).open("rb") as f:
+                _img = PIL.Image.open(f)
+                _img.load()
         else:
             _img = img_from_path(files(charm.data.images) / "no_image_found.png")
         self.album_art_texture = Texture(_img)
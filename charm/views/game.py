@@ -1,16 +1,27 @@
+import logging
+
 from charm.core.digiview import DigiView, shows_errors, disable_when_focus_lost
 
 from charm.core.charm import GumWrapper
 from charm.views.results import ResultsView
-from charm.core.keymap import KeyMap
+from charm.core.keymap import KeyMap, keymap
+from charm.core.paths import replayspath
 
 from charm.game.generic import BaseDisplay, BaseEngine, ChartSet, BaseChart
+from charm.game.generic.checkpoint import Checkpoints
+from charm.game.generic.inputs import InputTimeline
+from charm.game.generic.practice import PRACTICE_RATE_STEP, PracticeLoop
+from charm.game.generic.replay import Replay, ReplayPlayer, ReplayRecorder
 
-from charm.game.definitions import GAMEMODES
+from charm.game.registry import REGISTRY
+from charm.lib.assets import ASSETS, Skin
 from charm.lib.trackcollection import TrackCollection
 from charm.core.settings import settings
 
+logger = logging.getLogger("charm")
+
 COUNTDOWN_TIME = 3.0
+SEEK_DISTANCE = 5.0
 
 
 class GameView(DigiView):
@@ -25,12 +36,23 @@ class GameView(DigiView):
 
         self._engine: BaseEngine
         self._display: BaseDisplay
+        self._inputs: InputTimeline
+        # Either we're recording the player, or playing back a replay
+        self._replay: Replay | None = None
+        self._recorder: ReplayRecorder | None = None
+        self._player: ReplayPlayer | None = None
+        self._checkpoints: Checkpoints
+        # The part of the song being looped, if we're practicing
+        self._practice: PracticeLoop | None = None
+        self._practiced = False
+        # Where the loop will start, while one is being picked by time
+        self._loop_start: float | None = None
 
         self._paused = False
         self._initialized = False
 
     @shows_errors
-    def initialize_chart(self, chartset: ChartSet, charts: list[BaseChart]) -> None:
+    def initialize_chart(self, chartset: ChartSet, charts: list[BaseChart], replay: Replay | None = None, practice: PracticeLoop | None = None) -> None:
         if self._initialized:
             # TODO: make an explicit error for this
             raise ValueError("The GameView has already been initialised")
@@ -39,8 +61,14 @@ class GameView(DigiView):
             # TODO: make an explicit error for this
             raise ValueError("The GameView has been improperly initialised with a Chartset or Chart")
 
+        if replay is not None and practice is not None:
+            # TODO: make an explicit error for this
+            raise ValueError("Replays can't be played in practice mode")
+
         self._chartset = chartset
         self._charts = charts
+        self._replay = replay
+        self._practice = practice
 
         self._paused = True
         self._initialized = True
@@ -55,12 +83,21 @@ class GameView(DigiView):
 
         primary_chart, *other_charts = self._charts
 
-        gamemode_definitions = GAMEMODES[primary_chart.metadata.gamemode]
+        gamemode_definitions = REGISTRY.gamemodes[primary_chart.metadata.gamemode]
 
         self._tracks = TrackCollection.from_path(self._chartset.metadata.path)
 
-        self._engine = gamemode_definitions['engines'](primary_chart)
-        self._display = gamemode_definitions['display'](self._engine, tuple(self._charts))
+        self._engine = gamemode_definitions.engine(primary_chart)
+        # Everything the display loads is out of the chart's skin, and let go of when we leave
+        with ASSETS.using(self, Skin.for_chart(self._chartset.metadata.path)):
+            self._display = gamemode_definitions.display(self._engine, tuple(self._charts))
+        self._inputs = InputTimeline(keymap, self._engine.bind_inputs(keymap), self._engine.offset)
+        if self._replay is None:
+            self._recorder = ReplayRecorder(self._engine)
+            self._checkpoints = Checkpoints(self._engine, self._recorder.frames)
+        else:
+            self._player = ReplayPlayer(self._replay, self._engine)
+            self._checkpoints = Checkpoints(self._engine, self._replay.frames)
 
         # HACK: Wow, don't do this! Display doesn't get the TrackCollection so we need to solve this somehow
         if hasattr(self._display, "timer"):
@@ -75,10 +112,16 @@ class GameView(DigiView):
         super().on_show_view()
         self.window.theme_song.volume = 0
         self.unpause(force=True)
-        self._tracks.start(COUNTDOWN_TIME)
+        if self._practice is None:
+            self._tracks.start(COUNTDOWN_TIME)
+        else:
+            # The loop's lead in stands in for the countdown
+            self.practice(self._practice)
+        self._inputs.clear()
 
     def go_back(self) -> None:
         self._tracks.close()
+        ASSETS.release(self)
         super().go_back()
 
     @property
@@ -111,13 +154,15 @@ class GameView(DigiView):
         elif keymap.pause.pressed:
             self.unpause() if self.paused else self.pause()
         elif keymap.seek_backward.pressed:
-            return
-            # TODO
-            self._tracks.seek(self._tracks.time - 5)
+            self.seek(self._tracks.time - SEEK_DISTANCE)
         elif keymap.seek_forward.pressed:
-            return
-            # TODO
-            self._tracks.seek(self._tracks.time + 5)
+            self.seek(self._tracks.time + SEEK_DISTANCE)
+        elif keymap.practice_loop.pressed and self._player is None:
+            self.toggle_practice()
+        elif keymap.practice_slower.pressed and self._practice is not None:
+            self.set_practice_rate(self._practice.rate - PRACTICE_RATE_STEP)
+        elif keymap.practice_faster.pressed and self._practice is not None:
+            self.set_practice_rate(self._practice.rate + PRACTICE_RATE_STEP)
         elif keymap.log_sync.pressed:
             return
             # TODO
@@ -128,24 +173,112 @@ class GameView(DigiView):
         elif self.window.debug.enabled and keymap.debug_show_results.pressed:
             self.show_results()
 
-        if not self._paused:
+        if not self._paused and self._player is None:
             self._engine.on_button_press(keymap)
 
     @shows_errors
     def on_button_release(self, keymap: KeyMap) -> None:
-        if not self._paused:
+        if not self._paused and self._player is None:
             self._engine.on_button_release(keymap)
 
+    def seek(self, time: float) -> None:
+        time = min(max(time, 0.0), self._tracks.duration)
+        if time < self._tracks.time:
+            # Going forward the engine just catches up on the next update, going back it has to be rewound.
+            frame_idx = self._checkpoints.rewind(time)
+            if self._player is not None:
+                self._player.frame_idx = frame_idx
+            elif self._recorder is not None:
+                # The replay keeps what the engine actually saw, so a rewound replay still plays back the same.
+                del self._recorder.frames[frame_idx:]
+        self._tracks.seek(time)
+        self._display.seek(time)
+        self._inputs.clear()
+
+    def practice(self, loop: PracticeLoop | None) -> None:
+        """Start looping `loop`, or go back to playing the song straight through with `None`."""
+        self._practice = loop
+        self._loop_start = None
+        if loop is None:
+            self._tracks.prepare(None)
+            self._tracks.rate = self._inputs.rate = 1.0
+            return
+        if self._recorder is None:
+            # TODO: make an explicit error for this
+            raise ValueError("Replays can't be played in practice mode")
+
+        logger.info(f"Practicing {loop}")
+        self._practiced = True
+        self.seek(loop.restart)
+        # Get the engine to the restart now rather than on the next update, then make that the first
+        # checkpoint. Every restart after this is just loading it again.
+        self._engine.update(loop.restart)
+        self._engine.calculate_score()
+        self._engine.reset_stats()
+        del self._recorder.frames[:]
+        self._checkpoints = Checkpoints(self._engine, self._recorder.frames)
+        self._tracks.prepare(loop.restart)
+        self.set_practice_rate(loop.rate)
+
+    def toggle_practice(self) -> None:
+        """Loop the section that's playing, or stop looping.
+
+        Charts without sections pick the loop by time instead, the first press marks where it starts and the second where it ends."""
+        if self._practice is not None:
+            self.practice(None)
+            return
+        time = self._tracks.time
+        if sections := self._engine.chart.sections():
+            self.practice(PracticeLoop.around(sections, time, song_end=self._tracks.duration))
+        elif self._loop_start is None or time <= self._loop_start:
+            self._loop_start = time
+            logger.info(f"Practice loop starts at {time:.2f}s")
+        else:
+            self.practice(PracticeLoop(self._loop_start, time))
+
+    def set_practice_rate(self, rate: float) -> None:
+        if self._practice is None:
+            return
+        self._tracks.rate = self._inputs.rate = self._practice.set_rate(rate)
+
+    def restart_practice(self) -> None:
+        """Back to the start of the loop. The engine and the audio are already waiting there, so this doesn't hitch."""
+        restart = self._practice.restart
+        self._checkpoints.reset()
+        del self._recorder.frames[:]
+        self._tracks.seek(restart)
+        self._display.seek(restart)
+        self._inputs.clear()
+
     @shows_errors
     def on_update(self, delta_time: float) -> None:
         super().on_update(delta_time)
         self.wrapper.update(delta_time)
 
-        self._engine.update(self._tracks.time)
-        self._engine.calculate_score()
+        song_time = self._tracks.time
+        if self._player is not None:
+            # The replay has its own inputs and frame times, we just keep it in step with the song
+            self._inputs.clear()
+            self._player.play_to(song_time)
+            self._checkpoints.update(self._player.frame_idx)
+        else:
+            if self._paused:
+                self._inputs.clear()
+                events = []
+            else:
+                events = self._inputs.collect(song_time)
+            if self._recorder is not None:
+                song_time, events = self._recorder.record(song_time, events)
+            self._engine.on_input(events)
+            self._engine.update(song_time)
+            self._engine.calculate_score()
+            if self._recorder is not None:
+                self._checkpoints.update(len(self._recorder.frames))
 
         self._tracks.validate_playing()
-        if self._tracks.time >= self._tracks.duration:
+        if self._practice is not None and self._tracks.time >= self._practice.end:
+            self.restart_practice()
+        elif self._tracks.time >= self._tracks.duration:
             self.show_results()
 
         self._display.update(self._tracks.time)
@@ -160,8 +293,22 @@ class GameView(DigiView):
 
     def show_results(self) -> None:
         self._tracks.close()
+        ASSETS.release(self)
         # TODO: Refactor to use new types
-        results_view = ResultsView(back=self.back, results=self._engine.generate_results())
+        results = self._engine.generate_results()
+        # A practiced run skipped around, it isn't a play anyone would want to watch back
+        if self._recorder is not None and not self._practiced:
+            self.save_replay(self._recorder.finish(results.to_score_json()))
+        results_view = ResultsView(back=self.back, results=results)
         results_view.setup()
         self.window.show_view(results_view)
 
+    def save_replay(self, replay: Replay) -> None:
+        path = replayspath / f"{replay.chart_hash[:16]}-{int(replay.created)}.chrp"
+        try:
+            replay.save(path)
+        except OSError as e:
+            # Losing a replay isn't worth losing the results screen over
+            logger.error(f"Unable to save replay to {path}: {e}")
+            return
+        logger.info(f"Saved replay to {path}")
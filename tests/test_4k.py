@@ -1,10 +1,28 @@
 from importlib.resources import files, as_file
 
-from charm.lib.gamemodes.four_key import FourKeySong
+import pytest
+from charm.game.harness import generate_inputs, load_charts, make_engine, reset_chart, simulate
+from charm.game.parsers.sm import SMParser
 import charm.data.tests
 
 
 def test_4k() -> None:
     with as_file(files(charm.data.tests) / "discord") as path:
-        song = FourKeySong.parse(path)
-    assert song.charts is not []
+        metadatas = SMParser.parse_chart_metadata(path)
+        charts = [c for m in metadatas for c in SMParser.parse_chart(m)]
+    assert charts
+    assert all(c.notes for c in charts)
+
+
+@pytest.mark.parametrize("pattern", ["perfect", "humanized"])
+def test_sustain_score_doesnt_depend_on_frame_rate(pattern: str) -> None:
+    with as_file(files(charm.data.tests) / "discord") as path:
+        charts = load_charts(path)
+    chart = next(c for c in charts if any(n.length for n in c.notes))
+    results = []
+    for fps in (30, 240):
+        reset_chart(chart)
+        engine = make_engine(chart)
+        simulate(engine, generate_inputs(engine, pattern), fps)
+        results.append((engine.score, engine.commited_score))
+    assert results[0] == pytest.approx(results[1])
@@ -0,0 +1,66 @@
+from pathlib import Path
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+import pytest
+
+from charm.lib.archive import ChartArchive, is_archive
+
+
+@pytest.fixture
+def osz(tmp_path: Path) -> Path:
+    path = tmp_path / "Song Pack.osz"
+    with ZipFile(path, "w") as z:
+        z.writestr("song.ini", "[song]\nname = Test\n", compress_type = ZIP_DEFLATED)
+        z.writestr("audio.ogg", b"OggS" + bytes(range(256)), compress_type = ZIP_STORED)
+        z.writestr("extras/bg.png", b"\x89PNG", compress_type = ZIP_STORED)
+    return path
+
+
+def test_is_archive(osz: Path) -> None:
+    assert is_archive(osz)
+    assert not is_archive(osz.parent)
+
+
+def test_walk(osz: Path) -> None:
+    root = ChartArchive.open(osz).root
+    assert root.name == "Song Pack"
+    assert root.is_dir()
+    assert sorted(p.name for p in root.iterdir()) == ["audio.ogg", "extras", "song.ini"]
+    assert (root / "extras").is_dir()
+    assert (root / "extras" / "bg.png").is_file()
+    assert [p.name for p in root.glob("*.ini")] == ["song.ini"]
+    assert ChartArchive.open(osz) is root.archive
+
+
+def test_read(osz: Path) -> None:
+    root = ChartArchive.open(osz).root
+    assert (root / "song.ini").read_text(encoding = "utf-8") == "[song]\nname = Test\n"
+    audio = root / "audio.ogg"
+    assert isinstance(audio.read_view(), memoryview)
+    with audio.open("rb") as f:
+        assert f.read(4) == b"OggS"
+        f.seek(-1, 2)
+        assert f.read() == b"\xff"
+    with pytest.raises(ValueError):
+        audio.open("w")
+
+
+def test_only_recent_archives_stay_open(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("charm.lib.archive.MAX_OPEN_ARCHIVES", 2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.osz"
+        with ZipFile(path, "w") as z:
+            z.writestr("audio.ogg", b"OggS", compress_type = ZIP_STORED)
+        paths.append(path)
+    archives = [ChartArchive.open(p) for p in paths]
+    assert [a.is_open for a in archives] == [False, True, True]
+
+    # Anything being read from stays open
+    view = (archives[1].root / "audio.ogg").read_view()
+    assert (archives[0].root / "audio.ogg").read_bytes() == b"OggS"
+    assert [a.is_open for a in archives] == [True, True, False]
+    assert not archives[1].close()
+    view.release()
+    assert archives[1].close()
+    assert not archives[1].is_open
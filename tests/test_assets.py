@@ -0,0 +1,59 @@
+from pathlib import Path
+import gc
+
+import pytest
+
+from charm.lib.assets import AssetManager, Skin
+
+
+def test_skin_overrides(tmp_path: Path) -> None:
+    chart, base = tmp_path / "chart", tmp_path / "base"
+    for root, names in ((chart, ["normal-1.png"]), (base, ["normal-1.png", "normal-2.png"])):
+        (root / "fourkey").mkdir(parents=True)
+        for name in names:
+            (root / "fourkey" / name).write_text(root.name)
+    skin = Skin(chart, base)
+    assert skin.find("fourkey", "normal-1.png").read_text() == "chart"
+    assert skin.find("fourkey", "normal-2.png").read_text() == "base"
+    assert len(skin.folders("fourkey")) == 2
+    with pytest.raises(FileNotFoundError):
+        skin.find("fourkey", "normal-3.png")
+
+
+class Owner:
+    pass
+
+
+def test_released_with_last_owner(tmp_path: Path) -> None:
+    assets = AssetManager(workers=1)
+    skin = Skin(tmp_path)
+    first, second = Owner(), Owner()
+    with assets.using(first, skin):
+        a = assets.get("thing", lambda s: [s])
+    with assets.using(second, skin):
+        assert assets.get("thing", lambda s: []) is a
+        assets.get("other", lambda s: [])
+    assert a == [skin]
+    assert len(assets) == 2
+
+    assets.release(first)
+    assert len(assets) == 2
+    assets.release(second)
+    assert len(assets) == 0
+
+    assets.get("kept", lambda s: [])
+    assets.release(first)
+    assert len(assets) == 1
+
+
+def test_gone_owners_dont_keep_assets(tmp_path: Path) -> None:
+    assets = AssetManager(workers=1)
+    skin = Skin(tmp_path)
+    owner = Owner()
+    with assets.using(owner, skin):
+        assets.get("thing", lambda s: [])
+    del owner
+    gc.collect()
+    # Anyone being released clears out what nothing's using anymore
+    assets.release(Owner())
+    assert len(assets) == 0
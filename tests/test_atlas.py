@@ -0,0 +1,92 @@
+import json
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import PIL.Image
+import pytest
+from arcade import Texture
+
+import charm.lib.atlas
+from charm.lib.atlas import ATLAS_VERSION, BakedAtlas, bake
+
+IMAGES = {
+    "tall": ((10, 20), (255, 0, 0, 255)),
+    "wide": ((30, 5), (0, 0, 255, 128)),
+    "small": ((4, 4), (0, 255, 0, 255))
+}
+
+
+def image(key: str) -> PIL.Image.Image:
+    size, color = IMAGES[key]
+    return PIL.Image.new("RGBA", size, color)
+
+
+@pytest.fixture
+def skin(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    atlases = tmp_path / "atlases"
+    atlases.mkdir()
+    monkeypatch.setattr(charm.lib.atlas, "atlaspath", atlases)
+    folder = tmp_path / "skin"
+    folder.mkdir()
+    (folder / "note.png").write_bytes(b"not really a png")
+    return folder
+
+
+def counting_recipes(baked: list[str]) -> dict[str, Callable[[], Texture]]:
+    def recipe(key: str) -> Callable[[], Texture]:
+        def make() -> Texture:
+            baked.append(key)
+            return Texture(image(key), hash=key)
+        return make
+    return {key: recipe(key) for key in IMAGES}
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    atlas = BakedAtlas.pack("test", {key: image(key) for key in IMAGES})
+    atlas.save(tmp_path / "test")
+    loaded = BakedAtlas.load("test", tmp_path / "test")
+    assert loaded.regions == atlas.regions
+    for key in IMAGES:
+        x, y, w, h = loaded.regions[key]
+        assert loaded.image.crop((x, y, x + w, y + h)).tobytes() == image(key).tobytes()
+
+
+def test_baked_once(skin: Path) -> None:
+    baked: list[str] = []
+    first = bake("test", [skin], 64, counting_recipes(baked))
+    assert sorted(baked) == sorted(IMAGES)
+    baked.clear()
+    second = bake("test", [skin], 64, counting_recipes(baked))
+    assert not baked
+    assert second.name == first.name
+    assert second.regions == first.regions
+
+
+def test_old_version_is_baked_again(skin: Path) -> None:
+    baked: list[str] = []
+    atlas = bake("test", [skin], 64, counting_recipes(baked))
+    path = (charm.lib.atlas.atlaspath / atlas.name).with_suffix(".json")
+    data = json.loads(path.read_text())
+    data["version"] = ATLAS_VERSION - 1
+    path.write_text(json.dumps(data))
+
+    baked.clear()
+    bake("test", [skin], 64, counting_recipes(baked))
+    assert sorted(baked) == sorted(IMAGES)
+    assert json.loads(path.read_text())["version"] == ATLAS_VERSION
+
+
+def test_changed_files_change_the_key(skin: Path) -> None:
+    baked: list[str] = []
+    first = bake("test", [skin], 64, counting_recipes(baked))
+    note = skin / "note.png"
+    stat = note.stat()
+    os.utime(note, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    baked.clear()
+    second = bake("test", [skin], 64, counting_recipes(baked))
+    assert second.name != first.name
+    assert sorted(baked) == sorted(IMAGES)
+    # So does asking for a different size
+    assert bake("test", [skin], 32, counting_recipes(baked)).name != second.name
@@ -0,0 +1,50 @@
+"""Engine throughput, run with `pytest -m benchmark`. Plain `pytest` only runs the checks that don't time anything."""
+from importlib.resources import files, as_file
+
+import pytest
+from charm.game.generic import BaseChart
+from charm.game.harness import PATTERNS, load_charts, run
+import charm.data.tests
+
+# Generous floors, these are to catch something going quadratic, not to measure small changes.
+MIN_SPEED = 20  # simulated seconds per wall second
+MAX_P99 = 2.0  # ms per calculate_score
+
+
+def load_expert(name: str) -> BaseChart:
+    with as_file(files(charm.data.tests) / name) as p:
+        charts = load_charts(p)
+    return next((c for c in charts if c.metadata.difficulty in {"Expert", "Challenge"}), charts[0])
+
+
+@pytest.fixture(scope="module")
+def soulless() -> BaseChart:
+    return load_expert("soulless5")
+
+
+@pytest.fixture(scope="module")
+def discord() -> BaseChart:
+    return load_expert("discord")
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_five_fret(soulless: BaseChart, pattern: str) -> None:
+    result = run(soulless, pattern)
+    assert result.speed >= MIN_SPEED
+    assert result.percentile(99) <= MAX_P99
+
+
+def test_five_fret_perfect_is_fc(soulless: BaseChart) -> None:
+    result = run(soulless, "perfect")
+    assert result.misses == 0
+    assert result.hits == len(soulless.chords)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("engine", ["4k", "fnf", "auto"])
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_lanes(discord: BaseChart, engine: str, pattern: str) -> None:
+    result = run(discord, pattern, engine)
+    assert result.speed >= MIN_SPEED
+    assert result.percentile(99) <= MAX_P99
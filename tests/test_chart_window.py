@@ -0,0 +1,44 @@
+from charm.game.generic import BPMChangeEvent, Chart, CountdownEvent, Event
+from charm.lib.listview import ListView
+
+
+class Note:
+    def __init__(self, time: float):
+        self.time = time
+
+
+def make_chart() -> Chart:
+    notes = [Note(t) for t in (3.0, 1.0, 2.0, 2.0, 5.0)]
+    events = [CountdownEvent(4.0, 1.0), Event(0.5), CountdownEvent(1.0, 1.0), BPMChangeEvent(0.0, 120)]
+    return Chart(None, notes, events)
+
+
+def test_notes_between() -> None:
+    chart = make_chart()
+    assert [n.time for n in chart.notes_between(2.0, 5.0)] == [2.0, 2.0, 3.0]
+    assert not chart.notes_between(5.5, 10.0)
+    # Notes added after the first query still get found
+    chart.notes.append(Note(6.0))
+    assert [n.time for n in chart.notes_between(5.5, 10.0)] == [6.0]
+
+
+def test_events_between() -> None:
+    chart = make_chart()
+    assert [e.time for e in chart.events_between(CountdownEvent, 0.0, 10.0)] == [1.0, 4.0]
+    assert [e.time for e in chart.events_between(Event, 0.0, 1.0)] == [0.0, 0.5]
+
+
+def test_list_view() -> None:
+    items = list(range(10))
+    view = ListView(items, 2, 7)
+    assert list(view) == [2, 3, 4, 5, 6]
+    assert view[-1] == 6
+    assert list(view[1:3]) == [3, 4]
+    assert list(reversed(view)) == [6, 5, 4, 3, 2]
+    assert list(view[::-1]) == [6, 5, 4, 3, 2]
+    assert list(view[::2]) == [2, 4, 6]
+    assert list(ListView([1, 2, 3, 4, 5], 0, 3)[::-1]) == [3, 2, 1]
+    assert 4 in view
+    assert len(ListView(items, 8, 3)) == 0
+    items[3] = 30
+    assert view[1] == 30
@@ -0,0 +1,87 @@
+from importlib.resources import files, as_file
+
+from charm.game.gamemodes.four_key import FourKeyEngine
+from charm.game.generic.checkpoint import Checkpoints
+from charm.game.generic.replay import ReplayFrame, play_frame
+from charm.game.harness import generate_inputs
+from charm.game.parsers.sm import SMParser
+import charm.data.tests
+
+FPS = 120
+
+
+def make_frames(engine: FourKeyEngine) -> list[ReplayFrame]:
+    events = generate_inputs(engine, "humanized")
+    end = engine.chart.notes[-1].end + 1
+    frames: list[ReplayFrame] = []
+    idx = 0
+    for i in range(int(end * FPS)):
+        time = i / FPS
+        first = idx
+        while idx < len(events) and events[idx].time <= time:
+            idx += 1
+        frames.append(ReplayFrame(time, events[first:idx]))
+    return frames
+
+
+def snapshot(engine: FourKeyEngine) -> tuple:
+    return (
+        engine.score, engine.hits, engine.misses, engine.streak, engine.hp, len(engine.all_judgements),
+        [(n.hit, n.missed, n.hit_time) for n in engine.chart.notes]
+    )
+
+
+def test_rewind_matches_straight_play() -> None:
+    with as_file(files(charm.data.tests) / "discord") as path:
+        chart = next(c for m in SMParser.parse_chart_metadata(path) for c in SMParser.parse_chart(m))
+    engine = FourKeyEngine(chart)
+    frames = make_frames(engine)
+    checkpoints = Checkpoints(engine, frames)
+
+    middle = len(frames) // 2
+    for i, frame in enumerate(frames, 1):
+        play_frame(engine, frame)
+        checkpoints.update(i)
+        if i == middle:
+            expected_middle = snapshot(engine)
+    expected_end = snapshot(engine)
+
+    assert checkpoints.rewind(frames[middle - 1].time) == middle
+    assert snapshot(engine) == expected_middle
+
+    for i in range(middle, len(frames)):
+        play_frame(engine, frames[i])
+        checkpoints.update(i + 1)
+    assert snapshot(engine) == expected_end
+
+    assert checkpoints.rewind(-1) == 0
+    assert engine.score == 0
+    assert not any(n.hit or n.missed for n in chart.notes)
+
+
+def test_practice_loop_restarts_the_same() -> None:
+    with as_file(files(charm.data.tests) / "discord") as path:
+        chart = next(c for m in SMParser.parse_chart_metadata(path) for c in SMParser.parse_chart(m))
+    engine = FourKeyEngine(chart)
+    all_frames = make_frames(engine)
+    start = all_frames[len(all_frames) // 3].time
+    loop = [f for f in all_frames if start < f.time <= start + 5]
+
+    # The same way GameView starts practicing: the engine goes to the loop start and that's the first checkpoint
+    engine.update(start)
+    engine.calculate_score()
+    engine.reset_stats()
+    frames: list[ReplayFrame] = []
+    checkpoints = Checkpoints(engine, frames)
+
+    results = []
+    for _ in range(2):
+        checkpoints.reset()
+        frames.clear()
+        for frame in loop:
+            frames.append(frame)
+            play_frame(engine, frame)
+            checkpoints.update(len(frames))
+        results.append(snapshot(engine))
+    assert results[0] == results[1]
+    assert engine.hits
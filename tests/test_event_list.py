@@ -0,0 +1,36 @@
+import pickle
+
+from charm.game.generic import BPMChangeEvent, CountdownEvent, Event
+from charm.game.generic.chart import EventList
+
+
+def times(events: list[Event]) -> list[float]:
+    return [e.time for e in events]
+
+
+def test_of_type_stays_in_step() -> None:
+    events = EventList([CountdownEvent(4.0, 1.0), BPMChangeEvent(0.0, 120), CountdownEvent(1.0, 1.0)])
+    assert times(events.of_type(CountdownEvent)) == [1.0, 4.0]
+    assert times(events.of_type(Event)) == [0.0, 1.0, 4.0]
+
+    events.append(CountdownEvent(2.0, 1.0))
+    events.remove(events[0])
+    assert times(events.of_type(CountdownEvent)) == [1.0, 2.0]
+    assert times(events.of_type(Event)) == [0.0, 1.0, 2.0]
+
+    events[1] = CountdownEvent(3.0, 1.0)
+    del events[0]
+    assert times(events.of_type(BPMChangeEvent)) == []
+    assert times(events.of_type(Event)) == [2.0, 3.0]
+
+    # The list itself keeps the order things were added in
+    assert times(events) == [3.0, 2.0]
+    events.sort()
+    assert times(events) == [2.0, 3.0]
+
+
+def test_pickles() -> None:
+    events = EventList([CountdownEvent(4.0, 1.0), BPMChangeEvent(0.0, 120)])
+    loaded = pickle.loads(pickle.dumps(events))
+    assert loaded == events
+    assert times(loaded.of_type(Event)) == [0.0, 4.0]
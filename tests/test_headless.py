@@ -0,0 +1,44 @@
+from importlib.resources import files, as_file
+import pickle
+import subprocess
+import sys
+
+from charm.game.gamemodes.four_key import FourKeyEngine
+from charm.game.harness import generate_inputs, simulate
+from charm.game.parsers.sm import SMParser
+import charm.data.tests
+
+# None of these should need a window (or pyglet's input) to run.
+HEADLESS_MODULES = (
+    "charm.game.gamemodes.five_fret.engine",
+    "charm.game.gamemodes.four_key.engine",
+    "charm.game.gamemodes.fnf.engine",
+    "charm.game.gamemodes.taiko.engine",
+    "charm.game.generic.replay",
+    "charm.game.harness"
+)
+
+BLOCKER = """
+import sys
+
+class Blocker:
+    def find_spec(self, name, path=None, target=None):
+        if name.partition(".")[0] in ("arcade", "pyglet", "PIL"):
+            raise ImportError(f"{name} shouldn't be imported")
+
+sys.meta_path.insert(0, Blocker())
+"""
+
+
+def test_engines_import_without_arcade() -> None:
+    code = BLOCKER + "".join(f"import {m}\n" for m in HEADLESS_MODULES)
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_engine_pickles() -> None:
+    with as_file(files(charm.data.tests) / "discord") as path:
+        chart = next(c for m in SMParser.parse_chart_metadata(path) for c in SMParser.parse_chart(m))
+    engine = pickle.loads(pickle.dumps(FourKeyEngine(chart)))
+    result = simulate(engine, generate_inputs(engine))
+    assert result.hits
+    assert not result.misses
@@ -1,24 +1,145 @@
 from importlib.resources import files, as_file
+from itertools import product
+from math import ceil
 
 import pytest
-from charm.lib.gamemodes.hero import HeroSong
+from charm.game.gamemodes.five_fret import FiveFretChart, FiveFretChord, FiveFretNote, FiveFretNoteType
+from charm.game.gamemodes.five_fret.chart import ChordShape, Fret
+from charm.game.gamemodes.five_fret.engine import FiveFretEngine, FiveFretKey
+from charm.game.generic import DigitalKeyEvent
+from charm.game.generic import ChartSetMetadata
+from charm.game.parsers.dotchart import DotChartParser
 import charm.data.tests
 
+
+@pytest.fixture()
+def soulless_metadata() -> ChartSetMetadata:
+    with as_file(files(charm.data.tests) / "soulless5") as p:
+        return DotChartParser.parse_chartset_metadata(p)
+
+
 @pytest.fixture()
-def soulless() -> HeroSong:
+def soulless_expert() -> FiveFretChart:
     with as_file(files(charm.data.tests) / "soulless5") as p:
-        return HeroSong.parse(p)
+        expert = next(m for m in DotChartParser.parse_chart_metadata(p) if m.difficulty == "Expert")
+        return DotChartParser.parse_chart(expert)[0]
+
+
+def test_parse_soulless(soulless_expert: FiveFretChart) -> None:
+    assert soulless_expert is not None
+
+
+def test_soulless_chord_count(soulless_expert: FiveFretChart) -> None:
+    assert len(soulless_expert.chords) == 10699  # Known value
+
+
+def test_soulless_metadata(soulless_metadata: ChartSetMetadata) -> None:
+    assert soulless_metadata.title == "Soulless 5"  # Known values
+    assert soulless_metadata.artist == "ExileLord"
+    assert soulless_metadata.album == "Get Smoked"
+    assert soulless_metadata.year == 2018
+
+
+# Every fret as True (held), False (not held) or None (doesn't matter), like ChordShape used to be.
+OLD_SHAPES = list(product((True, False, None), repeat = 5))
+
+
+def shape_of(frets: tuple[bool | None, ...]) -> ChordShape:
+    shape = ChordShape()
+    for fret, state in enumerate(frets):
+        shape = shape.update_fret(fret, state)
+    return shape
+
+
+def test_chord_shape_matches_old_tuples() -> None:
+    for a in OLD_SHAPES:
+        shape_a = shape_of(a)
+        assert tuple(shape_a) == a
+        for b in OLD_SHAPES:
+            shape_b = shape_of(b)
+            assert shape_a.matches(shape_b) == all(x is None or y is None or x == y for x, y in zip(a, b))
+            assert tuple(shape_a & shape_b) == tuple(None if x is None or y is None else x and y for x, y in zip(a, b))
+            assert tuple(shape_a | shape_b) == tuple(x or y for x, y in zip(a, b))
+
+
+def test_chord_shape_contains() -> None:
+    # This used to always be False, now it's what the loop in it meant to check:
+    # every fret `b` needs (that neither side doesn't care about) is held in `a`.
+    for a in OLD_SHAPES:
+        for b in OLD_SHAPES:
+            expected = all(x is None or y is None or x or not y for x, y in zip(a, b))
+            assert shape_of(a).contains(shape_of(b)) == expected
+    assert shape_of((True, True, False, False, False)).contains(shape_of((False, True, False, False, False)))
+    assert not shape_of((False, True, False, False, False)).contains(shape_of((True, True, False, False, False)))
+
+
+def make_chord(*frets: int, note_type: FiveFretNoteType = FiveFretNoteType.STRUM) -> FiveFretChord:
+    return FiveFretChord([FiveFretNote(None, 1.0, fret, 0, note_type, 192, 0) for fret in frets])
+
+
+def test_chord_shapes() -> None:
+    # Single notes can be anchored, so everything below them doesn't matter
+    assert tuple(make_chord(Fret.YELLOW).shape) == (None, None, True, False, False)
+    # Chords can't, unless they're taps
+    assert tuple(make_chord(Fret.RED, Fret.BLUE).shape) == (False, True, False, True, False)
+    assert tuple(make_chord(Fret.RED, Fret.BLUE, note_type = FiveFretNoteType.TAP).shape) == (None, True, False, True, False)
+    # Open notes need nothing held
+    open_shape = make_chord(7).shape
+    assert tuple(open_shape) == (False,) * 5
+    assert open_shape.is_open
+    # A chord's shape is kept, but not past its type changing
+    chord = make_chord(Fret.RED, Fret.BLUE)
+    assert chord.shape is chord.shape
+    chord.type = FiveFretNoteType.TAP
+    assert chord.shape[Fret.GREEN] is None
+
+
+def sustain_chart(*notes: tuple[Fret, float]) -> FiveFretChart:
+    """One chord at 1s, with a sustain of `length` seconds (a beat a second) on each fret."""
+    chart = FiveFretChart(None, [], [])
+    chart.notes = [FiveFretNote(chart, 1.0, fret, length, FiveFretNoteType.STRUM, 192, int(192 * length)) for fret, length in notes]
+    chart.chords = [FiveFretChord(chart.notes)]
+    chart.calculate_indices()
+    return chart
+
+
+def play(engine: FiveFretEngine, time: float, *events: DigitalKeyEvent[FiveFretKey]) -> None:
+    engine.on_input(events)
+    engine.update(time)
+    engine.calculate_score()
+
+
+def test_held_sustain_scores_as_it_goes() -> None:
+    engine = FiveFretEngine(sustain_chart((Fret.GREEN, 2.0)))
+    play(engine, 1.0, DigitalKeyEvent(0.9, Fret.GREEN, "down"), DigitalKeyEvent(1.0, "strum", "down"))
+    assert engine.commited_score == 50
+    # 25 points a beat, so base + 25 * (t - start) while it's held
+    play(engine, 2.0)
+    assert engine.score == 50 + 25
+    # Holding on past the end doesn't earn anything extra
+    play(engine, 5.0)
+    assert engine.commited_score == 50 + 50
+    assert engine.score == engine.commited_score
+
 
-def test_parse_soulless(soulless: HeroSong) -> None:
-    assert soulless is not None
+def test_early_release_keeps_what_was_earned() -> None:
+    engine = FiveFretEngine(sustain_chart((Fret.GREEN, 2.0)))
+    play(engine, 1.0, DigitalKeyEvent(0.9, Fret.GREEN, "down"), DigitalKeyEvent(1.0, "strum", "down"))
+    play(engine, 2.0, DigitalKeyEvent(2.0, Fret.GREEN, "up"))
+    play(engine, 5.0)
+    assert engine.commited_score == 50 + 25
+    assert not engine.active_sustains
 
-def test_soulless_chord_count(soulless: HeroSong) -> None:
-    expert_chart = soulless.get_chart("Expert")
-    assert expert_chart is not None
-    assert len(expert_chart.chords) == 10699  # Known value
 
-def test_soulless_metadata(soulless: HeroSong) -> None:
-    assert soulless.metadata.title == "Soulless 5"  # Known values
-    assert soulless.metadata.artist == "ExileLord"
-    assert soulless.metadata.album == "Get Smoked"
-    assert soulless.metadata.year == 2018
+def test_disjoint_chord_drops_one_fret() -> None:
+    engine = FiveFretEngine(sustain_chart((Fret.GREEN, 1.0), (Fret.RED, 2.0)))
+    engine.linked_disjoints = False
+    play(engine, 1.0, DigitalKeyEvent(0.9, Fret.GREEN, "down"), DigitalKeyEvent(0.9, Fret.RED, "down"), DigitalKeyEvent(1.0, "strum", "down"))
+    assert engine.commited_score == 100
+    # Letting go of green half way through its sustain only stops green
+    play(engine, 1.5, DigitalKeyEvent(1.5, Fret.GREEN, "up"))
+    assert len(engine.active_sustains) == 1
+    play(engine, 2.0)
+    assert engine.score == 100 + ceil(12.5 + 25)
+    play(engine, 5.0)
+    assert engine.commited_score == 100 + ceil(12.5 + 50)
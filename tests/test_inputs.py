@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+import pytest
+
+from charm.game.generic.inputs import InputTimeline
+
+
+class FakeState:
+    def __init__(self, log: list[SimpleNamespace]):
+        self.log = log
+
+    def drain(self) -> list[SimpleNamespace]:
+        events, self.log = self.log, []
+        return events
+
+
+def test_inputs_are_stamped_in_chart_time() -> None:
+    log = [SimpleNamespace(time=9.5, down=True, actions=("strum",)), SimpleNamespace(time=9.75, down=False, actions=("strum", "menu"))]
+    timeline = InputTimeline(SimpleNamespace(state=FakeState(log)), {"strum": 0}, offset=0.2)
+    events = timeline.collect(2.0, now=10.0)
+    assert [(e.key, e.new_state) for e in events] == [(0, "down"), (0, "up")]
+    # Half a second before the song was at 2.0, plus the offset
+    assert [e.time for e in events] == pytest.approx([1.7, 1.95])
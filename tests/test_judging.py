@@ -0,0 +1,95 @@
+from charm.game.generic.judging import LaneJudge
+
+WINDOW = 0.075
+
+
+class FakeNote:
+    def __init__(self, time: float, lane: int, sustain_piece: bool = False):
+        self.time = time
+        self.lane = lane
+        self.sustain_piece = sustain_piece
+        self.hit = False
+        self.missed = False
+        self.hit_time: float | None = None
+
+
+def make_notes(count: int) -> list[FakeNote]:
+    return [FakeNote(i * 0.1, i % 4) for i in range(count)]
+
+
+def test_press_hits_earliest_note_in_lane() -> None:
+    a, b, c = FakeNote(1.0, 0), FakeNote(1.05, 0), FakeNote(1.0, 1)
+    judge = LaneJudge([a, b, c], 4)
+    judge.press(0, 1.01)
+    assert judge.judge(1.01, WINDOW) == [a]
+    assert a.hit and a.hit_time == 1.01
+    assert not b.hit and not c.hit
+
+
+def test_misses_and_early_presses() -> None:
+    a, b = FakeNote(1.0, 0), FakeNote(2.0, 0)
+    judge = LaneJudge([a, b], 4)
+    judge.press(0, 0.5)  # Too early for anything, should just get thrown away
+    assert judge.judge(1.5, WINDOW) == [a]
+    assert a.missed
+    judge.press(0, 1.96)
+    assert judge.judge(1.96, WINDOW) == [b]
+    assert b.hit
+    assert judge.finished
+
+
+def test_hold_only_notes() -> None:
+    piece = FakeNote(1.0, 2, sustain_piece = True)
+    judge = LaneJudge([piece], 4)
+    assert judge.judge(0.99, WINDOW, (False, False, True, False), lambda n: n.sustain_piece) == [piece]
+    assert piece.hit and piece.hit_time == 1.0
+
+
+def test_hold_only_notes_leave_presses_alone() -> None:
+    piece, note = FakeNote(1.0, 2, sustain_piece = True), FakeNote(1.05, 2)
+    judge = LaneJudge([piece, note], 4)
+    judge.press(2, 1.06)
+    is_piece = lambda n: n.sustain_piece  # noqa: E731
+    # The press is inside the piece's window, but it's for the note after it
+    assert judge.judge(1.02, WINDOW, (False, False, False, False), is_piece) == []
+    assert judge.judge(1.08, WINDOW, (False, False, False, False), is_piece) == [piece, note]
+    assert piece.missed
+    assert note.hit and note.hit_time == 1.06
+
+
+def test_judged_in_chart_order() -> None:
+    notes = [FakeNote(1.0, 3), FakeNote(1.01, 0), FakeNote(1.02, 2)]
+    judge = LaneJudge(notes, 4)
+    assert judge.judge(2.0, WINDOW) == notes
+
+
+class CountingNote(FakeNote):
+    """Counts how many times any note's time gets looked at, which is most of what judging does."""
+    looks = 0
+
+    @property
+    def time(self) -> float:
+        CountingNote.looks += 1
+        return self._time
+
+    @time.setter
+    def time(self, v: float) -> None:
+        self._time = v
+
+
+def frame_work(note_count: int) -> int:
+    notes = [CountingNote(i * 0.1, i % 4) for i in range(note_count)]
+    judge = LaneJudge(notes, 4)
+    # Jump to the middle of the chart, then count the work done by frames that land on the same spot.
+    middle = notes[note_count // 2].time
+    judge.judge(middle, WINDOW)
+    CountingNote.looks = 0
+    for _ in range(100):
+        judge.judge(middle, WINDOW)
+    return CountingNote.looks
+
+
+def test_frame_cost_does_not_scale_with_chart_length() -> None:
+    small = frame_work(1_000)
+    assert small > 0
+    assert frame_work(100_000) == small
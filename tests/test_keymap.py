@@ -1,4 +1,4 @@
-from arcade.key import H, MOD_SHIFT, Q
+from arcade.key import D, F, H, MOD_SHIFT, Q
 
 from charm.core.keymap import keymap
 
@@ -115,3 +115,18 @@ def test_action_set_defaults() -> None:
     keymap.debug_toggle_hit_window.set_defaults()
     assert (H, MOD_SHIFT) in keymap.debug_toggle_hit_window.keys
     assert len(keymap.debug_toggle_hit_window.keys) == 1
+
+def test_input_log_keeps_every_event() -> None:
+    keymap.state.drain()
+    keymap.on_key_press(D, 0)
+    keymap.on_key_press(F, 0)
+    keymap.on_key_release(D, 0)
+    events = keymap.state.drain()
+    assert [(e.button, e.down) for e in events] == [(D, True), (F, True), (D, False)]
+    assert events[0].time <= events[1].time <= events[2].time
+    assert not keymap.state.drain()
+
+def test_get_actions_context_does_not_leak() -> None:
+    keymap.set_defaults()
+    keymap.get_actions(D, "fourkey")
+    assert keymap.keys["fourkey"][(D, 0)] == {keymap.fourkey.key1}
@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+
+from charm.game.generic.highway import NoteCursor
+
+
+@dataclass
+class Note:
+    time: float
+    length: float = 0
+
+    @property
+    def end(self) -> float:
+        return self.time + self.length
+
+
+NOTES = [Note(1.0), Note(2.0, 3.0), Note(3.0), Note(4.0), Note(6.0)]
+
+
+def drain(cursor: NoteCursor, until: float) -> list[float]:
+    times = []
+    while (note := cursor.pop(until)) is not None:
+        times.append(note.time)
+    return times
+
+
+def test_pops_in_time_order() -> None:
+    cursor = NoteCursor(reversed(NOTES))
+    assert drain(cursor, 2.5) == [1.0, 2.0]
+    assert drain(cursor, 2.5) == []
+    assert drain(cursor, 10.0) == [3.0, 4.0, 6.0]
+
+
+def test_seek() -> None:
+    cursor = NoteCursor(NOTES)
+    drain(cursor, 10.0)
+    cursor.seek(2.5)
+    assert drain(cursor, 5.0) == [3.0, 4.0]
+    # Going by end, the long note started before 2.5 but is still going
+    cursor = NoteCursor(NOTES, by_end=True)
+    cursor.seek(2.5)
+    assert drain(cursor, 5.0) == [2.0, 3.0, 4.0]
+    cursor.seek(0.0)
+    assert drain(cursor, 10.0) == [1.0, 2.0, 3.0, 4.0, 6.0]
+
+
+def test_peak() -> None:
+    # 1.0 and 2.0 are both on screen with a 1.5s window, then 3.0 and 4.0 (and 2.0 again, going by end)
+    assert NoteCursor(NOTES).peak(1.0, 0.5) == 2
+    assert NoteCursor(NOTES, by_end=True).peak(1.0, 0.5) == 3
+    assert NoteCursor([]).peak(1.0, 0.5) == 0
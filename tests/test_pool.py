@@ -0,0 +1,53 @@
+import pytest
+
+from charm.lib.pool import Pool
+
+
+def test_give_back_while_iterating() -> None:
+    pool = Pool(list(range(10)))
+    taken = [pool.get() for _ in range(6)]
+    assert list(pool.given()) == taken[::-1]
+
+    for item in pool.given():
+        if item % 2:
+            pool.give(item)
+    assert sorted(pool.given()) == [0, 2, 4]
+    assert sorted(pool.free_items) == [1, 3, 5, 6, 7, 8, 9]
+
+    with pytest.raises(ValueError, match="already returned"):
+        pool.give(3)
+    with pytest.raises(ValueError, match="not from this pool"):
+        pool.give(100)
+
+    # The swapped items still know where they are
+    for item in (0, 2, 4):
+        pool.give(item)
+    assert not pool.given_items
+    assert sorted(pool.free_items) == list(range(10))
+
+
+def test_give_all() -> None:
+    pool = Pool.from_callback(5, lambda idx: [idx])
+    for _ in range(3):
+        pool.get()
+    pool.give_all()
+    assert pool.has_free_slot()
+    assert pool.next_idx == 0
+    assert len(pool.free_items) == 5
+
+
+def test_grows_when_empty() -> None:
+    pool = Pool.from_callback(2, lambda idx: [idx], chunk=3)
+    items = [pool.get() for _ in range(4)]
+    assert items == [[0], [1], [2], [3]]
+    assert pool.size == 5
+    assert pool.grown == 1
+    pool.give(items[1])
+    pool.get()
+    assert pool.high_water == 4
+
+    fixed = Pool.from_callback(1, lambda idx: idx, grow=False)
+    fixed.get()
+    assert not fixed.has_free_slot()
+    with pytest.raises(IndexError):
+        fixed.get()
@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+
+import pytest
+
+from charm.game.generic.practice import MIN_PRACTICE_RATE, PracticeLoop
+
+
+@dataclass
+class Section:
+    time: float
+    name: str
+
+
+SECTIONS = [Section(5.0, "Intro"), Section(20.0, "Verse"), Section(42.5, "Chorus")]
+
+
+def test_from_sections() -> None:
+    loop = PracticeLoop.from_sections(SECTIONS, 1, song_end=60.0)
+    assert (loop.start, loop.end, loop.name) == (20.0, 42.5, "Verse")
+    loop = PracticeLoop.from_sections(SECTIONS, 1, 2, song_end=60.0)
+    assert (loop.start, loop.end, loop.name) == (20.0, 60.0, "Verse - Chorus")
+    with pytest.raises(IndexError):
+        PracticeLoop.from_sections(SECTIONS, 2, 1, song_end=60.0)
+
+
+def test_around() -> None:
+    assert PracticeLoop.around(SECTIONS, 30.0, song_end=60.0).name == "Verse"
+    assert PracticeLoop.around(SECTIONS, 42.5, song_end=60.0).name == "Chorus"
+    # Before the first section still loops something
+    assert PracticeLoop.around(SECTIONS, 0.0, song_end=60.0).name == "Intro"
+
+
+def test_restart_and_rate() -> None:
+    loop = PracticeLoop(1.0, 4.0, rate=0.1)
+    assert loop.restart == 0.0
+    assert loop.rate == MIN_PRACTICE_RATE
+    assert loop.set_rate(0.75 - 0.05) == 0.7
+    assert PracticeLoop(10.0, 14.0).restart == 8.0
+    with pytest.raises(ValueError, match="end after it starts"):
+        PracticeLoop(4.0, 4.0)
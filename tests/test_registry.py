@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+import charm.game.registry
+from charm.game.registry import BUILTIN_GAMEMODES, BUILTIN_PARSERS, ParserSpec, Registry
+
+
+class FakeEntryPoint:
+    def __init__(self, name: str, obj: object):
+        self.name = name
+        self.value = f"fake:{name}"
+        self._obj = obj
+
+    def load(self) -> object:
+        if isinstance(self._obj, Exception):
+            raise self._obj
+        return self._obj
+
+
+BMS = ParserSpec("bms", "7k", "charm_bms:BMSParser", ("*.bms",), ("*.bms",))
+
+
+def test_every_builtin_parser_has_a_gamemode() -> None:
+    gamemodes = {g.key for g in BUILTIN_GAMEMODES}
+    assert {p.gamemode for p in BUILTIN_PARSERS} <= gamemodes
+
+
+@pytest.mark.parametrize(
+    ("files", "expected"),
+    [
+        (["notes.chart", "song.ini"], {"dotchart"}),
+        (["a.osu", "audio.mp3"], {"mania", "taiko"}),
+        (["song.ssc"], {"sm"}),
+        (["cover.png"], set())
+    ]
+)
+def test_might_be_chartset(files: list[str], expected: set[str]) -> None:
+    assert {p.name for p in BUILTIN_PARSERS if p.might_be_chartset(files)} == expected
+
+
+def test_might_parse_chart() -> None:
+    dotchart = next(p for p in BUILTIN_PARSERS if p.name == "dotchart")
+    assert dotchart.might_parse_chart(Path("songs/hero/Song/notes.chart"))
+    assert not dotchart.might_parse_chart(Path("songs/hero/Song/other.chart"))
+
+
+def test_plugins(monkeypatch: pytest.MonkeyPatch) -> None:
+    plugins = {
+        "charm.parsers": [FakeEntryPoint("bms", BMS), FakeEntryPoint("broken", ImportError("nope")), FakeEntryPoint("wrong", 5)],
+        "charm.gamemodes": []
+    }
+    monkeypatch.setattr(charm.game.registry, "entry_points", lambda group: plugins[group])
+    registry = Registry(BUILTIN_PARSERS, BUILTIN_GAMEMODES)
+    assert registry.parsers_for("7k") == [BMS]
+    assert len(registry.parsers) == len(BUILTIN_PARSERS) + 1
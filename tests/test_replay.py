@@ -0,0 +1,69 @@
+from charm.game.generic import DigitalKeyEvent, Judgement
+from charm.game.generic.replay import Replay, ReplayFrame, ReplayPlayer, quantize
+
+
+class FakeEngine:
+    """Just writes down what it was given."""
+    config_fields = ("offset", "leniency")
+
+    def __init__(self):
+        self.offset = 0.0
+        self.leniency = 0.0
+        self.judgements: list[Judgement] = []
+        self.log: list[tuple] = []
+
+    def set_config(self, config: dict) -> None:
+        for k, v in config.items():
+            setattr(self, k, v)
+
+    def on_input(self, events: list[DigitalKeyEvent]) -> None:
+        self.log.extend(("input", e.time, e.key, e.new_state) for e in events)
+
+    def update(self, song_time: float) -> None:
+        self.log.append(("update", song_time))
+
+    def calculate_score(self) -> None:
+        pass
+
+
+def make_replay() -> Replay:
+    frames = [
+        ReplayFrame(quantize(-3.0)),
+        ReplayFrame(quantize(1.016), [DigitalKeyEvent(quantize(1.0034), 0, "down")]),
+        # Inputs come before the frame that handles them, so times go backwards in the stream
+        ReplayFrame(quantize(1.033), [DigitalKeyEvent(quantize(1.0201), "strum", "down"), DigitalKeyEvent(quantize(1.02), 0, "up")]),
+        ReplayFrame(quantize(2.5))
+    ]
+    judgements = [Judgement("Pass", "pass", 140, 10, 1), Judgement("Miss", "miss", float("inf"), 0, 0)]
+    return Replay("hero", "abc123", {"offset": 0.01, "leniency": 0.06}, judgements, frames, {"score": 50, "accuracy": 1.0, "grade": "SS", "fc_type": "SSFC", "max_streak": 1})
+
+
+def test_round_trip() -> None:
+    replay = make_replay()
+    loaded = Replay.from_bytes(replay.to_bytes())
+    assert loaded.gamemode == "hero"
+    assert loaded.chart_hash == "abc123"
+    assert loaded.config == replay.config
+    assert loaded.judgements == replay.judgements
+    assert loaded.results == replay.results
+    assert [f.time for f in loaded.frames] == [f.time for f in replay.frames]
+    for a, b in zip(loaded.frames, replay.frames, strict=True):
+        assert [(e.time, e.key, e.new_state) for e in a.events] == [(e.time, e.key, e.new_state) for e in b.events]
+
+
+def test_player_feeds_engine_in_order() -> None:
+    engine = FakeEngine()
+    player = ReplayPlayer(Replay.from_bytes(make_replay().to_bytes()), engine)
+    assert engine.offset == 0.01 and engine.leniency == 0.06
+
+    player.play_to(1.02)
+    assert engine.log == [("update", -3.0), ("input", 1.0034, 0, "down"), ("update", 1.016)]
+
+    player.run()
+    assert player.finished
+    assert engine.log[3:] == [
+        ("input", 1.0201, "strum", "down"),
+        ("input", 1.02, 0, "up"),
+        ("update", 1.033),
+        ("update", 2.5)
+    ]